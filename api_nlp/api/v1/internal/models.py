@@ -0,0 +1,15 @@
+import fastapi as fa
+
+from services.analyzer_stanza.analyzer_stanza import AnalyzerStanza
+from services.translator_marianmt.translator_marianmt import TranslatorMarianMT
+
+router = fa.APIRouter()
+
+
+@router.get("/resident")
+async def resident_models():
+    """models currently held in memory, stanza ones are reported per analysis worker process"""
+    return {
+        'marianmt': TranslatorMarianMT().report_resident_models(),
+        'stanza': AnalyzerStanza().report_resident_models(),
+    }
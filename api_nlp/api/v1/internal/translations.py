@@ -1,6 +1,8 @@
 import fastapi as fa
+import orjson
+from fastapi.responses import StreamingResponse
 
-from db.serializers.translations import TranslInSerializer, TranslOutSerializer
+from db.serializers.translations import TranslInSerializer, TranslOutSerializer, TranslBatchInSerializer
 from services.translator_marianmt.translator_marianmt import TranslatorMarianMT
 
 router = fa.APIRouter()
@@ -12,3 +14,23 @@ async def translate(
 ):
     marian_manager = TranslatorMarianMT()
     return await marian_manager.translate(tran_ser)
+
+
+@router.post("/translate-batch")
+async def translate_batch(
+        batch_ser: TranslBatchInSerializer,
+):
+    """streams NDJSON lines of TranslBatchItemOutSerializer, in order of language pair groups completion"""
+    marian_manager = TranslatorMarianMT()
+
+    async def ndjson_lines():
+        async for item_ser in marian_manager.translate_many(batch_ser.segments):
+            yield orjson.dumps(item_ser.model_dump(mode='json')) + b'\n'
+
+    return StreamingResponse(ndjson_lines(), media_type='application/x-ndjson')
+
+
+@router.get("/metrics")
+async def translation_metrics():
+    marian_manager = TranslatorMarianMT()
+    return marian_manager.batcher.get_metrics()
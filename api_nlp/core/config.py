@@ -39,3 +39,17 @@ settings = Settings(DOCKER, DEBUG, BASE_DIR)
 
 POSTGRES_DEBUG = os.getenv('POSTGRES_DEBUG', False) == 'True'
 ACCEPTABLE_HMAC_TIME_SECONDS = 10
+
+# translations micro-batching
+TRANSLATION_BATCH_MAX_SIZE = int(os.getenv('TRANSLATION_BATCH_MAX_SIZE', 16))
+TRANSLATION_BATCH_MAX_WAIT_MS = int(os.getenv('TRANSLATION_BATCH_MAX_WAIT_MS', 10))
+TRANSLATION_PIVOT_CACHE_SIZE = int(os.getenv('TRANSLATION_PIVOT_CACHE_SIZE', 4096))
+
+# stanza analysis workers
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 2))
+ANALYSIS_CHUNK_MAX_CHARS = int(os.getenv('ANALYSIS_CHUNK_MAX_CHARS', 2000))
+ANALYSIS_CHUNKS_PER_TASK = int(os.getenv('ANALYSIS_CHUNKS_PER_TASK', 8))
+
+# models are loaded lazily, least recently used are evicted when over budget
+MARIANMT_MEMORY_BUDGET_MB = int(os.getenv('MARIANMT_MEMORY_BUDGET_MB', 2048))
+STANZA_MEMORY_BUDGET_MB = int(os.getenv('STANZA_MEMORY_BUDGET_MB', 1536))  # per analysis worker
@@ -12,4 +12,17 @@ class TranslInSerializer(pd.BaseModel):
 class TranslOutSerializer(pd.BaseModel):
     text_output: str
     input_lang_iso2: LanguagesISO2NamesEnum
-    target_lang_iso2: LanguagesISO2NamesEnum
\ No newline at end of file
+    target_lang_iso2: LanguagesISO2NamesEnum
+
+
+class TranslBatchInSerializer(pd.BaseModel):
+    segments: list[TranslInSerializer]
+
+
+class TranslBatchItemOutSerializer(pd.BaseModel):
+    """one NDJSON line of translate-batch response, index points to position in request segments"""
+    index: int
+    text_output: str | None = None
+    input_lang_iso2: LanguagesISO2NamesEnum
+    target_lang_iso2: LanguagesISO2NamesEnum
+    error: str | None = None
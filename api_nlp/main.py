@@ -2,6 +2,7 @@ import fastapi as fa
 import uvicorn
 from api.v1.internal import (
     analyses as v1_internal_analyses,
+    models as v1_internal_models,
     translations as v1_internal_translations,
 )
 from contextlib import asynccontextmanager
@@ -15,13 +16,16 @@ from services.translator_marianmt.translator_marianmt import TranslatorMarianMT
 
 @asynccontextmanager
 async def lifespan(app: fa.FastAPI):
-    # startup
+    # startup, models themselves are loaded lazily on first request
     AnalyzerStanza()
     TranslatorMarianMT()
 
-    # shutdown
     yield
 
+    # shutdown
+    await TranslatorMarianMT().batcher.close()
+    AnalyzerStanza().executor.close()
+
 
 app = fa.FastAPI(
     title=settings.PROJECT_NAME,
@@ -38,6 +42,7 @@ app.add_middleware(CatchAssertionErrorMiddleware)  # noqa
 v1_router_internal = fa.APIRouter(prefix='/internal')
 v1_router_internal.include_router(v1_internal_analyses.router, prefix='/analyses', tags=['internal'])
 v1_router_internal.include_router(v1_internal_translations.router, prefix='/translations', tags=['internal'])
+v1_router_internal.include_router(v1_internal_models.router, prefix='/models', tags=['internal'])
 
 app.include_router(v1_router_internal, prefix="/api/v1")
 
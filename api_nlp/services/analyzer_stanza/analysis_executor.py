@@ -0,0 +1,85 @@
+import asyncio
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import stanza
+
+from core import config
+from core.config import BASE_DIR
+from services.model_registry.model_registry import ModelRegistry, torch_nbytes
+
+stanza_models_path = BASE_DIR / "staticfiles/stanza"
+
+sentence_boundary_regex = re.compile(r'(?<=[.!?…])\s+')
+
+# pipelines of current worker process, loaded on first document of each language
+_worker_registry = ModelRegistry('stanza', config.STANZA_MEMORY_BUDGET_MB * 2 ** 20)
+
+
+def _load_pipeline(iso2: str) -> stanza.Pipeline:
+    # resources are downloaded only if missing in stanza_models_path
+    return stanza.Pipeline(iso2.lower(), dir=str(stanza_models_path),
+                           download_method=stanza.DownloadMethod.REUSE_RESOURCES)
+
+
+def _pipeline_nbytes(nlp: stanza.Pipeline) -> int:
+    return torch_nbytes(*[getattr(getattr(processor, 'trainer', None), 'model', None)
+                          for processor in nlp.processors.values()])
+
+
+def _analyze_chunks(iso2: str, chunks: list[str]) -> tuple[list[dict], int, dict]:
+    """runs in worker process, chunks go through stanza bulk processing path as one batch.
+    returns words along with worker pid and its registry report"""
+    nlp = _worker_registry.get(iso2, loader=lambda: _load_pipeline(iso2), sizer=_pipeline_nbytes)
+    docs = nlp([stanza.Document([], text=chunk) for chunk in chunks])
+    words = [{'lemma': word.lemma, 'pos': word.pos}
+             for doc in docs
+             for sent in doc.sentences
+             for word in sent.words]
+    return words, os.getpid(), _worker_registry.report()
+
+
+def split_to_chunks(content: str, max_chars: int = config.ANALYSIS_CHUNK_MAX_CHARS) -> list[str]:
+    """split text at sentence boundaries, sentences are packed into chunks of up to max_chars"""
+    chunks = []
+    current = ''
+    for sentence in sentence_boundary_regex.split(content.strip()):
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f'{current} {sentence}' if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class AnalysisExecutor:
+    """pool of worker processes holding stanza pipelines, large documents are spread across workers"""
+
+    def __init__(self,
+                 max_workers: int = config.ANALYSIS_WORKERS,
+                 chunks_per_task: int = config.ANALYSIS_CHUNKS_PER_TASK):
+        self.chunks_per_task = chunks_per_task
+        # torch does not survive fork well, workers are spawned
+        self.pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        # last known registry report of each worker process
+        self.worker_reports: dict[int, dict] = {}
+
+    async def analyze(self, iso2: str, content: str) -> list[dict]:
+        chunks = split_to_chunks(content)
+        if not chunks:
+            return []
+        loop = asyncio.get_running_loop()
+        tasks = [loop.run_in_executor(self.pool, _analyze_chunks, iso2, chunks[i:i + self.chunks_per_task])
+                 for i in range(0, len(chunks), self.chunks_per_task)]
+        words = []
+        for task_words, pid, report in await asyncio.gather(*tasks):
+            words.extend(task_words)
+            self.worker_reports[pid] = report
+        return words
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
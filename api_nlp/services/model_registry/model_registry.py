@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable
+
+from core.logger_config import setup_logger
+
+logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
+
+
+def torch_nbytes(*modules) -> int:
+    """size of parameters and buffers of given torch modules, non-modules are skipped"""
+    nbytes = 0
+    for module in modules:
+        if module is None or not hasattr(module, 'parameters'):
+            continue
+        nbytes += sum(p.numel() * p.element_size() for p in module.parameters())
+        nbytes += sum(b.numel() * b.element_size() for b in module.buffers())
+    return nbytes
+
+
+class ModelRegistry:
+    """loads models on first use and keeps them within memory budget, least recently used are evicted first.
+    thread safe: bookkeeping is under one lock, loading of each key under its own lock"""
+
+    def __init__(self, name: str, memory_budget_bytes: int):
+        self.name = name
+        self.memory_budget_bytes = memory_budget_bytes
+        self._entries: OrderedDict[Hashable, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict[Hashable, threading.Lock] = {}
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(entry['size_bytes'] for entry in self._entries.values())
+
+    def _touch(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            entry['last_used_at'] = time.time()
+            entry['hits'] += 1
+            return entry['model']
+
+    def get(self, key: Hashable, loader: Callable[[], Any], sizer: Callable[[Any], int]) -> Any:
+        model = self._touch(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # might have been loaded by another thread while waiting
+            model = self._touch(key)
+            if model is not None:
+                return model
+
+            started = time.perf_counter()
+            model = loader()
+            size_bytes = sizer(model)
+            logger.info(f'{self.name}: loaded {key} ({size_bytes / 2 ** 20:.0f} MB) '
+                        f'in {time.perf_counter() - started:.1f}s')
+            with self._lock:
+                self._entries[key] = {'model': model, 'size_bytes': size_bytes,
+                                      'loaded_at': time.time(), 'last_used_at': time.time(), 'hits': 1}
+                self._evict_over_budget(keep=key)
+        return model
+
+    def _evict_over_budget(self, keep: Hashable) -> None:
+        """must be called under self._lock, just loaded model is never evicted even if it alone exceeds budget"""
+        while self.resident_bytes > self.memory_budget_bytes:
+            lru_key = next(iter(self._entries))
+            if lru_key == keep:
+                break
+            entry = self._entries.pop(lru_key)
+            logger.info(f'{self.name}: evicted {lru_key} ({entry["size_bytes"] / 2 ** 20:.0f} MB)')
+
+    def evict(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                'memory_budget_bytes': self.memory_budget_bytes,
+                'resident_bytes': self.resident_bytes,
+                'models': [
+                    {'key': '-'.join(map(str, key)) if isinstance(key, tuple) else str(key),
+                     'size_bytes': entry['size_bytes'],
+                     'loaded_at': entry['loaded_at'],
+                     'last_used_at': entry['last_used_at'],
+                     'hits': entry['hits']}
+                    for key, entry in reversed(self._entries.items())
+                ],
+            }
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from core import config
+from core.enums import LanguagesISO2NamesEnum
+from core.logger_config import setup_logger
+
+logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
+
+LanguagePair = tuple[LanguagesISO2NamesEnum, LanguagesISO2NamesEnum]
+
+
+class TranslationBatcher:
+    """groups concurrent translation requests per language pair into padded batches,
+    generation itself runs in a single dedicated worker thread so event loop stays free"""
+
+    def __init__(
+            self,
+            generate_batch: Callable[[LanguagePair, list[str]], list[str]],
+            max_batch_size: int = config.TRANSLATION_BATCH_MAX_SIZE,
+            max_wait_ms: int = config.TRANSLATION_BATCH_MAX_WAIT_MS,
+    ):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='marianmt')
+        self.queues: dict[LanguagePair, asyncio.Queue] = {}
+        self.workers: dict[LanguagePair, asyncio.Task] = {}
+        self.stats: dict[LanguagePair, dict] = {}
+
+    async def submit(self, pair: LanguagePair, text: str) -> str:
+        if pair not in self.workers or self.workers[pair].done():
+            self.queues[pair] = asyncio.Queue()
+            self.stats.setdefault(pair, {
+                'batches_total': 0,
+                'items_total': 0,
+                'last_batch_size': 0,
+                'max_batch_size': 0,
+                'generate_seconds_total': 0.0,
+            })
+            self.workers[pair] = asyncio.create_task(self._worker(pair))
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queues[pair].put((text, future))
+        return await future
+
+    async def _collect_batch(self, queue: asyncio.Queue) -> list[tuple[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await queue.get()]
+        deadline = loop.time() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # callers that gave up while waiting are not worth padding the batch for
+        return [(text, future) for text, future in batch if not future.done()]
+
+    async def _worker(self, pair: LanguagePair) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self.queues[pair]
+        stats = self.stats[pair]
+        while True:
+            batch = await self._collect_batch(queue)
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            started = time.perf_counter()
+            try:
+                outputs = await loop.run_in_executor(self.executor, self.generate_batch, pair, texts)
+            except Exception as e:
+                logger.error(f'failed to translate batch of {len(texts)} for {pair[0]}-{pair[1]}: {e}')
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            stats['batches_total'] += 1
+            stats['items_total'] += len(texts)
+            stats['last_batch_size'] = len(texts)
+            stats['max_batch_size'] = max(stats['max_batch_size'], len(texts))
+            stats['generate_seconds_total'] += time.perf_counter() - started
+
+            for (_, future), text_output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(text_output)
+
+    def get_metrics(self) -> dict:
+        metrics = {}
+        for pair, stats in self.stats.items():
+            queue = self.queues.get(pair)
+            metrics[f'{pair[0]}-{pair[1]}'] = {
+                **stats,
+                'queue_depth': queue.qsize() if queue is not None else 0,
+                'avg_batch_size': stats['items_total'] / stats['batches_total'] if stats['batches_total'] else 0,
+            }
+        return metrics
+
+    async def close(self) -> None:
+        for worker in self.workers.values():
+            worker.cancel()
+        await asyncio.gather(*self.workers.values(), return_exceptions=True)
+        self.workers.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,9 +1,16 @@
+import asyncio
 import backoff
 import os
+from collections import OrderedDict, deque
+from typing import AsyncIterator
+import torch
+from core import config
 from core.config import BASE_DIR
 from core.enums import LanguagesISO2NamesEnum
 from core.shared import singleton_decorator
-from db.serializers.translations import TranslInSerializer, TranslOutSerializer
+from db.serializers.translations import TranslInSerializer, TranslOutSerializer, TranslBatchItemOutSerializer
+from services.model_registry.model_registry import ModelRegistry, torch_nbytes
+from services.translator_marianmt.translation_batcher import TranslationBatcher, LanguagePair
 from transformers import MarianMTModel, MarianTokenizer
 
 os.environ['HF_HOME'] = str(BASE_DIR / 'staticfiles/marianmt')
@@ -12,7 +19,6 @@ os.environ['HF_HOME'] = str(BASE_DIR / 'staticfiles/marianmt')
 @singleton_decorator
 class TranslatorMarianMT:
 
-    @backoff.on_exception(backoff.constant, Exception, max_tries=10)
     def __init__(self):
         self.model_names = {
             (LanguagesISO2NamesEnum.RU, LanguagesISO2NamesEnum.EN): 'Helsinki-NLP/opus-mt-ru-en',
@@ -28,41 +34,128 @@ class TranslatorMarianMT:
             (LanguagesISO2NamesEnum.PT, LanguagesISO2NamesEnum.EN): 'Helsinki-NLP/opus-mt-tc-big-en-pt',
             (LanguagesISO2NamesEnum.EN, LanguagesISO2NamesEnum.PT): 'Helsinki-NLP/opus-mt-tc-big-en-pt',
         }
-        self.models = {k: MarianMTModel.from_pretrained(model_name) for k, model_name in self.model_names.items()}
-        self.tokenizers = {k: MarianTokenizer.from_pretrained(model_name) for k, model_name in self.model_names.items()}
+        self.routes = self._plan_routes()
+        self.pivot_outputs: OrderedDict[tuple[LanguagePair, str], asyncio.Future] = OrderedDict()
+        # models are loaded on first use, see _get_model_and_tokenizer
+        self.registry = ModelRegistry('marianmt', config.MARIANMT_MEMORY_BUDGET_MB * 2 ** 20)
+        self.batcher = TranslationBatcher(self._generate_batch)
+
+    @backoff.on_exception(backoff.constant, Exception, max_tries=10)
+    def _load_model_and_tokenizer(self, model_name: str) -> tuple[MarianMTModel, MarianTokenizer]:
+        model = MarianMTModel.from_pretrained(model_name)
+        model.eval()
+        return model, MarianTokenizer.from_pretrained(model_name)
+
+    def _get_model_and_tokenizer(self, pair: LanguagePair) -> tuple[MarianMTModel, MarianTokenizer]:
+        """blocking, en-pt and pt-en share same model so registry is keyed by model name"""
+        model_name = self.model_names[pair]
+        return self.registry.get(model_name,
+                                 loader=lambda: self._load_model_and_tokenizer(model_name),
+                                 sizer=lambda model_and_tokenizer: torch_nbytes(model_and_tokenizer[0]))
+
+    def _plan_routes(self) -> dict[LanguagePair, list[LanguagePair]]:
+        """shortest (fewest generate passes) route over available models for every reachable language pair"""
+        graph: dict[LanguagesISO2NamesEnum, list[LanguagesISO2NamesEnum]] = {}
+        for input_lang_iso2, target_lang_iso2 in self.model_names:
+            graph.setdefault(input_lang_iso2, []).append(target_lang_iso2)
+
+        routes = {}
+        for source in LanguagesISO2NamesEnum:
+            # breadth first search, every model is one hop
+            paths = {source: []}
+            queue = deque([source])
+            while queue:
+                lang = queue.popleft()
+                for next_lang in graph.get(lang, []):
+                    if next_lang not in paths:
+                        paths[next_lang] = paths[lang] + [(lang, next_lang)]
+                        queue.append(next_lang)
+            for target, path in paths.items():
+                routes[(source, target)] = path
+        return routes
+
+    async def _translate_pivot_leg(self, pair: LanguagePair, text: str) -> str:
+        """intermediate legs are memoized, so fan-out of one text to several targets translates to pivot once"""
+        key = (pair, text)
+        future = self.pivot_outputs.get(key)
+        if future is not None:
+            self.pivot_outputs.move_to_end(key)
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.pivot_outputs[key] = future
+        while len(self.pivot_outputs) > config.TRANSLATION_PIVOT_CACHE_SIZE:
+            self.pivot_outputs.popitem(last=False)
+        try:
+            future.set_result(await self.batcher.submit(pair, text))
+        except asyncio.CancelledError:
+            self.pivot_outputs.pop(key, None)
+            future.cancel()
+            raise
+        except Exception as e:
+            self.pivot_outputs.pop(key, None)
+            future.set_exception(e)
+            # nobody else may be awaiting it, mark exception as retrieved
+            future.exception()
+            raise
+        return future.result()
+
+    def report_resident_models(self) -> dict:
+        return self.registry.report()
+
+    def _generate_batch(self, pair: LanguagePair, texts: list[str]) -> list[str]:
+        """blocking, is called from batcher worker thread only"""
+        model, tokenizer = self._get_model_and_tokenizer(pair)
+        encoded_input = tokenizer(texts, return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            translated_tokens = model.generate(**encoded_input)
+        return tokenizer.batch_decode(translated_tokens, skip_special_tokens=True)
 
     async def translate(
             self,
             tran_ser: TranslInSerializer
     ) -> TranslOutSerializer:
 
-        text_input = tran_ser.text_input
         input_lang_iso2 = tran_ser.input_lang_iso2
         target_lang_iso2 = tran_ser.target_lang_iso2
+        route = self.routes.get((input_lang_iso2, target_lang_iso2))
+        assert route is not None, f'no translation route from {input_lang_iso2} to {target_lang_iso2}'
 
-        # from/to EN
-        if input_lang_iso2 == LanguagesISO2NamesEnum.EN or target_lang_iso2 == LanguagesISO2NamesEnum.EN:
-            model = self.models.get((input_lang_iso2, target_lang_iso2))
-            tokenizer = self.tokenizers.get((input_lang_iso2, target_lang_iso2))
-
-            encoded_input = tokenizer(text_input, return_tensors="pt", padding=True)
-            translated_tokens = model.generate(**encoded_input)
-            text_output = tokenizer.decode(translated_tokens[0], skip_special_tokens=True)
-
-        else:
-            # from not EN to not EN - translate to EN first, and then from EN to target
-            tran_ser_to_en = TranslInSerializer(text_input=text_input, input_lang_iso2=input_lang_iso2,
-                                                target_lang_iso2=LanguagesISO2NamesEnum.EN)
-            tran_out_ser_to_en = await self.translate(tran_ser_to_en)
-            text_en = tran_out_ser_to_en.text_output
-            tran_in_ser_to_target = TranslInSerializer(text_input=text_en,
-                                                       input_lang_iso2=LanguagesISO2NamesEnum.EN,
-                                                       target_lang_iso2=target_lang_iso2)
-            tran_ser_to_target = await self.translate(tran_in_ser_to_target)
-            text_output = tran_ser_to_target.text_output
+        text_output = tran_ser.text_input
+        for pair in route[:-1]:
+            text_output = await self._translate_pivot_leg(pair, text_output)
+        if route:
+            text_output = await self.batcher.submit(route[-1], text_output)
 
         return TranslOutSerializer(
             text_output=text_output,
             input_lang_iso2=input_lang_iso2,
             target_lang_iso2=target_lang_iso2
         )
+
+    async def translate_many(
+            self,
+            tran_sers: list[TranslInSerializer]
+    ) -> AsyncIterator[TranslBatchItemOutSerializer]:
+        """translates segments grouped by language pair, yields items of each group as soon as group is done"""
+
+        groups: dict[LanguagePair, list[int]] = {}
+        for index, tran_ser in enumerate(tran_sers):
+            groups.setdefault((tran_ser.input_lang_iso2, tran_ser.target_lang_iso2), []).append(index)
+
+        async def translate_group(pair: LanguagePair, indexes: list[int]) -> list[TranslBatchItemOutSerializer]:
+            # submitted together, so batcher packs them into as few generate calls as possible
+            results = await asyncio.gather(*[self.translate(tran_sers[i]) for i in indexes],
+                                           return_exceptions=True)
+            return [
+                TranslBatchItemOutSerializer(index=i, input_lang_iso2=pair[0], target_lang_iso2=pair[1],
+                                             error=str(res) or res.__class__.__name__)
+                if isinstance(res, Exception) else
+                TranslBatchItemOutSerializer(index=i, text_output=res.text_output,
+                                             input_lang_iso2=pair[0], target_lang_iso2=pair[1])
+                for i, res in zip(indexes, results)
+            ]
+
+        for group_done in asyncio.as_completed([translate_group(pair, indexes) for pair, indexes in groups.items()]):
+            for item_ser in await group_done:
+                yield item_ser
@@ -0,0 +1,12 @@
+import os
+
+# settings are required by core.config at import, unit tests don't reach services they point to
+TEST_SETTINGS = {
+    'API_NLP_HOST': 'localhost',
+    'API_NLP_PORT': '8002',
+    'PROJECT_NAME': 'nlp',
+    'INTER_SERVICE_SECRET': 'secret',
+}
+
+for name, value in TEST_SETTINGS.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip('stanza')
+
+from services.analyzer_stanza.analysis_executor import split_to_chunks  # noqa: E402
+
+
+def test_split_to_chunks_packs_sentences_up_to_max_chars():
+    content = 'One two. Three four! Five six? Seven.'
+    assert split_to_chunks(content, max_chars=20) == ['One two. Three four!', 'Five six? Seven.']
+
+
+def test_split_to_chunks_does_not_cut_sentence_longer_than_max_chars():
+    long_sentence = 'word ' * 10 + 'end.'
+    assert split_to_chunks(f'Short. {long_sentence} Tail.', max_chars=20) == ['Short.', long_sentence, 'Tail.']
+
+
+def test_split_to_chunks_keeps_every_word():
+    content = ' '.join(f'Sentence number {i}.' for i in range(100))
+    chunks = split_to_chunks(content, max_chars=50)
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert ' '.join(chunks).split() == content.split()
+
+
+def test_split_to_chunks_strips_text():
+    assert split_to_chunks('  One two.  Three.  ', max_chars=100) == ['One two. Three.']
@@ -0,0 +1,29 @@
+"""4_file_storage_content_hash
+
+Revision ID: 6d3a9e1f4b72
+Revises: f27c4e9a1b58
+Create Date: 2026-10-17 18:04:12.417630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d3a9e1f4b72'
+down_revision = 'f27c4e9a1b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # existing rows are hashed and merged by files_dedupe_task, every one of them has one file_index so far
+    op.add_column('file_storage', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('file_storage', sa.Column('ref_count', sa.Integer(), server_default=sa.text('1'), nullable=False))
+    op.create_unique_constraint('file_storage_content_hash_key', 'file_storage', ['content_hash'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('file_storage_content_hash_key', 'file_storage', type_='unique')
+    op.drop_column('file_storage', 'ref_count')
+    op.drop_column('file_storage', 'content_hash')
@@ -0,0 +1,53 @@
+"""2_file_chunk
+
+Revision ID: a3d58f1c6e20
+Revises: c9a7b4e5ba3b
+Create Date: 2026-10-17 16:02:41.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d58f1c6e20'
+down_revision = 'c9a7b4e5ba3b'
+branch_labels = None
+depends_on = None
+
+# FILE_STORAGE_CHUNK_SIZE at the moment of migration, chunks of other size are read all the same
+CHUNK_SIZE = 256 * 1024
+
+
+def upgrade() -> None:
+    op.create_table('file_chunk',
+    sa.Column('file_storage_uuid', sa.UUID(as_uuid=False), nullable=False),
+    sa.Column('index', sa.Integer(), nullable=False),
+    sa.Column('data', postgresql.BYTEA(), nullable=False),
+    sa.ForeignKeyConstraint(['file_storage_uuid'], ['file_storage.uuid'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('file_storage_uuid', 'index')
+    )
+    # chunks are toasted separately anyway, compressing already compressed media only costs cpu
+    op.execute('ALTER TABLE file_chunk ALTER COLUMN data SET STORAGE EXTERNAL')
+    op.add_column('file_storage', sa.Column('size', sa.BigInteger(), server_default=sa.text('0'), nullable=False))
+    op.execute(f"""
+        INSERT INTO file_chunk (file_storage_uuid, index, data)
+        SELECT fs.uuid, i, substring(fs.file_data FROM i * {CHUNK_SIZE} + 1 FOR {CHUNK_SIZE})
+        FROM file_storage fs,
+             generate_series(0, greatest(ceil(length(fs.file_data)::numeric / {CHUNK_SIZE})::int - 1, 0)) AS i
+    """)
+    op.execute('UPDATE file_storage SET size = length(file_data)')
+    op.drop_column('file_storage', 'file_data')
+
+
+def downgrade() -> None:
+    op.add_column('file_storage', sa.Column('file_data', postgresql.BYTEA(), nullable=True))
+    op.execute("""
+        UPDATE file_storage fs
+        SET file_data = coalesce((SELECT string_agg(fc.data, ''::bytea ORDER BY fc.index)
+                                  FROM file_chunk fc WHERE fc.file_storage_uuid = fs.uuid), ''::bytea)
+    """)
+    op.alter_column('file_storage', 'file_data', nullable=False)
+    op.drop_column('file_storage', 'size')
+    op.drop_table('file_chunk')
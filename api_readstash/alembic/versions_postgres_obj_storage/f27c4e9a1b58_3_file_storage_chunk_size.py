@@ -0,0 +1,26 @@
+"""3_file_storage_chunk_size
+
+Revision ID: f27c4e9a1b58
+Revises: a3d58f1c6e20
+Create Date: 2026-10-17 17:21:05.733914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f27c4e9a1b58'
+down_revision = 'a3d58f1c6e20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # existing files were chunked by 2_file_chunk with this size
+    op.add_column('file_storage', sa.Column('chunk_size', sa.Integer(), server_default=sa.text(str(256 * 1024)),
+                                            nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('file_storage', 'chunk_size')
@@ -0,0 +1,27 @@
+"""7_file_index_content_hash_size
+
+Revision ID: 2b8e5d7c4f31
+Revises: e93a1c7f5b26
+Create Date: 2026-10-17 17:23:48.105527
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b8e5d7c4f31'
+down_revision = 'e93a1c7f5b26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # existing files get them on next upload, until then they are served with weak etag
+    op.add_column('file_index', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('file_index', sa.Column('size', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('file_index', 'size')
+    op.drop_column('file_index', 'content_hash')
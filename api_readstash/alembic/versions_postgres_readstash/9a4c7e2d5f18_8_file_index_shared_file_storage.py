@@ -0,0 +1,28 @@
+"""8_file_index_shared_file_storage
+
+Revision ID: 9a4c7e2d5f18
+Revises: 2b8e5d7c4f31
+Create Date: 2026-10-17 18:06:37.952104
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c7e2d5f18'
+down_revision = '2b8e5d7c4f31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # file_storage of same content is shared by file_index rows
+    op.drop_constraint('file_index_file_storage_uuid_key', 'file_index', type_='unique')
+    op.create_index(op.f('ix_file_index_file_storage_uuid'), 'file_index', ['file_storage_uuid'], unique=False)
+
+
+def downgrade() -> None:
+    # fails if files were deduplicated already
+    op.drop_index(op.f('ix_file_index_file_storage_uuid'), table_name='file_index')
+    op.create_unique_constraint('file_index_file_storage_uuid_key', 'file_index', ['file_storage_uuid'])
@@ -0,0 +1,40 @@
+"""5_word_keyset_pagination_indexes
+
+Revision ID: b41f6d8e2a07
+Revises: 5e7b2c9d0f14
+Create Date: 2026-10-17 14:02:31.417590
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41f6d8e2a07'
+down_revision = '5e7b2c9d0f14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside transaction, but doesn't lock 'word' for writes while building
+    with op.get_context().autocommit_block():
+        op.create_index('ix_word_language_iso_2_created_at_id', 'word',
+                        ['language_iso_2', 'created_at', 'id'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_word_language_iso_2_updated_at_id', 'word',
+                        ['language_iso_2', sa.text('coalesce(updated_at, created_at)'), 'id'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_word_language_iso_2_characters_id', 'word',
+                        ['language_iso_2', 'characters', 'id'],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_word_language_iso_2_characters_id', table_name='word',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_word_language_iso_2_updated_at_id', table_name='word',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_word_language_iso_2_created_at_id', table_name='word',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,38 @@
+"""9_file_index_variants
+
+Revision ID: c5f1b8d3e6a9
+Revises: 9a4c7e2d5f18
+Create Date: 2026-10-17 18:52:19.604381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f1b8d3e6a9'
+down_revision = '9a4c7e2d5f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # existing images get variants from files_create_derivatives_backfill_task
+    op.add_column('file_index', sa.Column('parent_uuid', sa.UUID(as_uuid=False), nullable=True))
+    op.add_column('file_index', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('file_index', sa.Column('height', sa.Integer(), nullable=True))
+    op.create_foreign_key('file_index_parent_uuid_fkey', 'file_index', 'file_index', ['parent_uuid'], ['uuid'],
+                          ondelete='CASCADE')
+    op.create_index(op.f('ix_file_index_parent_uuid'), 'file_index', ['parent_uuid'], unique=False)
+    op.create_unique_constraint('unique_parent_uuid_width', 'file_index', ['parent_uuid', 'width'])
+
+
+def downgrade() -> None:
+    # file_storage of removed variants is not released, files_dedupe_task doesn't reclaim it either
+    op.drop_constraint('unique_parent_uuid_width', 'file_index', type_='unique')
+    op.drop_index(op.f('ix_file_index_parent_uuid'), table_name='file_index')
+    op.drop_constraint('file_index_parent_uuid_fkey', 'file_index', type_='foreignkey')
+    op.execute('DELETE FROM file_index WHERE parent_uuid IS NOT NULL')
+    op.drop_column('file_index', 'height')
+    op.drop_column('file_index', 'width')
+    op.drop_column('file_index', 'parent_uuid')
@@ -0,0 +1,42 @@
+"""6_word_search_indexes
+
+Revision ID: e93a1c7f5b26
+Revises: b41f6d8e2a07
+Create Date: 2026-10-17 14:48:09.260731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e93a1c7f5b26'
+down_revision = 'b41f6d8e2a07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    # CONCURRENTLY can't run inside transaction, but doesn't lock 'word' for writes while building
+    with op.get_context().autocommit_block():
+        op.create_index('ix_word_characters_trgm', 'word', ['characters'],
+                        unique=False, postgresql_using='gin', postgresql_ops={'characters': 'gin_trgm_ops'},
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_word_lemma_trgm', 'word', ['lemma'],
+                        unique=False, postgresql_using='gin', postgresql_ops={'lemma': 'gin_trgm_ops'},
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_word_language_iso_2_characters_lower_c', 'word',
+                        ['language_iso_2', sa.text('lower(characters) COLLATE "C"')],
+                        unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_word_language_iso_2_characters_lower_c', table_name='word',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_word_lemma_trgm', table_name='word',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_word_characters_trgm', table_name='word',
+                      postgresql_concurrently=True, if_exists=True)
+    op.execute('DROP EXTENSION IF EXISTS pg_trgm;')
@@ -0,0 +1,49 @@
+import fastapi as fa
+import pydantic as pd
+
+from core.enums import ResponseDetailEnum
+from core.security import current_user_dependency, auth_head_or_admin
+from db.models.user import UserModel
+from db.serializers.file_storage import FileIndexCreateSerializer, FileIndexReadSerializer, FileIndexUpdateSerializer
+from services.file_manager.file_manager import FileManager, file_manager_dependency
+
+router = fa.APIRouter()
+
+
+@router.post("", response_model=FileIndexReadSerializer, status_code=fa.status.HTTP_201_CREATED)
+@auth_head_or_admin
+async def files_create(
+        file: fa.UploadFile,
+        name: str | None = fa.Form(None),
+        file_manager: FileManager = fa.Depends(file_manager_dependency),
+        current_user: UserModel = fa.Depends(current_user_dependency),
+):
+    """upload file, name and content type are taken from file if not provided"""
+    file_index_ser = FileIndexCreateSerializer(name=name or file.filename, content_type=file.content_type)
+    return await file_manager.create(file_index_ser, file)
+
+
+@router.put("/{file_index_uuid}", response_model=FileIndexReadSerializer)
+@auth_head_or_admin
+async def files_update(
+        file_index_uuid: pd.UUID4,
+        file: fa.UploadFile | None = None,
+        name: str | None = fa.Form(None),
+        file_manager: FileManager = fa.Depends(file_manager_dependency),
+        current_user: UserModel = fa.Depends(current_user_dependency),
+):
+    """rename file and/or replace its data"""
+    file_index_ser = FileIndexUpdateSerializer(name=name,
+                                               content_type=file.content_type if file is not None else None)
+    return await file_manager.update(str(file_index_uuid), file_index_ser, file)
+
+
+@router.delete("/{file_index_uuid}")
+@auth_head_or_admin
+async def files_remove(
+        file_index_uuid: pd.UUID4,
+        file_manager: FileManager = fa.Depends(file_manager_dependency),
+        current_user: UserModel = fa.Depends(current_user_dependency),
+):
+    await file_manager.remove(str(file_index_uuid))
+    return {'detail': ResponseDetailEnum.ok}
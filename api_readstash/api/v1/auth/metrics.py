@@ -0,0 +1,76 @@
+import fastapi as fa
+
+from core.security import auth_head, current_user_dependency
+from db.models.user import UserModel
+from services.cache.blob_cache import RedisBlobCache
+from services.cache.tiered_cache import TieredCache
+from services.chatgpt.chatgpt import ChatGPTClient
+from services.inter_service_manager.inter_service_manager import InterServiceManager
+from services.keycloak.keycloak import KCAdmin
+from services.token_verifier.token_verifier import TokenVerifier
+from services.word_manager.vocabulary_index import VocabularyIndex
+
+router = fa.APIRouter()
+
+
+@router.get("/inter-service")
+@auth_head
+async def metrics_inter_service(
+        current_user: UserModel = fa.Depends(current_user_dependency),
+):
+    """pool utilization of client used for requests to nlp api"""
+    return InterServiceManager().get_metrics()
+
+
+@router.get("/chatgpt")
+@auth_head
+async def metrics_chatgpt(
+        current_user: UserModel = fa.Depends(current_user_dependency),
+):
+    """requests sent to openai, served from cache and coalesced with identical in-flight ones"""
+    return ChatGPTClient().get_metrics()
+
+
+@router.get("/vocabulary-index")
+@auth_head
+async def metrics_vocabulary_index(
+        current_user: UserModel = fa.Depends(current_user_dependency),
+):
+    """words per language in in-process vocabulary index of this worker and changes applied since its build"""
+    return VocabularyIndex().get_stats()
+
+
+@router.get("/token-verifier")
+@auth_head
+async def metrics_token_verifier(
+        current_user: UserModel = fa.Depends(current_user_dependency),
+):
+    """tokens verified locally and served from claims cache, signing keys known and their age"""
+    return TokenVerifier().get_metrics()
+
+
+@router.get("/keycloak-admin")
+@auth_head
+async def metrics_keycloak_admin(
+        current_user: UserModel = fa.Depends(current_user_dependency),
+):
+    """requests sent to keycloak admin api, admin token refreshes and users served from cache"""
+    return KCAdmin().get_metrics()
+
+
+@router.get("/blob-cache")
+@auth_head
+async def metrics_blob_cache(
+        current_user: UserModel = fa.Depends(current_user_dependency),
+):
+    """file data served from redis, rejected as too big and compression ratio of stored blobs"""
+    return RedisBlobCache().get_metrics()
+
+
+@router.get("/tiered-cache")
+@auth_head
+async def metrics_tiered_cache(
+        current_user: UserModel = fa.Depends(current_user_dependency),
+):
+    """hits per tier, recomputes (early, coalesced, waiting for other worker) and invalidations"""
+    return TieredCache().get_metrics()
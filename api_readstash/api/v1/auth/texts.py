@@ -66,6 +66,27 @@ async def texts_identify_text_level(
     return await text_manager.identify_text_level_with_chatgpt(str(text_uuid), gpt_model)
 
 
+@router.put("/ingest/{text_uuid}")
+@auth_head_or_admin
+async def texts_ingest(
+        text_uuid: pd.UUID4,
+        gpt_model: ChatGPTModelsEnum = ChatGPTModelsEnum.gpt_4o,
+        text_manager: TextManager = fa.Depends(text_manager_dependency),
+):
+    """create text's words that don't exist yet and link all of them to text, runs in background"""
+    return await text_manager.start_text_ingestion(str(text_uuid), gpt_model)
+
+
+@router.get("/ingestion-progress/{text_uuid}")
+async def texts_ingestion_progress(
+        text_uuid: pd.UUID4,
+        text_manager: TextManager = fa.Depends(text_manager_dependency),
+        current_user: UserModel = fa.Depends(current_user_dependency),
+):
+    """status, chunks_total/chunks_done and words_total/words_created of text ingestion"""
+    return await text_manager.get_text_ingestion_progress(str(text_uuid))
+
+
 @router.put("/{text_uuid}", response_model=TextReadContentSerializer)
 @auth_head_or_admin
 async def texts_update(
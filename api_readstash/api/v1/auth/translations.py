@@ -1,7 +1,10 @@
 import fastapi as fa
 
 from core.enums import ChatGPTModelsEnum
+from core.security import auth_head, current_user_dependency
+from db.models.user import UserModel
 from db.serializers.translations import TranslWordInSerializer
+from services.translation_memory.translation_memory import TranslationMemory
 from services.translator.translator import translate_word_with_gpt
 
 router = fa.APIRouter()
@@ -14,3 +17,12 @@ async def translations_translate_word_with_gpt(
 ):
     """get word translation with chatgpt"""
     return await translate_word_with_gpt(transl_word_in_ser, gpt_model)
+
+
+@router.get("/translation-memory-stats")
+@auth_head
+async def translations_translation_memory_stats(
+        current_user: UserModel = fa.Depends(current_user_dependency),
+):
+    """translation memory hits (redis / postgres) and misses (requests that reached nlp api)"""
+    return await TranslationMemory().get_stats()
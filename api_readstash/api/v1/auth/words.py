@@ -1,9 +1,9 @@
 import fastapi as fa
 import pydantic as pd
 
-from core.enums import ChatGPTModelsEnum, OrderEnum, UserWordStatusEnum
+from core.enums import ChatGPTModelsEnum, OrderEnum, UserWordStatusEnum, CountModeEnum
 from core.security import current_user_dependency, auth_head_or_admin, auth_head
-from core.shared import pagination_params_dependency
+from core.shared import cursor_pagination_params_dependency
 from db.models.user import UserModel
 from db.serializers.word import word_params_dependency, WordReadSerializer, WordCreateSerializer, WordOrderByEnum, \
     WordsPaginatedSerializer, WordUpdateSerializer
@@ -18,16 +18,17 @@ async def words_list_my(
         word_manager: WordManager = fa.Depends(word_manager_dependency),
         word_params: dict = fa.Depends(word_params_dependency),
         status: UserWordStatusEnum = UserWordStatusEnum.to_learn,
-        pagination_params: dict = fa.Depends(pagination_params_dependency),
+        pagination_params: dict = fa.Depends(cursor_pagination_params_dependency),
         order_by: WordOrderByEnum = WordOrderByEnum.created_at,
         order: OrderEnum = OrderEnum.desc,
+        count_mode: CountModeEnum = CountModeEnum.estimated,
         current_user: UserModel = fa.Depends(current_user_dependency),
 ):
     return await word_manager.list_filtered_paginated_users_words_by_status(current_user.uuid,
                                                                             word_params,
                                                                             pagination_params,
                                                                             order_by, order,
-                                                                            status)
+                                                                            status, count_mode)
 
 
 @router.get("/{word_uuid}",
@@ -38,7 +39,7 @@ async def words_read(
         current_user: UserModel = fa.Depends(current_user_dependency),
 ):
     """get word by uuid"""
-    return await word_manager.get_word(str(word_uuid))
+    return await word_manager.get_word_cached(str(word_uuid))
 
 
 @router.post("/add-to-my/{word_uuid}")
@@ -0,0 +1,22 @@
+import fastapi as fa
+import pydantic as pd
+
+from services.file_manager.file_manager import FileManager, file_manager_dependency
+
+router = fa.APIRouter()
+
+
+@router.get("/{file_index_uuid}")
+async def files_read(
+        file_index_uuid: pd.UUID4,
+        request: fa.Request,
+        v: str | None = None,
+        size: pd.PositiveInt | None = None,
+        file_manager: FileManager = fa.Depends(file_manager_dependency),
+):
+    """
+    stream file data, supports conditional (If-None-Match, If-Modified-Since) and range (Range, If-Range) requests.
+    v is content hash of file, with it response is cached by clients as immutable.
+    size is width of image in pixels it is displayed at, smallest variant of image that is not narrower is sent
+    """
+    return await file_manager.get_cached(str(file_index_uuid), request, v, size)
@@ -1,12 +1,12 @@
 import fastapi as fa
 
-from core.enums import OrderEnum, ChatGPTModelsEnum
+from core.enums import OrderEnum, ChatGPTModelsEnum, CountModeEnum, LanguagesISO2NamesEnum
 from core.security import current_user_dependency
-from core.shared import pagination_params_dependency
+from core.shared import cursor_pagination_params_dependency
 from db.models.user import UserModel
 from db.serializers.translations import TranslWordInSerializer
 from db.serializers.word import word_params_dependency, WordOrderByEnum, \
-    WordsPaginatedSerializer
+    WordsPaginatedSerializer, WordAutocompleteSerializer
 from services.word_manager.word_manager import WordManager, word_manager_dependency
 
 router = fa.APIRouter()
@@ -17,14 +17,27 @@ router = fa.APIRouter()
 async def words_list(
         word_manager: WordManager = fa.Depends(word_manager_dependency),
         word_params: dict = fa.Depends(word_params_dependency),
-        pagination_params: dict = fa.Depends(pagination_params_dependency),
+        pagination_params: dict = fa.Depends(cursor_pagination_params_dependency),
         order_by: WordOrderByEnum = WordOrderByEnum.created_at,
         order: OrderEnum = OrderEnum.desc,
+        count_mode: CountModeEnum = CountModeEnum.estimated,
 ):
     """list words for a language"""
     return await word_manager.list_filtered_paginated_words(word_params,
                                                             pagination_params,
-                                                            order_by, order)
+                                                            order_by, order, count_mode)
+
+
+@router.get("/autocomplete",
+            response_model=list[WordAutocompleteSerializer])
+async def words_autocomplete(
+        language_iso_2: LanguagesISO2NamesEnum,
+        prefix: str,
+        limit: int = 10,
+        word_manager: WordManager = fa.Depends(word_manager_dependency),
+):
+    """words starting with prefix (rank 1), then similar ones (rank is trigram similarity)"""
+    return await word_manager.autocomplete_words(language_iso_2, prefix, limit)
 
 
 @router.post("/get-analyzed-word-translation-with-nlp-api")
@@ -1,10 +1,13 @@
 import os
 
 from celery import Celery
+from celery.schedules import crontab
 from kombu import Exchange, Queue
 
 from core.config import settings
-from core.enums import QueueNamesEnum
+from core import config
+from core.constants import CELERY_TASK_PRIORITIES
+from core.enums import QueueNamesEnum, TasksNamesEnum
 from db import POSTGRES_READSTASH_URL_SYNC
 
 celery_app = Celery(__name__, broker=settings.CELERY_BROKER_URL, backend=settings.CELERY_RESULT_BACKEND)
@@ -20,6 +23,36 @@ celery_app.conf.task_queues = (
 
 celery_app.conf.update({'beat_dburi': POSTGRES_READSTASH_URL_SYNC})
 
+# installed into db schedule by celery_sqlalchemy_scheduler on beat start
+celery_app.conf.beat_schedule = {
+    TasksNamesEnum.translation_memory_cleanup_task: {
+        'task': TasksNamesEnum.translation_memory_cleanup_task,
+        'schedule': crontab(minute='0', hour='4'),
+        'options': {'queue': QueueNamesEnum.default,
+                    'priority': CELERY_TASK_PRIORITIES[TasksNamesEnum.translation_memory_cleanup_task]},
+    },
+    # merges file_storage rows of same content, there is nothing to do once all rows are hashed
+    TasksNamesEnum.files_dedupe_task: {
+        'task': TasksNamesEnum.files_dedupe_task,
+        'schedule': crontab(minute='30', hour='4'),
+        'options': {'queue': QueueNamesEnum.default,
+                    'priority': CELERY_TASK_PRIORITIES[TasksNamesEnum.files_dedupe_task]},
+    },
+    # queues images uploaded before derivatives or whose derivation failed
+    TasksNamesEnum.files_create_derivatives_backfill_task: {
+        'task': TasksNamesEnum.files_create_derivatives_backfill_task,
+        'schedule': crontab(minute='0', hour='5'),
+        'options': {'queue': QueueNamesEnum.default,
+                    'priority': CELERY_TASK_PRIORITIES[TasksNamesEnum.files_create_derivatives_backfill_task]},
+    },
+    TasksNamesEnum.words_identify_level_flush_task: {
+        'task': TasksNamesEnum.words_identify_level_flush_task,
+        'schedule': config.WORDS_LEVEL_FLUSH_INTERVAL_SECONDS,
+        'options': {'queue': QueueNamesEnum.default,
+                    'priority': CELERY_TASK_PRIORITIES[TasksNamesEnum.words_identify_level_flush_task]},
+    },
+}
+
 
 def import_celery_tasks_from_services():
     root, subdirs, files = next(os.walk(f'{os.getcwd()}/services/'))
@@ -61,6 +61,7 @@ class Settings(ps.BaseSettings):
     KEYCLOAK_CLIENT_SECRET: str
 
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: str = 'https://api.openai.com/v1'  # services/chatgpt/mock_server.py for local runs
 
     INTER_SERVICE_SECRET: str
 
@@ -101,3 +102,129 @@ settings = Settings(DOCKER, DEBUG, BASE_DIR)
 POSTGRES_DEBUG = os.getenv('POSTGRES_DEBUG', False) == 'True'
 ACCEPTABLE_HMAC_TIME_SECONDS = 10
 REDIS_CACHE_EXPIRES_IN_SECONDS = 5 * 60
+REPOSITORY_BULK_CHUNK_SIZE = int(os.getenv('REPOSITORY_BULK_CHUNK_SIZE', 1000))
+CURSOR_PAGINATION_MAX_LIMIT = int(os.getenv('CURSOR_PAGINATION_MAX_LIMIT', 500))
+# 'estimated' counts of paginated listings are exact ones cached for this long
+LISTING_COUNT_CACHE_EXPIRES_IN_SECONDS = int(os.getenv('LISTING_COUNT_CACHE_EXPIRES_IN_SECONDS', 5 * 60))
+
+# access tokens verification with keycloak realm's public keys
+KEYCLOAK_REALM_URL = f'{settings.KEYCLOAK_BASE_URL}/realms/{settings.KEYCLOAK_REALM}'
+# 'iss' of tokens, differs from KEYCLOAK_REALM_URL if keycloak is reached by other host than clients use
+JWT_ISSUER = os.getenv('JWT_ISSUER', KEYCLOAK_REALM_URL)
+JWT_JWKS_URL = os.getenv('JWT_JWKS_URL', f'{KEYCLOAK_REALM_URL}/protocol/openid-connect/certs')
+JWT_ALGORITHMS = os.getenv('JWT_ALGORITHMS', 'RS256').split(',')
+JWT_LEEWAY_SECONDS = int(os.getenv('JWT_LEEWAY_SECONDS', 10))
+JWT_CLAIMS_CACHE_SIZE = int(os.getenv('JWT_CLAIMS_CACHE_SIZE', 10_000))
+JWT_JWKS_TIMEOUT_SECONDS = int(os.getenv('JWT_JWKS_TIMEOUT_SECONDS', 5))
+JWT_JWKS_REFRESH_INTERVAL_SECONDS = int(os.getenv('JWT_JWKS_REFRESH_INTERVAL_SECONDS', 60 * 60))
+JWT_JWKS_MIN_REFRESH_INTERVAL_SECONDS = int(os.getenv('JWT_JWKS_MIN_REFRESH_INTERVAL_SECONDS', 10))
+JWT_JWKS_MAX_STALE_SECONDS = int(os.getenv('JWT_JWKS_MAX_STALE_SECONDS', 24 * 60 * 60))
+
+# two-tier (in-process lru, redis) cache, entries are recomputed by one worker at a time,
+# probabilistically before they expire (the earlier, the longer recompute takes and the bigger XFETCH_BETA is)
+TIERED_CACHE_LRU_SIZE = int(os.getenv('TIERED_CACHE_LRU_SIZE', 10_000))
+TIERED_CACHE_LRU_EXPIRES_IN_SECONDS = int(os.getenv('TIERED_CACHE_LRU_EXPIRES_IN_SECONDS', 60))
+TIERED_CACHE_XFETCH_BETA = float(os.getenv('TIERED_CACHE_XFETCH_BETA', 1.0))
+TIERED_CACHE_LOCK_TIMEOUT_SECONDS = float(os.getenv('TIERED_CACHE_LOCK_TIMEOUT_SECONDS', 10))
+TIERED_CACHE_LOCK_POLL_INTERVAL_SECONDS = float(os.getenv('TIERED_CACHE_LOCK_POLL_INTERVAL_SECONDS', 0.05))
+TIERED_CACHE_RETRY_INTERVAL_SECONDS = int(os.getenv('TIERED_CACHE_RETRY_INTERVAL_SECONDS', 10))
+CACHE_NAMESPACES_EXPIRES_IN_SECONDS = {
+    'word': int(os.getenv('CACHE_WORD_EXPIRES_IN_SECONDS', 10 * 60)),
+    'words_count': LISTING_COUNT_CACHE_EXPIRES_IN_SECONDS,
+    'file_index': int(os.getenv('CACHE_FILE_INDEX_EXPIRES_IN_SECONDS', 60 * 60)),
+    'file_variants': int(os.getenv('CACHE_FILE_VARIANTS_EXPIRES_IN_SECONDS', 60 * 60)),
+}
+
+# keycloak admin api client, admin token is refreshed this long before it expires
+KEYCLOAK_ADMIN_TIMEOUT_SECONDS = int(os.getenv('KEYCLOAK_ADMIN_TIMEOUT_SECONDS', 10))
+KEYCLOAK_ADMIN_CONNECT_TIMEOUT_SECONDS = int(os.getenv('KEYCLOAK_ADMIN_CONNECT_TIMEOUT_SECONDS', 5))
+KEYCLOAK_ADMIN_MAX_CONNECTIONS = int(os.getenv('KEYCLOAK_ADMIN_MAX_CONNECTIONS', 20))
+KEYCLOAK_ADMIN_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('KEYCLOAK_ADMIN_MAX_KEEPALIVE_CONNECTIONS', 10))
+KEYCLOAK_TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv('KEYCLOAK_TOKEN_REFRESH_MARGIN_SECONDS', 15))
+KEYCLOAK_CACHE_SIZE = int(os.getenv('KEYCLOAK_CACHE_SIZE', 10_000))
+KEYCLOAK_CACHE_EXPIRES_IN_SECONDS = int(os.getenv('KEYCLOAK_CACHE_EXPIRES_IN_SECONDS', 60))
+KEYCLOAK_SYNC_CONCURRENCY = int(os.getenv('KEYCLOAK_SYNC_CONCURRENCY', 10))
+KEYCLOAK_SYNC_PAGE_SIZE = int(os.getenv('KEYCLOAK_SYNC_PAGE_SIZE', 500))
+
+# users resolved from access tokens
+CURRENT_USER_CACHE_LRU_SIZE = int(os.getenv('CURRENT_USER_CACHE_LRU_SIZE', 10_000))
+CURRENT_USER_CACHE_LRU_EXPIRES_IN_SECONDS = int(os.getenv('CURRENT_USER_CACHE_LRU_EXPIRES_IN_SECONDS', 10))
+CURRENT_USER_CACHE_REDIS_EXPIRES_IN_SECONDS = int(os.getenv('CURRENT_USER_CACHE_REDIS_EXPIRES_IN_SECONDS', 5 * 60))
+
+# translation memory
+TRANSLATION_MEMORY_REDIS_EXPIRES_IN_SECONDS = int(os.getenv('TRANSLATION_MEMORY_REDIS_EXPIRES_IN_SECONDS', 24 * 60 * 60))
+TRANSLATION_MEMORY_TTL_DAYS = int(os.getenv('TRANSLATION_MEMORY_TTL_DAYS', 90))
+TRANSLATION_MEMORY_MAX_ROWS = int(os.getenv('TRANSLATION_MEMORY_MAX_ROWS', 1_000_000))
+
+# single word lemma/pos analysis cache
+ANALYSIS_CACHE_LRU_SIZE = int(os.getenv('ANALYSIS_CACHE_LRU_SIZE', 50_000))
+ANALYSIS_CACHE_REDIS_EXPIRES_IN_SECONDS = int(os.getenv('ANALYSIS_CACHE_REDIS_EXPIRES_IN_SECONDS', 7 * 24 * 60 * 60))
+
+# in-process index of words per language, kept fresh by changes published to redis
+VOCABULARY_INDEX_REBUILD_INTERVAL_SECONDS = int(os.getenv('VOCABULARY_INDEX_REBUILD_INTERVAL_SECONDS', 60 * 60))
+VOCABULARY_INDEX_RETRY_INTERVAL_SECONDS = int(os.getenv('VOCABULARY_INDEX_RETRY_INTERVAL_SECONDS', 10))
+
+# pooled client for requests to other services (api_nlp)
+INTER_SERVICE_TIMEOUT_SECONDS = int(os.getenv('INTER_SERVICE_TIMEOUT_SECONDS', 60))
+INTER_SERVICE_CONNECT_TIMEOUT_SECONDS = int(os.getenv('INTER_SERVICE_CONNECT_TIMEOUT_SECONDS', 5))
+INTER_SERVICE_MAX_CONNECTIONS = int(os.getenv('INTER_SERVICE_MAX_CONNECTIONS', 100))
+INTER_SERVICE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('INTER_SERVICE_MAX_KEEPALIVE_CONNECTIONS', 20))
+INTER_SERVICE_KEEPALIVE_EXPIRY_SECONDS = int(os.getenv('INTER_SERVICE_KEEPALIVE_EXPIRY_SECONDS', 30))
+INTER_SERVICE_HTTP2 = os.getenv('INTER_SERVICE_HTTP2', False) == 'True'  # requires 'h2'
+
+# files are stored in chunks of this size, read from db FILE_STORAGE_CHUNKS_PER_FETCH chunks at once
+FILE_STORAGE_CHUNK_SIZE = int(os.getenv('FILE_STORAGE_CHUNK_SIZE', 256 * 1024))
+FILE_STORAGE_CHUNKS_PER_FETCH = int(os.getenv('FILE_STORAGE_CHUNKS_PER_FETCH', 4))
+# file_storage rows hashed and merged by dedupe task per transaction
+FILE_DEDUPE_BATCH_SIZE = int(os.getenv('FILE_DEDUPE_BATCH_SIZE', 100))
+
+# raw bytes cache, blobs are stored in chunks compressed with BLOB_CACHE_COMPRESSION ('lz4', 'zstd' or 'none')
+# if it makes them smaller, bigger blobs than BLOB_CACHE_MAX_SIZE_BYTES are not cached
+BLOB_CACHE_COMPRESSION = os.getenv('BLOB_CACHE_COMPRESSION', 'lz4')  # 'zstd' requires 'zstandard'
+BLOB_CACHE_ZSTD_LEVEL = int(os.getenv('BLOB_CACHE_ZSTD_LEVEL', 3))
+BLOB_CACHE_COMPRESSION_MIN_SIZE = int(os.getenv('BLOB_CACHE_COMPRESSION_MIN_SIZE', 1024))
+BLOB_CACHE_MAX_SIZE_BYTES = int(os.getenv('BLOB_CACHE_MAX_SIZE_BYTES', 5 * 1024 * 1024))
+# same as FILE_STORAGE_CHUNK_SIZE, so that reading of file can continue from db at the same chunk
+BLOB_CACHE_CHUNK_SIZE = int(os.getenv('BLOB_CACHE_CHUNK_SIZE', FILE_STORAGE_CHUNK_SIZE))
+BLOB_CACHE_CHUNKS_PER_FETCH = int(os.getenv('BLOB_CACHE_CHUNKS_PER_FETCH', 4))
+BLOB_CACHE_EXPIRES_IN_SECONDS = int(os.getenv('BLOB_CACHE_EXPIRES_IN_SECONDS', 60 * 60))
+BLOB_CACHE_GRACE_SECONDS = int(os.getenv('BLOB_CACHE_GRACE_SECONDS', 60))
+
+# files are revalidated after FILE_HTTP_MAX_AGE_SECONDS, unless requested with ?v=<content_hash> (then immutable),
+# requests for more than FILE_HTTP_MAX_RANGES ranges are answered with whole file
+FILE_HTTP_MAX_AGE_SECONDS = int(os.getenv('FILE_HTTP_MAX_AGE_SECONDS', 24 * 60 * 60))
+FILE_HTTP_MAX_RANGES = int(os.getenv('FILE_HTTP_MAX_RANGES', 16))
+
+# uploaded images get resized variants of these widths (smaller than original) in FILE_IMAGE_VARIANT_FORMAT,
+# ('webp' or 'jpeg'), bigger images than FILE_IMAGE_MAX_SIZE_BYTES or FILE_IMAGE_MAX_PIXELS are served as they are
+FILE_IMAGE_VARIANT_WIDTHS = [int(width)
+                             for width in os.getenv('FILE_IMAGE_VARIANT_WIDTHS', '160,320,640,1280').split(',')]
+FILE_IMAGE_VARIANT_FORMAT = os.getenv('FILE_IMAGE_VARIANT_FORMAT', 'webp')
+FILE_IMAGE_VARIANT_QUALITY = int(os.getenv('FILE_IMAGE_VARIANT_QUALITY', 80))
+FILE_IMAGE_MAX_SIZE_BYTES = int(os.getenv('FILE_IMAGE_MAX_SIZE_BYTES', 30 * 1024 * 1024))
+FILE_IMAGE_MAX_PIXELS = int(os.getenv('FILE_IMAGE_MAX_PIXELS', 50_000_000))
+# image is queued for derivation at most once in this time, however often its missing variants are requested
+FILE_DERIVATIVES_QUEUED_EXPIRES_IN_SECONDS = int(os.getenv('FILE_DERIVATIVES_QUEUED_EXPIRES_IN_SECONDS', 60 * 60))
+FILE_DERIVATIVES_BACKFILL_BATCH_SIZE = int(os.getenv('FILE_DERIVATIVES_BACKFILL_BATCH_SIZE', 500))
+
+WORD_AUTOCOMPLETE_MAX_LIMIT = int(os.getenv('WORD_AUTOCOMPLETE_MAX_LIMIT', 50))
+WORD_CONTEXT_TRANSLATION_DEADLINE_SECONDS = float(os.getenv('WORD_CONTEXT_TRANSLATION_DEADLINE_SECONDS', 3))
+
+# chatgpt
+CHATGPT_READ_TIMEOUT_SECONDS = int(os.getenv('CHATGPT_READ_TIMEOUT_SECONDS', 30))
+CHATGPT_MAX_CONNECTIONS = int(os.getenv('CHATGPT_MAX_CONNECTIONS', 20))
+CHATGPT_REQUESTS_PER_MINUTE = int(os.getenv('CHATGPT_REQUESTS_PER_MINUTE', 500))
+CHATGPT_REQUESTS_BURST = int(os.getenv('CHATGPT_REQUESTS_BURST', 20))
+CHATGPT_CACHE_EXPIRES_IN_SECONDS = int(os.getenv('CHATGPT_CACHE_EXPIRES_IN_SECONDS', 7 * 24 * 60 * 60))
+
+# words CEFR level identification is batched, pending words are flushed on batch size or by periodic task
+WORDS_LEVEL_BATCH_SIZE = int(os.getenv('WORDS_LEVEL_BATCH_SIZE', 50))
+WORDS_LEVEL_FLUSH_INTERVAL_SECONDS = int(os.getenv('WORDS_LEVEL_FLUSH_INTERVAL_SECONDS', 60))
+# words of batches failed this many times are identified one by one instead
+WORDS_LEVEL_BATCH_MAX_ATTEMPTS = int(os.getenv('WORDS_LEVEL_BATCH_MAX_ATTEMPTS', 3))
+WORDS_LEVEL_ATTEMPTS_EXPIRES_IN_SECONDS = int(os.getenv('WORDS_LEVEL_ATTEMPTS_EXPIRES_IN_SECONDS', 24 * 60 * 60))
+
+# text ingestion: content is analyzed by nlp api in sentence chunks, words are bulk upserted
+TEXT_INGESTION_CHUNK_MAX_CHARS = int(os.getenv('TEXT_INGESTION_CHUNK_MAX_CHARS', 10_000))
+TEXT_INGESTION_CONCURRENCY = int(os.getenv('TEXT_INGESTION_CONCURRENCY', 4))
+TEXT_INGESTION_PROGRESS_EXPIRES_IN_SECONDS = int(os.getenv('TEXT_INGESTION_PROGRESS_EXPIRES_IN_SECONDS', 24 * 60 * 60))
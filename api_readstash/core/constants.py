@@ -499,10 +499,16 @@ LEVEL_ORDERS_CODES = {
 
 CELERY_TASK_PRIORITIES = {
     TasksNamesEnum.words_identify_level_task: QueueTaskPrioritiesEnum.q_1,
+    TasksNamesEnum.words_identify_level_batch_task: QueueTaskPrioritiesEnum.q_1,
+    TasksNamesEnum.words_identify_level_flush_task: QueueTaskPrioritiesEnum.q_1,
     TasksNamesEnum.texts_create_words_from_text: QueueTaskPrioritiesEnum.q_1,
     TasksNamesEnum.texts_identify_language_and_level_task: QueueTaskPrioritiesEnum.q_2,
     TasksNamesEnum.texts_identify_level_task: QueueTaskPrioritiesEnum.q_2,
     TasksNamesEnum.texts_identify_language_task: QueueTaskPrioritiesEnum.q_2,
+    TasksNamesEnum.translation_memory_cleanup_task: QueueTaskPrioritiesEnum.q_1,
+    TasksNamesEnum.files_dedupe_task: QueueTaskPrioritiesEnum.q_1,
+    TasksNamesEnum.files_create_derivatives_task: QueueTaskPrioritiesEnum.q_2,
+    TasksNamesEnum.files_create_derivatives_backfill_task: QueueTaskPrioritiesEnum.q_1,
 }
 PARTS_OF_SPEECH = {
     LanguagesISO2NamesEnum.RU: {
@@ -639,3 +645,9 @@ PARTS_OF_SPEECH = {
         "X": "outro"
     }
 }
+
+# localized part of speech name (as stored in word.pos) -> universal POS tag (as returned by nlp api)
+PARTS_OF_SPEECH_UPOS = {
+    iso2: {localized_pos: upos for upos, localized_pos in parts_of_speech.items()}
+    for iso2, parts_of_speech in PARTS_OF_SPEECH.items()
+}
@@ -114,6 +114,19 @@ class OrderEnum(StrEnumRepr):
     desc = 'desc'
 
 
+class CountModeEnum(StrEnumRepr):
+    none = 'none'
+    estimated = 'estimated'
+    exact = 'exact'
+
+
+class CacheNamespacesEnum(StrEnumRepr):
+    word = 'word'
+    words_count = 'words_count'
+    file_index = 'file_index'
+    file_variants = 'file_variants'
+
+
 class PeriodEnum(StrEnumRepr):
     days = 'days'
     hours = 'hours'
@@ -223,10 +236,20 @@ class UserTextStatusEnum(StrEnumRepr):
 
 class TasksNamesEnum(StrEnumRepr):
     words_identify_level_task = 'words_identify_level_task'
+    words_identify_level_batch_task = 'words_identify_level_batch_task'
+    words_identify_level_flush_task = 'words_identify_level_flush_task'
     texts_identify_language_task = 'texts_identify_language_task'
     texts_identify_level_task = 'texts_identify_level_task'
     texts_identify_language_and_level_task = 'texts_identify_language_and_level_task'
     texts_create_words_from_text = 'texts_create_words_from_text'
+    translation_memory_cleanup_task = 'translation_memory_cleanup_task'
+    files_dedupe_task = 'files_dedupe_task'
+    files_create_derivatives_task = 'files_create_derivatives_task'
+    files_create_derivatives_backfill_task = 'files_create_derivatives_backfill_task'
+
+
+class TranslationModelsEnum(StrEnumRepr):
+    marianmt = 'marianmt'
 
 
 class EnvEnum(StrEnumRepr):
@@ -43,6 +43,15 @@ class AlreadyExistsException(fa.HTTPException):
         )
 
 
+class RangeNotSatisfiableException(fa.HTTPException):
+    def __init__(self, size: int, detail=None):
+        super().__init__(
+            status_code=fa.status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail='range not satisfiable' if detail is None else detail,
+            headers={'Content-Range': f'bytes */{size}'},
+        )
+
+
 class UnauthorizedException(fa.HTTPException):
     def __init__(self, detail=None):
         super().__init__(
@@ -5,7 +5,7 @@ from functools import wraps
 
 import backoff
 import fastapi as fa
-from fastapi_resource_server import OidcResourceServer, JwtDecodeOptions
+from fastapi.security import OpenIdConnect
 from sqlalchemy.exc import ProgrammingError
 from starlette.middleware.base import BaseHTTPMiddleware
 
@@ -17,23 +17,26 @@ from core.logger_config import setup_logger
 from db.models.user import UserModel
 from db.serializers.user import UserCreateSerializer
 from scripts.migrate import migrate
+from services.token_verifier.token_verifier import TokenVerifier
+from services.user_manager.current_user_cache import CurrentUserCache
 from services.user_manager.user_manager import user_manager_dependency, UserManager
 
 logger = setup_logger('security')
 
-issuer = f"{settings.KEYCLOAK_BASE_URL}/realms/{settings.KEYCLOAK_REALM}"
-logger.debug(f"Fetching oauth2_scheme: {issuer=}")
-
-oauth2_scheme = OidcResourceServer(
-    issuer=issuer,
-    jwt_decode_options=JwtDecodeOptions(verify_aud=False, verify_signature=None, verify_iat=None, verify_exp=None,
-                                        verify_nbf=None, verify_iss=None, verify_sub=None, verify_jti=None,
-                                        verify_at_hash=None, require_aud=None, require_iat=None, require_exp=None,
-                                        require_nbf=None, require_iss=None, require_sub=None, require_jti=None,
-                                        require_at_hash=None, leeway=None),
+# only describes auth flow for openapi docs, tokens are verified by TokenVerifier
+openid_connect_scheme = OpenIdConnect(
+    openIdConnectUrl=f'{config.KEYCLOAK_REALM_URL}/.well-known/openid-configuration',
+    auto_error=False,
 )
 
 
+async def token_claims_dependency(authorization: str | None = fa.Security(openid_connect_scheme)) -> dict:
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        raise UnauthorizedException(detail='bearer token is required')
+    return await TokenVerifier().verify(token)
+
+
 def auth_required(roles):
     def decorator(func):
         @wraps(func)
@@ -60,7 +63,7 @@ auth_head_or_admin = auth_required([UserRolesEnum.head, UserRolesEnum.admin])
                       max_tries=1)
 async def current_user_dependency(
         user_manager: UserManager = fa.Depends(user_manager_dependency),
-        keycloak_data: dict = fa.Security(oauth2_scheme)) -> UserModel | None:
+        keycloak_data: dict = fa.Depends(token_claims_dependency)) -> UserModel | None:
     user_ser = UserCreateSerializer(
         uuid=keycloak_data.get('sub'),
         email=keycloak_data.get('email'),
@@ -69,19 +72,28 @@ async def current_user_dependency(
         roles=[r for r in keycloak_data.get('realm_access').get('roles') if r in (ur for ur in UserRolesEnum)],
     )
 
+    current_user_cache = CurrentUserCache()
+    claims_hash = current_user_cache.claims_hash(user_ser)
+    user = await current_user_cache.get(user_ser.uuid, claims_hash)
+    if user is not None:
+        return user
+
     user = await user_manager.repo_write.get(UserModel, raise_if_not_found=False, email=user_ser.email)
     if user is None:
-        return await user_manager.repo_write.create(UserModel, user_ser)
-    kc_user_is_the_same = (
-            user_ser.email == user.email and
-            user_ser.first_name == user.first_name and
-            user_ser.last_name == user.last_name and
-            user_ser.roles == user.roles
-    )
-    if kc_user_is_the_same:
-        return user
+        user = await user_manager.repo_write.create(UserModel, user_ser)
     else:
-        return await user_manager.get_or_create_or_update_user(user_ser)
+        kc_user_is_the_same = (
+                user_ser.email == user.email and
+                user_ser.first_name == user.first_name and
+                user_ser.last_name == user.last_name and
+                user_ser.roles == user.roles
+        )
+        if not kc_user_is_the_same:
+            user = await user_manager.get_or_create_or_update_user(user_ser)
+    # invalidation is done by user.uuid, so only users matching their 'sub' are cached
+    if user.uuid == user_ser.uuid:
+        await current_user_cache.set(user_ser.uuid, claims_hash, user)
+    return user
 
 
 async def generate_timestamp_hmac() -> tuple[int, str]:
@@ -1,9 +1,12 @@
+import asyncio
 import base64
 import datetime as dt
 import re
 import uuid
 from enum import Enum
 
+import httpx
+
 from core import config
 from core.config import settings
 from core.enums import ResponseDetailEnum
@@ -22,6 +25,17 @@ def singleton_decorator(cls):
     return get_instance
 
 
+def close_client_on_its_loop(client: httpx.AsyncClient | None, loop: asyncio.AbstractEventLoop | None) -> None:
+    """
+    close pooled client of event loop that is replaced by other one: right away if loop runs in other thread,
+    otherwise once it runs again (f.e. celery task reusing it). connections of closed loop can't be closed on it,
+    client is just dropped then
+    """
+    if client is None or client.is_closed or loop is None or loop.is_closed():
+        return
+    asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+
 async def custom_serialize(
         obj: dict | bytes | str | Enum | list | None) -> dict | list | str | int | float | dt.datetime | None:
     if obj is None \
@@ -86,3 +100,12 @@ async def pagination_params_dependency(limit: int = 50, offset: int = 0):
         'limit': limit,
         'offset': offset
     }
+
+
+async def cursor_pagination_params_dependency(limit: int = 50, cursor: str | None = None):
+    """keyset pagination, cursor is 'next_cursor' of previous page"""
+    assert 0 < limit <= config.CURSOR_PAGINATION_MAX_LIMIT, f'limit must be in 1..{config.CURSOR_PAGINATION_MAX_LIMIT}'
+    return {
+        'limit': limit,
+        'cursor': cursor
+    }
@@ -13,6 +13,7 @@ def init_models():
     from db.models import grammar  # noqa
     from db.models import phrase  # noqa
     from db.models import text  # noqa
+    from db.models import translation_memory  # noqa
     from db.models import user  # noqa
     from db.models import word  # noqa
     from db.models import periodic_task  # noqa
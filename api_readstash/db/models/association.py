@@ -52,6 +52,26 @@ class UserTextStatusAssoc(IdentifiedWithIntMixin, Base):
                 f'{self.id=}, {self.user_uuid=}, {self.text_uuid=}, {self.status=}')
 
 
+class TextWordAssoc(IdentifiedWithIntMixin, Base):
+    """association table for text's words (lemmas), filled by text ingestion."""
+    __tablename__ = 'text_word'
+
+    text_uuid = sa.Column(
+        sa.UUID(as_uuid=False), sa.ForeignKey('text.uuid', ondelete='CASCADE'), nullable=False)
+    word_uuid = sa.Column(
+        sa.UUID(as_uuid=False), sa.ForeignKey('word.uuid', ondelete='CASCADE'), nullable=False, index=True)
+    occurrences = sa.Column(sa.Integer, nullable=False, server_default=sa.text('1'))
+
+    __table_args__ = (
+        # conflict target of bulk upserts, also serves lookups by text_uuid
+        sa.UniqueConstraint('text_uuid', 'word_uuid', name='uq_text_word_text_uuid_word_uuid'),
+    )
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__} '
+                f'{self.id=}, {self.text_uuid=}, {self.word_uuid=}, {self.occurrences=}')
+
+
 # class WordTranslationAssoc(IdentifiedWithIntMixin, IdentifiedWithUuidMixin, CreatedUpdatedMixin, IsActiveMixin, Base):
 #     __tablename__ = 'word_translation'
 #
@@ -13,18 +13,52 @@ class FileIndexModel(IdentifiedWithIntMixin, IdentifiedWithUuidMixin, CreatedUpd
 
     name = sa.Column(sa.String)
     content_type = sa.Column(sa.String)
-    file_storage_uuid = sa.Column(sa.UUID(as_uuid=False), unique=True, nullable=False)
+    # file_storage rows are shared by file_index rows of same content
+    file_storage_uuid = sa.Column(sa.UUID(as_uuid=False), nullable=False, index=True)
+    # sha256 hex of data, strong etag
+    content_hash = sa.Column(sa.String(64))
+    size = sa.Column(sa.BigInteger)
+    # variants (resized images) point to file_index they are derived from
+    parent_uuid = sa.Column(sa.UUID(as_uuid=False), sa.ForeignKey('file_index.uuid', ondelete='CASCADE'), index=True)
+    # of images, set on originals once their variants are derived
+    width = sa.Column(sa.Integer)
+    height = sa.Column(sa.Integer)
+
+    __table_args__ = (
+        sa.UniqueConstraint('parent_uuid', 'width', name='unique_parent_uuid_width'),
+    )
 
     def __repr__(self):
         return (f'{self.__class__.__name__} '
-                f'{self.id=}, {self.uuid=}, {self.file_storage_uuid=}, {self.name=}, {self.content_type=}')
+                f'{self.id=}, {self.uuid=}, {self.file_storage_uuid=}, {self.name=}, {self.content_type=}, '
+                f'{self.parent_uuid=}, {self.width=}')
 
 
 class FileStorageModel(IdentifiedWithIntMixin, IdentifiedWithUuidMixin, CreatedUpdatedMixin, BaseObjStorage):
     __tablename__ = 'file_storage'
 
-    file_data = sa.Column(postgresql.BYTEA(), nullable=False)
+    # data is in file_chunk rows, so that it is read and written in parts
+    size = sa.Column(sa.BigInteger, nullable=False, server_default=sa.text('0'))
+    # all chunks but last are of this size, so that byte ranges are read without preceding chunks
+    chunk_size = sa.Column(sa.Integer, nullable=False, server_default=sa.text(str(256 * 1024)))
+    # sha256 hex of data, same content is stored once, null for rows not hashed by dedupe task yet
+    content_hash = sa.Column(sa.String(64), unique=True)
+    # number of file_index rows pointing to this one, it is removed with the last of them
+    ref_count = sa.Column(sa.Integer, nullable=False, server_default=sa.text('1'))
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__} '
+                f'{self.id=}, {self.uuid=}, {self.size=}, {self.ref_count=}')
+
+
+class FileChunkModel(BaseObjStorage):
+    __tablename__ = 'file_chunk'
+
+    file_storage_uuid = sa.Column(sa.UUID(as_uuid=False), sa.ForeignKey('file_storage.uuid', ondelete='CASCADE'),
+                                  primary_key=True)
+    index = sa.Column(sa.Integer, primary_key=True)
+    data = sa.Column(postgresql.BYTEA(), nullable=False)
 
     def __repr__(self):
         return (f'{self.__class__.__name__} '
-                f'{self.id=}, {self.uuid=}')
+                f'{self.file_storage_uuid=}, {self.index=}')
@@ -0,0 +1,32 @@
+import sqlalchemy as sa
+
+from db import Base
+from db.models._shared import CreatedUpdatedMixin, IdentifiedWithIntMixin
+
+
+class TranslationMemoryModel(IdentifiedWithIntMixin, CreatedUpdatedMixin, Base):
+    """
+    durable translation memory, redis holds the hot part of it.
+    text_hash is sha256 of normalized text_input, so lookups use short fixed-size unique index.
+    rows not used for TRANSLATION_MEMORY_TTL_DAYS or beyond TRANSLATION_MEMORY_MAX_ROWS (least recently used first)
+    are deleted by periodic translation_memory_cleanup_task.
+    """
+    __tablename__ = 'translation_memory'
+
+    text_hash = sa.Column(sa.String(64), nullable=False)
+    input_lang_iso2 = sa.Column(sa.String(2), nullable=False)
+    target_lang_iso2 = sa.Column(sa.String(2), nullable=False)
+    model = sa.Column(sa.String(50), nullable=False)
+    text_input = sa.Column(sa.Text, nullable=False)
+    text_output = sa.Column(sa.Text, nullable=False)
+    hits = sa.Column(sa.Integer, nullable=False, server_default=sa.text('0'))
+    last_used_at = sa.Column(sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False, index=True)
+
+    __table_args__ = (
+        sa.UniqueConstraint('text_hash', 'input_lang_iso2', 'target_lang_iso2', 'model',
+                            name='uq_translation_memory_text_hash_langs_model'),
+    )
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__} '
+                f'{self.id=}, {self.input_lang_iso2=}, {self.target_lang_iso2=}, {self.model=}, {self.text_hash=}')
@@ -25,6 +25,23 @@ class WordModel(IdentifiedWithIntMixin, IdentifiedWithUuidMixin, CreatedUpdatedM
     language_iso_2 = sa.Column(sa.String(2), nullable=True, index=True)
     level_cefr_code = sa.Column(sa.String(2), nullable=True, index=True)
 
+    __table_args__ = (
+        # conflict target of bulk upserts
+        sa.UniqueConstraint('characters', 'language_iso_2', name='uq_word_characters_language_iso_2'),
+        # keyset pagination of language's words by (order_by column, id)
+        sa.Index('ix_word_language_iso_2_created_at_id', 'language_iso_2', 'created_at', 'id'),
+        sa.Index('ix_word_language_iso_2_updated_at_id',
+                 'language_iso_2', sa.text('coalesce(updated_at, created_at)'), 'id'),
+        sa.Index('ix_word_language_iso_2_characters_id', 'language_iso_2', 'characters', 'id'),
+        # substring (ilike '%...%') and similarity search
+        sa.Index('ix_word_characters_trgm', 'characters',
+                 postgresql_using='gin', postgresql_ops={'characters': 'gin_trgm_ops'}),
+        sa.Index('ix_word_lemma_trgm', 'lemma',
+                 postgresql_using='gin', postgresql_ops={'lemma': 'gin_trgm_ops'}),
+        # autocomplete by prefix as range scan, byte order of "C" collation doesn't depend on locale
+        sa.Index('ix_word_language_iso_2_characters_lower_c', 'language_iso_2', sa.text('lower(characters) COLLATE "C"')),
+    )
+
     _image_file_index = relationship('FileIndexModel',
                                      secondary='user_word_status_file',
                                      primaryjoin="and_(WordModel.uuid == UserWordStatusFileAssoc.word_uuid, "
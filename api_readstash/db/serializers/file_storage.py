@@ -3,18 +3,13 @@ import datetime as dt
 import pydantic as pd
 
 
-class FileStorageUpdateSerializer(pd.BaseModel):
-    file_data: bytes
-
-
-class FileStorageCreateSerializer(pd.BaseModel):
-    file_data: bytes
-
-
-class FileStorageReadAsyncCachedSerializer(pd.BaseModel):
-    file_data: bytes
+class FileStorageReadSerializer(pd.BaseModel):
     id: int
     uuid: str
+    size: int
+    chunk_size: int
+    content_hash: str | None = None
+    ref_count: int
     created_at: dt.datetime
     updated_at: dt.datetime | None = None
 
@@ -25,14 +20,19 @@ class FileStorageReadAsyncCachedSerializer(pd.BaseModel):
 class FileIndexUpdateSerializer(pd.BaseModel):
     name: str | None = None
     content_type: str | None = None
+    content_hash: str | None = None
+    size: int | None = None
+    parent_uuid: str | None = None
+    width: int | None = None
+    height: int | None = None
+
+    file_storage_uuid: str | None = None
 
 
 class FileIndexCreateSerializer(FileIndexUpdateSerializer):
     name: str | None = None
     content_type: str | None = None
 
-    file_storage_uuid: str | None = None
-
 
 class FileIndexReadSerializer(FileIndexCreateSerializer):
     id: int
@@ -59,6 +59,11 @@ class FileIndexReadAsyncCachedSerializer(pd.BaseModel):
 
     name: str
     content_type: str
+    content_hash: str | None = None
+    size: int | None = None
+    parent_uuid: str | None = None
+    width: int | None = None
+    height: int | None = None
 
     file_storage_uuid: str
 
@@ -16,6 +16,18 @@ class TranslNlpAPIOutSerializer(pd.BaseModel):
     target_lang_iso2: LanguagesISO2NamesEnum
 
 
+class TranslNlpAPIBatchInSerializer(pd.BaseModel):
+    segments: list[TranslNlpAPIInSerializer]
+
+
+class TranslNlpAPIBatchItemOutSerializer(pd.BaseModel):
+    index: int
+    text_output: str | None = None
+    input_lang_iso2: LanguagesISO2NamesEnum
+    target_lang_iso2: LanguagesISO2NamesEnum
+    error: str | None = None
+
+
 class TranslWordInSerializer(pd.BaseModel):
     word_input: str
     context_input: str
@@ -27,7 +39,7 @@ class TranslWordOutSerializer(pd.BaseModel):
     word_input: str
     word_output: str
     word_pos: str
-    context_output: str
+    context_output: str | None = None
     input_lang_iso2: LanguagesISO2NamesEnum
     target_lang_iso2: LanguagesISO2NamesEnum
     lemma_word: 'WordReadSerializer'
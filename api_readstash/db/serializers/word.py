@@ -32,6 +32,15 @@ class WordReadSerializer(WordCreateSerializer):
         from_attributes = True
 
 
+class WordAutocompleteSerializer(pd.BaseModel):
+    uuid: str
+    characters: str
+    lemma: str | None = None
+    pos: str | None = None
+    level_cefr_code: LevelCEFRCodesEnum | None = None
+    rank: float
+
+
 class WordOrderByEnum(str, Enum):
     created_at = 'created_at'
     updated_at = 'updated_at'
@@ -62,5 +71,6 @@ async def word_params_dependency(
 
 class WordsPaginatedSerializer(pd.BaseModel):
     words: list[WordReadSerializer] = []
-    total_count: int
-    filtered_count: int
+    next_cursor: str | None = None
+    total_count: int | None = None
+    filtered_count: int | None = None
@@ -1,9 +1,13 @@
+import asyncio
+
 import fastapi as fa
 import uvicorn
 from contextlib import asynccontextmanager
 from fastapi.responses import ORJSONResponse
 
 from api.v1.auth import (
+    files as v1_auth_files,
+    metrics as v1_auth_metrics,
     postgres as v1_auth_postgres,
     users as v1_auth_users,
     words as v1_auth_words,
@@ -11,6 +15,7 @@ from api.v1.auth import (
     translations as v1_auth_translations,
 )
 from api.v1.public import (
+    files as v1_public_files,
     languages as v1_public_languages,
     words as v1_public_words,
     # translations as v1_public_translations,
@@ -22,6 +27,12 @@ from core.security import current_user_dependency, VerifyHMACMiddleware
 from db import init_models
 from scripts.recreate import recreate_test_data
 from services.cache.cache import RedisCache
+from services.cache.tiered_cache import TieredCache
+from services.chatgpt.chatgpt import ChatGPTClient
+from services.inter_service_manager.inter_service_manager import InterServiceManager
+from services.keycloak.keycloak import KCAdmin
+from services.word_manager.analysis_cache import WordAnalysisCache
+from services.word_manager.vocabulary_index import VocabularyIndex
 
 
 @asynccontextmanager
@@ -31,9 +42,19 @@ async def lifespan(app: fa.FastAPI):
     init_models()
     if config.DEBUG:
         await recreate_test_data()
+    # in background, so that startup does not wait for whole 'word' table
+    prewarm_task = asyncio.create_task(WordAnalysisCache().prewarm())
+    vocabulary_index_task = asyncio.create_task(VocabularyIndex().run())
+    tiered_cache_task = asyncio.create_task(TieredCache().run())
 
     # shutdown
     yield
+    prewarm_task.cancel()
+    vocabulary_index_task.cancel()
+    tiered_cache_task.cancel()
+    await InterServiceManager().close()
+    await ChatGPTClient().close()
+    await KCAdmin().close()
     await RedisCache().close()
 
 
@@ -60,10 +81,13 @@ v1_router_auth.include_router(v1_auth_users.router, prefix='/users', tags=['user
 v1_router_auth.include_router(v1_auth_words.router, prefix='/words', tags=['words'])
 v1_router_auth.include_router(v1_auth_texts.router, prefix='/texts', tags=['texts'])
 v1_router_auth.include_router(v1_auth_translations.router, prefix='/translations', tags=['translations'])
+v1_router_auth.include_router(v1_auth_files.router, prefix='/files', tags=['files'])
+v1_router_auth.include_router(v1_auth_metrics.router, prefix='/metrics', tags=['metrics'])
 
 v1_router_public = fa.APIRouter(prefix='/public')
 v1_router_public.include_router(v1_public_languages.router, prefix='/languages', tags=['languages'])
 v1_router_public.include_router(v1_public_words.router, prefix='/words', tags=['words'])
+v1_router_public.include_router(v1_public_files.router, prefix='/files', tags=['files'])
 # v1_router_public.include_router(v1_public_translations.router, prefix='/translations', tags=['translations'])
 
 app.include_router(v1_router_auth, prefix="/api/v1")
@@ -41,9 +41,9 @@ async def recreate_test_users():
     async with SessionLocalAsync() as session:
         repo_write = SqlAlchemyRepositoryAsync(session)
         user_manager = UserManager(repo_write)
-        for user in test_users:
-            user_ser = UserCreateSerializer(email=user['email'], first_name=user['name'], roles=user['roles'])
-            await user_manager.get_or_create_or_update_user(user_ser, password=user['password'])
+        user_sers = [UserCreateSerializer(email=user['email'], first_name=user['name'], roles=user['roles'])
+                     for user in test_users]
+        await user_manager.sync_users(user_sers, password='test')
 
 
 test_texts = {
@@ -0,0 +1,216 @@
+import uuid
+from pathlib import Path
+from typing import AsyncIterator
+
+import orjson
+from redis.exceptions import RedisError
+
+from core import config
+from core.logger_config import setup_logger
+from core.shared import singleton_decorator
+from services.cache.cache import RedisCache
+
+logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# first byte of every stored chunk tells how the rest is encoded
+RAW, LZ4, ZSTD = b'\x00', b'\x01', b'\x02'
+
+
+class BlobCacheMissException(Exception):
+    """chunk of blob was evicted or expired while blob was being read"""
+    pass
+
+
+def _get_codec() -> bytes:
+    if config.BLOB_CACHE_COMPRESSION == 'lz4' and lz4 is not None:
+        return LZ4
+    if config.BLOB_CACHE_COMPRESSION == 'zstd' and zstandard is not None:
+        return ZSTD
+    if config.BLOB_CACHE_COMPRESSION not in ('none', ''):
+        logger.warning(f"'{config.BLOB_CACHE_COMPRESSION}' is not installed, blobs are cached uncompressed")
+    return RAW
+
+
+def _encode(chunk: bytes, codec: bytes) -> bytes:
+    """chunks that don't get smaller (f.e. jpeg, mp3) are kept raw"""
+    if codec == LZ4:
+        compressed = lz4.frame.compress(chunk)
+    elif codec == ZSTD:
+        compressed = zstandard.ZstdCompressor(level=config.BLOB_CACHE_ZSTD_LEVEL).compress(chunk)
+    else:
+        return RAW + chunk
+    return codec + compressed if len(compressed) < len(chunk) else RAW + chunk
+
+
+def _decode(stored: bytes) -> bytes:
+    codec, data = stored[:1], stored[1:]
+    if codec == LZ4:
+        return lz4.frame.decompress(data)
+    if codec == ZSTD:
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+class BlobWriter:
+    """
+    writes blob chunk by chunk as it is produced (f.e. streamed from db), blob becomes visible with commit.
+    chunks are written under new generation, so readers of previous version are not affected
+    """
+
+    def __init__(self, blob_cache: 'RedisBlobCache', key: str, compress: bool, expires_in_seconds: int,
+                 chunk_size: int):
+        self.blob_cache = blob_cache
+        self.key = key
+        self.chunk_size = chunk_size
+        self.generation = uuid.uuid4().hex
+        self.codec = blob_cache.codec if compress else RAW
+        self.expires_in_seconds = expires_in_seconds
+        self.size = 0
+        self.chunks = 0
+        self.stored_size = 0
+        self.failed = False
+
+    async def write(self, chunk: bytes) -> None:
+        if self.failed:
+            return
+        if not self.blob_cache.admits(self.size + len(chunk)):
+            self.failed = True
+            self.blob_cache.stats['rejected'] += 1
+            return
+        stored = _encode(chunk, self.codec if len(chunk) >= config.BLOB_CACHE_COMPRESSION_MIN_SIZE else RAW)
+        chunk_key = self.blob_cache.chunk_key(self.key, self.generation, self.chunks)
+        try:
+            # chunks outlive meta, so that blob doesn't expire while being read
+            await self.blob_cache.redis.set(chunk_key, stored, self.expires_in_seconds + config.BLOB_CACHE_GRACE_SECONDS)
+        except RedisError as e:
+            self.failed = True
+            logger.error(f"can't set {chunk_key}: {e}")
+            return
+        self.size += len(chunk)
+        self.stored_size += len(stored)
+        self.chunks += 1
+
+    async def commit(self) -> bool:
+        if self.failed:
+            return False
+        meta = {'generation': self.generation, 'size': self.size, 'chunks': self.chunks, 'chunk_size': self.chunk_size}
+        try:
+            await self.blob_cache.redis.set(self.blob_cache.meta_key(self.key), orjson.dumps(meta),
+                                            self.expires_in_seconds)
+        except RedisError as e:
+            logger.error(f"can't set {self.key}: {e}")
+            return False
+        self.blob_cache.stats['sets'] += 1
+        self.blob_cache.stats['bytes_set'] += self.size
+        self.blob_cache.stats['bytes_stored'] += self.stored_size
+        return True
+
+
+@singleton_decorator
+class RedisBlobCache:
+    """
+    raw bytes in redis, without base64 and json around them.
+    blob is stored as meta key (size, chunks count, chunk size, generation) and chunk keys of up to chunk size,
+    compressed with lz4 or zstd (if installed) when it makes them smaller,
+    so that large blobs are read and written in parts and can be streamed out of cache.
+    blobs over BLOB_CACHE_MAX_SIZE_BYTES are not admitted.
+    """
+    key_prefix = 'blob'
+
+    def __init__(self):
+        self.redis = RedisCache().redis
+        self.codec = _get_codec()
+        self.stats = {'hits': 0, 'misses': 0, 'sets': 0, 'rejected': 0, 'broken': 0,
+                      'bytes_set': 0, 'bytes_stored': 0, 'bytes_read': 0}
+
+    @classmethod
+    def meta_key(cls, key: str) -> str:
+        return f'{cls.key_prefix}:{key}'
+
+    @classmethod
+    def chunk_key(cls, key: str, generation: str, index: int) -> str:
+        return f'{cls.key_prefix}:{key}:{generation}:{index}'
+
+    @staticmethod
+    def admits(size: int) -> bool:
+        return size <= config.BLOB_CACHE_MAX_SIZE_BYTES
+
+    def writer(self, key: str, compress: bool = True,
+               expires_in_seconds: int = config.BLOB_CACHE_EXPIRES_IN_SECONDS,
+               chunk_size: int = config.BLOB_CACHE_CHUNK_SIZE) -> BlobWriter:
+        """chunk_size is the size of all chunks but last, that is going to be written"""
+        return BlobWriter(self, key, compress, expires_in_seconds, chunk_size)
+
+    async def get_meta(self, key: str) -> dict | None:
+        try:
+            meta = await self.redis.get(self.meta_key(key))
+        except RedisError as e:
+            logger.error(f"can't get {key}: {e}")
+            meta = None
+        if meta is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return orjson.loads(meta)
+
+    async def iter_chunks(self, key: str, meta: dict, start: int = 0, stop: int | None = None) -> AsyncIterator[bytes]:
+        """chunks from start index up to stop index, fetched BLOB_CACHE_CHUNKS_PER_FETCH at once"""
+        stop = meta['chunks'] if stop is None else min(stop, meta['chunks'])
+        for batch_start in range(start, stop, config.BLOB_CACHE_CHUNKS_PER_FETCH):
+            indexes = range(batch_start, min(batch_start + config.BLOB_CACHE_CHUNKS_PER_FETCH, stop))
+            try:
+                stored_chunks = await self.redis.mget(
+                    [self.chunk_key(key, meta['generation'], i) for i in indexes])
+            except RedisError as e:
+                raise BlobCacheMissException(f"can't get chunks of {key}: {e}")
+            for i, stored in zip(indexes, stored_chunks):
+                if stored is None:
+                    self.stats['broken'] += 1
+                    raise BlobCacheMissException(f'chunk {i} of {key} is missing')
+                chunk = _decode(stored)
+                self.stats['bytes_read'] += len(chunk)
+                yield chunk
+
+    async def get(self, key: str) -> bytes | None:
+        meta = await self.get_meta(key)
+        if meta is None:
+            return None
+        try:
+            return b''.join([chunk async for chunk in self.iter_chunks(key, meta)])
+        except BlobCacheMissException as e:
+            logger.warning(str(e))
+            return None
+
+    async def set(self, key: str, data: bytes, compress: bool = True,
+                  expires_in_seconds: int = config.BLOB_CACHE_EXPIRES_IN_SECONDS) -> bool:
+        writer = self.writer(key, compress, expires_in_seconds)
+        for i in range(0, max(len(data), 1), config.BLOB_CACHE_CHUNK_SIZE):
+            await writer.write(data[i:i + config.BLOB_CACHE_CHUNK_SIZE])
+        return await writer.commit()
+
+    async def delete(self, *keys: str) -> None:
+        """chunks are left to expire, readers in progress finish reading them"""
+        if not keys:
+            return
+        try:
+            await self.redis.delete(*(self.meta_key(key) for key in keys))
+        except RedisError as e:
+            logger.error(f"can't delete {keys}: {e}")
+
+    def get_metrics(self) -> dict:
+        return {
+            **self.stats,
+            'codec': {RAW: None, LZ4: 'lz4', ZSTD: 'zstd'}[self.codec],
+            'compression_ratio': self.stats['bytes_stored'] / self.stats['bytes_set']
+            if self.stats['bytes_set'] else None,
+        }
@@ -1,4 +1,6 @@
+import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from pathlib import Path
 
 import backoff
@@ -25,6 +27,39 @@ class Cache(ABC):
         pass
 
 
+class LRUCache(Cache):
+    """in-process cache, keeps up to max_size most recently used entries, optionally expiring"""
+
+    def __init__(self, max_size: int, expires_in_seconds: int | None = None):
+        self.max_size = max_size
+        self.expires_in_seconds = expires_in_seconds
+        self.data: OrderedDict[str, tuple[float | None, object]] = OrderedDict()
+
+    def set_cache(self, cache_key: str, data):
+        expires_at = time.monotonic() + self.expires_in_seconds if self.expires_in_seconds is not None else None
+        self.data[cache_key] = (expires_at, data)
+        self.data.move_to_end(cache_key)
+        while len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+
+    def get_cache(self, cache_key: str):
+        entry = self.data.get(cache_key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self.data[cache_key]
+            return None
+        self.data.move_to_end(cache_key)
+        return data
+
+    def delete_cache(self, cache_key: str):
+        self.data.pop(cache_key, None)
+
+    def clear(self):
+        self.data.clear()
+
+
 @singleton_decorator
 class RedisCache(Cache):
 
@@ -32,11 +67,12 @@ class RedisCache(Cache):
         self.redis: Redis = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
 
     @backoff.on_exception(backoff.constant, (ConnectionError, RedisError), interval=1, max_tries=5)
-    async def set_cache(self, cache_key: str, obj: dict):
+    async def set_cache(self, cache_key: str, obj: dict,
+                        expires_in_seconds: int = config.REDIS_CACHE_EXPIRES_IN_SECONDS):
         obj_dict = await custom_serialize(obj)
         data: bytes = orjson.dumps(obj_dict)
         try:
-            await self.redis.set(cache_key, data, config.REDIS_CACHE_EXPIRES_IN_SECONDS)
+            await self.redis.set(cache_key, data, expires_in_seconds)
             logger.debug('set by {}, {}'.format(cache_key, str(data)[:10]))
         except (TypeError, RedisError) as e:
             logger.error("can't set by {}, {}".format(cache_key, e))
@@ -0,0 +1,271 @@
+import asyncio
+import math
+import random
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, TypeVar
+
+import orjson
+from redis.exceptions import RedisError
+
+from core import config
+from core.enums import CacheNamespacesEnum
+from core.logger_config import setup_logger
+from core.shared import singleton_decorator
+from services.cache.cache import LRUCache, RedisCache
+
+logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
+
+T = TypeVar('T')
+
+# lock is released only by its holder, not by other worker after it expired and was taken again
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# computed value is stored only if key was not invalidated since computation started
+SET_IF_GENERATION_SCRIPT = """
+if (redis.call('get', KEYS[2]) or '0') == ARGV[3] then
+    redis.call('set', KEYS[1], ARGV[1], 'ex', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+@singleton_decorator
+class TieredCache:
+    """
+    cache of json serializable values in namespaces, with in-process lru in front of redis.
+    entries expire in CACHE_NAMESPACES_EXPIRES_IN_SECONDS of their namespace, but are recomputed earlier
+    with probability growing towards expiry (XFetch), so that popular keys rarely expire under load.
+    recompute is single-flight: concurrent callers in process wait for one computation,
+    other processes wait for redis lock holder's result (or get stale value while it recomputes).
+    invalidations are published to redis channel and evict lru entries in every subscribed process,
+    lru is used only while subscribed (f.e. not in celery workers), so that it is never stale for long.
+    invalidation also bumps generation of key, values computed from data read before it are not stored.
+    """
+    channel = 'tiered_cache:invalidations'
+    lock_prefix = 'tiered_cache_lock'
+    generation_prefix = 'tiered_cache_generation'
+
+    def __init__(self):
+        self.redis_cache = RedisCache()
+        self.lru = LRUCache(max_size=config.TIERED_CACHE_LRU_SIZE,
+                            expires_in_seconds=config.TIERED_CACHE_LRU_EXPIRES_IN_SECONDS)
+        self.subscribed = False
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self.stats = {'lru_hits': 0, 'redis_hits': 0, 'misses': 0, 'early_recomputes': 0, 'computes': 0,
+                      'coalesced': 0, 'lock_waits': 0, 'stale_served': 0, 'stale_discarded': 0,
+                      'invalidations_sent': 0, 'invalidations_received': 0}
+
+    @staticmethod
+    def _key(namespace: CacheNamespacesEnum | str, key: str) -> str:
+        return f'{namespace}:{key}'
+
+    def _generation_key(self, full_key: str) -> str:
+        return f'{self.generation_prefix}:{full_key}'
+
+    @staticmethod
+    def expires_in_seconds(namespace: CacheNamespacesEnum | str) -> int:
+        return config.CACHE_NAMESPACES_EXPIRES_IN_SECONDS.get(str(namespace), config.REDIS_CACHE_EXPIRES_IN_SECONDS)
+
+    @staticmethod
+    def _should_recompute_early(entry: dict) -> bool:
+        # -log of (0, 1] is exponentially distributed, mostly small
+        gap = -entry['delta'] * config.TIERED_CACHE_XFETCH_BETA * math.log(1 - random.random())
+        return time.time() + gap >= entry['expires_at']
+
+    async def _get_redis_entry(self, full_key: str) -> dict | None:
+        try:
+            raw = await self.redis_cache.redis.get(full_key)
+        except RedisError as e:
+            logger.error(f"can't get {full_key}: {e}")
+            return None
+        return orjson.loads(raw) if raw is not None else None
+
+    async def _get_entry(self, full_key: str) -> dict | None:
+        if self.subscribed:
+            entry = self.lru.get_cache(full_key)
+            if entry is not None:
+                self.stats['lru_hits'] += 1
+                return entry
+        entry = await self._get_redis_entry(full_key)
+        if entry is not None:
+            self.stats['redis_hits'] += 1
+            if self.subscribed:
+                self.lru.set_cache(full_key, entry)
+        return entry
+
+    async def _get_generation(self, full_key: str) -> str | None:
+        """None if unknown, value is stored unconditionally then"""
+        try:
+            generation = await self.redis_cache.redis.get(self._generation_key(full_key))
+        except RedisError as e:
+            logger.error(f"can't get generation of {full_key}: {e}")
+            return None
+        return generation.decode() if generation is not None else '0'
+
+    async def _set_entry(self, full_key: str, value, delta: float, expires_in_seconds: int,
+                         generation: str | None = None) -> bool:
+        """False if key was invalidated after generation was read, value is not stored then"""
+        entry = {'value': value, 'delta': delta, 'expires_at': time.time() + expires_in_seconds}
+        try:
+            if generation is None:
+                await self.redis_cache.redis.set(full_key, orjson.dumps(entry), ex=expires_in_seconds)
+            elif not await self.redis_cache.redis.eval(SET_IF_GENERATION_SCRIPT, 2, full_key,
+                                                       self._generation_key(full_key),
+                                                       orjson.dumps(entry), expires_in_seconds, generation):
+                self.stats['stale_discarded'] += 1
+                return False
+        except (TypeError, RedisError) as e:
+            logger.error(f"can't set {full_key}: {e}")
+        if self.subscribed:
+            self.lru.set_cache(full_key, entry)
+        return True
+
+    async def get(self, namespace: CacheNamespacesEnum | str, key: str):
+        entry = await self._get_entry(self._key(namespace, key))
+        return entry['value'] if entry is not None else None
+
+    async def set(self, namespace: CacheNamespacesEnum | str, key: str, value, delta: float = 0.0) -> None:
+        """delta is how long value takes to compute, in seconds"""
+        await self._set_entry(self._key(namespace, key), value, delta, self.expires_in_seconds(namespace))
+
+    async def get_or_compute(self, namespace: CacheNamespacesEnum | str, key: str,
+                             compute: Callable[[], Awaitable[T]]) -> T:
+        full_key = self._key(namespace, key)
+        entry = await self._get_entry(full_key)
+        if entry is not None:
+            if not self._should_recompute_early(entry):
+                return entry['value']
+            self.stats['early_recomputes'] += 1
+        else:
+            self.stats['misses'] += 1
+
+        future = self._in_flight.get(full_key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[full_key] = future
+        try:
+            value = await self._compute_locked(full_key, compute, self.expires_in_seconds(namespace), entry)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # retrieved, so that it is not reported if nobody waited for it
+            future.exception()
+            raise
+        finally:
+            # invalidate may have dropped it already, and other computation may be in flight
+            if self._in_flight.get(full_key) is future:
+                del self._in_flight[full_key]
+
+    async def _compute_locked(self, full_key: str, compute: Callable[[], Awaitable[T]],
+                              expires_in_seconds: int, stale_entry: dict | None) -> T:
+        lock_key = f'{self.lock_prefix}:{full_key}'
+        token = uuid.uuid4().hex
+        try:
+            # None if lock is held by other process
+            is_locked = bool(await self.redis_cache.redis.set(
+                lock_key, token, nx=True, px=int(config.TIERED_CACHE_LOCK_TIMEOUT_SECONDS * 1000)))
+            is_busy = not is_locked
+        except RedisError as e:
+            logger.error(f"can't lock {full_key}, computing without lock: {e}")
+            is_locked = is_busy = False
+
+        if is_busy:
+            if stale_entry is not None:
+                self.stats['stale_served'] += 1
+                return stale_entry['value']
+            self.stats['lock_waits'] += 1
+            waited_until = time.monotonic() + config.TIERED_CACHE_LOCK_TIMEOUT_SECONDS
+            while time.monotonic() < waited_until:
+                await asyncio.sleep(config.TIERED_CACHE_LOCK_POLL_INTERVAL_SECONDS)
+                entry = await self._get_redis_entry(full_key)
+                if entry is not None:
+                    if self.subscribed:
+                        self.lru.set_cache(full_key, entry)
+                    return entry['value']
+            logger.warning(f'{full_key} was not computed by lock holder in time, computing')
+
+        try:
+            generation = await self._get_generation(full_key)
+            started_at = time.monotonic()
+            value = await compute()
+            self.stats['computes'] += 1
+            await self._set_entry(full_key, value, time.monotonic() - started_at, expires_in_seconds, generation)
+            return value
+        finally:
+            if is_locked:
+                try:
+                    await self.redis_cache.redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                except RedisError as e:
+                    logger.error(f"can't release lock of {full_key}, it expires by itself: {e}")
+
+    def _evict_local(self, full_keys: list[str]) -> None:
+        """callers coming after invalidation do not join computations started before it"""
+        for full_key in full_keys:
+            self.lru.delete_cache(full_key)
+            self._in_flight.pop(full_key, None)
+
+    async def invalidate(self, namespace: CacheNamespacesEnum | str, *keys: str) -> None:
+        """evict keys from redis and from lru of every subscribed process, bump their generations"""
+        if not keys:
+            return
+        full_keys = [self._key(namespace, key) for key in keys]
+        self._evict_local(full_keys)
+        # generation outlives computations started before invalidation
+        generation_expires_in_seconds = max(self.expires_in_seconds(namespace),
+                                            math.ceil(config.TIERED_CACHE_LOCK_TIMEOUT_SECONDS))
+        try:
+            async with self.redis_cache.redis.pipeline(transaction=False) as pipe:
+                for full_key in full_keys:
+                    pipe.incr(self._generation_key(full_key))
+                    pipe.expire(self._generation_key(full_key), generation_expires_in_seconds)
+                pipe.delete(*full_keys)
+                await pipe.execute()
+            await self.redis_cache.redis.publish(self.channel, orjson.dumps(full_keys))
+            self.stats['invalidations_sent'] += len(full_keys)
+        except RedisError as e:
+            logger.error(f"can't invalidate {full_keys}: {e}")
+
+    async def run(self) -> None:
+        """subscribe to invalidations, to be run as background task"""
+        while True:
+            try:
+                async with self.redis_cache.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    self.subscribed = True
+                    while True:
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                        if message is not None:
+                            full_keys = orjson.loads(message['data'])
+                            self._evict_local(full_keys)
+                            self.stats['invalidations_received'] += len(full_keys)
+            except asyncio.CancelledError:
+                self.subscribed = False
+                raise
+            except Exception as e:
+                logger.error(f'tiered cache subscription failed, retrying: {e.__class__.__name__}: {e}')
+            # invalidations could be missed meanwhile
+            self.subscribed = False
+            self.lru.clear()
+            await asyncio.sleep(config.TIERED_CACHE_RETRY_INTERVAL_SECONDS)
+
+    def get_metrics(self) -> dict:
+        return {
+            **self.stats,
+            'subscribed': self.subscribed,
+            'lru_entries': len(self.lru.data),
+            'in_flight': len(self._in_flight),
+        }
@@ -1,35 +1,169 @@
+import asyncio
+import hashlib
+import time
 from pathlib import Path
+from typing import Callable, TypeVar
 
 import httpx
 
+from core import config
 from core.config import settings
 from core.enums import ChatGPTModelsEnum
 from core.exceptions import ChatgptException
 from core.logger_config import setup_logger
+from core.shared import close_client_on_its_loop, singleton_decorator
+from services.cache.cache import RedisCache
 
 logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
 
+T = TypeVar('T')
+
+
+class TokenBucket:
+    """allows rate_per_minute requests with bursts up to capacity, callers over the limit wait in line"""
+
+    def __init__(self, rate_per_minute: int, capacity: int):
+        self.rate_per_second = rate_per_minute / 60
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        # lock makes waiters queue in arrival order
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate_per_second)
+
+
+@singleton_decorator
+class ChatGPTClient:
+    """
+    process wide access to openai chat completions:
+    pooled keep-alive client, identical in-flight prompts are sent once (single-flight),
+    responses are cached in redis by (model, prompt hash) once callers accepted them (cache_result),
+    requests are rate limited by token bucket.
+    """
+
+    def __init__(self):
+        self.headers = {
+            'Authorization': f'Bearer {settings.OPENAI_API_KEY}',
+            'Content-Type': 'application/json'
+        }
+        self.cache = RedisCache()
+        self.in_flight: dict[str, asyncio.Future] = {}
+        self.stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0}
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._rate_limiter: TokenBucket | None = None
+
+    def _bind_to_running_loop(self):
+        """client, futures and lock are bound to event loop, celery tasks may run on their own ones"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._client is None or self._client.is_closed:
+            close_client_on_its_loop(self._client, self._loop)
+            self._client = httpx.AsyncClient(
+                base_url=settings.OPENAI_BASE_URL,
+                headers=self.headers,
+                timeout=httpx.Timeout(timeout=10.0, read=config.CHATGPT_READ_TIMEOUT_SECONDS),
+                limits=httpx.Limits(max_connections=config.CHATGPT_MAX_CONNECTIONS,
+                                    max_keepalive_connections=config.CHATGPT_MAX_CONNECTIONS),
+            )
+            self._rate_limiter = TokenBucket(config.CHATGPT_REQUESTS_PER_MINUTE, config.CHATGPT_REQUESTS_BURST)
+            self.in_flight = {}
+            self._loop = loop
+
+    @staticmethod
+    def _cache_key(model: ChatGPTModelsEnum, content: str) -> str:
+        return f'chatgpt:{model}:{hashlib.sha256(content.encode("utf-8")).hexdigest()}'
+
+    async def _request(self, model: ChatGPTModelsEnum, content: str) -> str:
+        await self._rate_limiter.acquire()
+        self.stats['requests'] += 1
+        response = await self._client.post('/chat/completions', json={
+            "model": model,
+            "messages": [{"role": "user", "content": content}],
+        })
+        response.raise_for_status()
+        response_json = response.json()
+        return response_json['choices'][0]['message']['content'].strip()
+
+    async def complete(self, model: ChatGPTModelsEnum, content: str, use_cache: bool = True) -> str:
+        self._bind_to_running_loop()
+        cache_key = self._cache_key(model, content)
+
+        if use_cache:
+            cached = await self.cache.get_cache(cache_key)
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                return cached['text']
+
+        future = self.in_flight.get(cache_key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[cache_key] = future
+        try:
+            text = await self._request(model, content)
+            future.set_result(text)
+        except Exception as e:
+            future.set_exception(e)
+            # mark exception as retrieved, there may be no other waiters
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            self.in_flight.pop(cache_key, None)
+
+        return text
+
+    async def cache_result(self, model: ChatGPTModelsEnum, content: str, text: str):
+        """to be called with replies callers parsed and validated, so that bad ones are asked again"""
+        await self.cache.set_cache(self._cache_key(model, content), {'text': text},
+                                   config.CHATGPT_CACHE_EXPIRES_IN_SECONDS)
+
+    def get_metrics(self) -> dict:
+        return {**self.stats, 'in_flight': len(self.in_flight)}
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
 
 class ChatGPT:
     def __init__(self, model: ChatGPTModelsEnum,
                  prompt: str):
         self.model = model
         self.prompt = prompt
-        self.headers = {
-            'Authorization': f'Bearer {settings.OPENAI_API_KEY}',
-            'Content-Type': 'application/json'
-        }
 
-    async def get_response_text(self, message: str):
+    async def get_response_text(self, message: str, use_cache: bool = True,
+                                parse: Callable[[str], T] | None = None) -> str | T:
+        """
+        reply text, or what parse made of it if provided.
+        reply is cached only after parse returned, its exceptions are raised as they are,
+        replies of calls without parse are not cached
+        """
+        client = ChatGPTClient()
+        content = f'{self.prompt} {message}'
         try:
-            async with httpx.AsyncClient(timeout=httpx.Timeout(timeout=10.0, read=30.0)) as client:
-                response = await client.post('https://api.openai.com/v1/chat/completions', headers=self.headers, json={
-                    "model": self.model,
-                    "messages": [{"role": "user", "content": f'{self.prompt} {message}'}],
-                })
-                response_json = response.json()
-                return response_json['choices'][0]['message']['content'].strip()
+            text = await client.complete(self.model, content, use_cache=use_cache)
         except Exception as e:
             detail = (f'chatgpt error: ({self.model=}, {message=}): {e.__class__.__name__}: {str(e)}')
             logger.error(detail)
             raise ChatgptException(detail)
+        if parse is None:
+            return text
+        result = parse(text)
+        if use_cache:
+            await client.cache_result(self.model, content, text)
+        return result
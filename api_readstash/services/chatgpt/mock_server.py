@@ -0,0 +1,71 @@
+"""
+local stand-in for openai chat completions api, to run app or load tests without spending tokens:
+    uvicorn services.chatgpt.mock_server:app --port 8010
+and set OPENAI_BASE_URL=http://localhost:8010/v1
+replies are deterministic and shaped by response examples in our prompts (see */chatgpt_helpers.py)
+"""
+import asyncio
+import os
+import re
+import time
+import uuid
+
+import fastapi as fa
+import orjson
+
+from core.enums import LanguagesISO2NamesEnum, LevelCEFRCodesEnum
+
+MOCK_LATENCY_SECONDS = float(os.getenv('CHATGPT_MOCK_LATENCY_SECONDS', 0.2))
+
+numbered_line_regex = re.compile(r'^(\d+)\. ', re.MULTILINE)
+response_example_regex = re.compile(r'\{[^{}]*"\.\.\."[^{}]*}', re.DOTALL)
+response_example_key_regex = re.compile(r'"(\w+)"\s*:\s*"\.\.\."')
+
+mock_values = {
+    'level_cefr_code': LevelCEFRCodesEnum.A1.value,
+    'word_pos': 'noun',
+    'lemma': 'mock',
+    'word_output': 'mock',
+    'context_output': 'mock context',
+    'phrase_output': 'mock phrase',
+}
+
+app = fa.FastAPI(title='chatgpt mock')
+stats = {'requests': 0}
+
+
+def mock_reply(content: str) -> str:
+    if 'text language identifier' in content:
+        return LanguagesISO2NamesEnum.EN.value
+    if 'text level identifier' in content:
+        return LevelCEFRCodesEnum.A1.value
+    if '"levels"' in content:
+        levels = {number: LevelCEFRCodesEnum.A1.value for number in numbered_line_regex.findall(content)}
+        return orjson.dumps({'levels': levels}).decode()
+    example = response_example_regex.search(content)
+    if example is not None:
+        keys = response_example_key_regex.findall(example.group())
+        return orjson.dumps({key: mock_values.get(key, 'mock') for key in keys}).decode()
+    return 'mock'
+
+
+@app.post('/v1/chat/completions')
+async def chat_completions(body: dict = fa.Body(...)):
+    stats['requests'] += 1
+    await asyncio.sleep(MOCK_LATENCY_SECONDS)
+    content = body['messages'][-1]['content']
+    return {
+        'id': f'chatcmpl-{uuid.uuid4().hex}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model'),
+        'choices': [{'index': 0,
+                     'message': {'role': 'assistant', 'content': mock_reply(content)},
+                     'finish_reason': 'stop'}],
+    }
+
+
+@app.get('/stats')
+async def get_stats():
+    """number of requests that reached mock, to check coalescing and caching"""
+    return stats
@@ -0,0 +1,84 @@
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import backoff
+
+from celery_app import celery_app
+from core.enums import TasksNamesEnum
+from core.logger_config import setup_logger
+from db import SessionLocalAsync, SessionLocalObjStorageAsync
+from services.postgres.repository import SqlAlchemyRepositoryAsync
+
+logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
+
+
+@asynccontextmanager
+async def file_manager_context():
+    # imported here, as file_manager queues tasks of this module
+    from services.file_manager.file_manager import FileManager
+
+    async with (SqlAlchemyRepositoryAsync(SessionLocalAsync()) as index_repo_async,
+                SqlAlchemyRepositoryAsync(SessionLocalObjStorageAsync()) as object_storage_repo_async):
+        yield FileManager(index_repo_async, object_storage_repo_async)
+
+
+@celery_app.task(name=TasksNamesEnum.files_dedupe_task)
+def files_dedupe_task():
+    """periodic, merges file_storage rows of same content stored before deduplication, safe to be interrupted"""
+    logger.debug(f'{TasksNamesEnum.files_dedupe_task} started')
+
+    async def dedupe_async():
+        async with file_manager_context() as file_manager:
+            try:
+                stats = await file_manager.dedupe()
+                logger.debug(f'{TasksNamesEnum.files_dedupe_task} finished: {stats}')
+            except Exception as e:
+                detail = f'{TasksNamesEnum.files_dedupe_task} failed: {e.__class__.__name__}: {e}'
+                logger.error(detail)
+                raise e
+
+    loop = asyncio.get_event_loop()
+    if loop.is_running():
+        asyncio.ensure_future(dedupe_async())
+    else:
+        loop.run_until_complete(dedupe_async())
+
+
+@celery_app.task(name=TasksNamesEnum.files_create_derivatives_task)
+@backoff.on_exception(backoff.constant, Exception, max_tries=3)
+def files_create_derivatives_task(file_index_uuid: str):
+    """resized variants of uploaded image"""
+    logger.debug(f'{TasksNamesEnum.files_create_derivatives_task} started with {file_index_uuid=}')
+
+    async def create_derivatives_async(file_index_uuid: str):
+        async with file_manager_context() as file_manager:
+            try:
+                await file_manager.create_derivatives(file_index_uuid)
+            except Exception as e:
+                detail = (f'{TasksNamesEnum.files_create_derivatives_task} failed with {file_index_uuid=}: '
+                          f'{e.__class__.__name__}: {e}')
+                logger.error(detail)
+                raise e
+
+    loop = asyncio.get_event_loop()
+    if loop.is_running():
+        asyncio.ensure_future(create_derivatives_async(file_index_uuid))
+    else:
+        loop.run_until_complete(create_derivatives_async(file_index_uuid))
+
+
+@celery_app.task(name=TasksNamesEnum.files_create_derivatives_backfill_task)
+def files_create_derivatives_backfill_task():
+    """periodic, queues derivation of images uploaded before it or failed to be derived"""
+
+    async def backfill_async():
+        async with file_manager_context() as file_manager:
+            queued = await file_manager.enqueue_missing_derivatives()
+            logger.debug(f'{TasksNamesEnum.files_create_derivatives_backfill_task} queued {queued} images')
+
+    loop = asyncio.get_event_loop()
+    if loop.is_running():
+        asyncio.ensure_future(backfill_async())
+    else:
+        loop.run_until_complete(backfill_async())
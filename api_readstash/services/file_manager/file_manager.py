@@ -1,27 +1,38 @@
-import base64
+import asyncio
+import datetime as dt
+import hashlib
+import io
+import uuid
 from pathlib import Path
+from typing import AsyncIterator
 from urllib.parse import quote
 
 import fastapi as fa
+from sqlalchemy import select, insert, delete, update
+from redis.exceptions import RedisError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.exceptions import AlreadyExistsException
+from core import config
+from core.constants import CELERY_TASK_PRIORITIES
+from core.enums import CacheNamespacesEnum, TasksNamesEnum
+from core.exceptions import AlreadyExistsException, NotFoundException
 from core.logger_config import setup_logger
-from db.models.file_storage import FileStorageModel, FileIndexModel
+from db import SessionLocalObjStorageAsync
+from db.models.file_storage import FileStorageModel, FileIndexModel, FileChunkModel
 from db.serializers.file_storage import (
     FileIndexCreateSerializer,
     FileIndexUpdateSerializer,
-    FileStorageCreateSerializer,
-    FileStorageUpdateSerializer,
-    FileStorageReadAsyncCachedSerializer,
     FileIndexReadAsyncCachedSerializer,
 )
+from services.cache.blob_cache import RedisBlobCache, BlobCacheMissException
 from services.cache.cache import RedisCache
+from services.cache.tiered_cache import TieredCache
+from services.file_manager import http_ranges, image_derivatives
+from services.file_manager.celery_tasks import files_create_derivatives_task
 from services.postgres.repository import (
-    SqlAlchemyRepositorySync,
     SqlAlchemyRepositoryAsync,
-    sqlalchemy_repo_sync_dependency,
     sqlalchemy_repo_async_dependency,
-    sqlalchemy_repo_obj_storage_sync_dependency,
     sqlalchemy_repo_obj_storage_async_dependency,
 )
 
@@ -29,141 +40,627 @@ logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
 
 
 class FileManager():
+    """
+    file_index rows (readstash db) point to file_storage rows (object storage db),
+    data of which is kept in file_chunk rows of FILE_STORAGE_CHUNK_SIZE.
+    uploads are written chunk by chunk as they are read, downloads are streamed from db cursor,
+    so that memory per request is bounded by a few chunks, whatever size of file is.
+    downloads are conditional (etag is content hash) and ranged, range reads only chunks it is in.
+    storage is content-addressed: file_storage of same content is stored once and shared by file_index rows,
+    which hold references to it (ref_count), it is removed with the last of them.
+    uploaded images get resized variants (file_index rows with parent_uuid), derived in background,
+    downloads with size get the smallest variant that is not smaller.
+    """
+
     def __init__(self,
-                 index_repo_sync: SqlAlchemyRepositorySync,
-                 object_storage_repo_sync: SqlAlchemyRepositorySync,
                  index_repo_async: SqlAlchemyRepositoryAsync,
                  object_storage_repo_async: SqlAlchemyRepositoryAsync,
                  ):
-        self.index_repo_sync = index_repo_sync
-        self.object_storage_repo_sync = object_storage_repo_sync
         self.index_repo_async = index_repo_async
         self.object_storage_repo_async = object_storage_repo_async
-        self.cache = RedisCache()
+        self.cache = TieredCache()
+        self.blob_cache = RedisBlobCache()
+        self.redis = RedisCache().redis
+
+    @staticmethod
+    def _file_storage_cache_key(file_storage_uuid: str) -> str:
+        return f"file_storage_uuid:{file_storage_uuid}"
 
-    def _raise_if_file_index_name_exists(self, file_name):
-        file_index = self.index_repo_sync.session.query(FileIndexModel).filter_by(name=file_name).first()
+    async def _invalidate_cache(self, *file_index_uuids: str) -> None:
+        """file_storage data never changes, its blob is deleted only with it"""
+        await self.cache.invalidate(CacheNamespacesEnum.file_index, *file_index_uuids)
+
+    async def _raise_if_file_index_name_exists(self, file_name):
+        file_index = await self.index_repo_async.get(FileIndexModel, name=file_name)
         if file_index is not None:
             raise AlreadyExistsException(detail='file with this name already exists')
 
+    @staticmethod
+    async def _hash_upload(file: fa.UploadFile) -> tuple[str, int]:
+        """sha256 hex and size of uploaded file, read FILE_STORAGE_CHUNK_SIZE at a time and rewound"""
+        content_hash, size = hashlib.sha256(), 0
+        while chunk := await file.read(config.FILE_STORAGE_CHUNK_SIZE):
+            content_hash.update(chunk)
+            size += len(chunk)
+        await file.seek(0)
+        return content_hash.hexdigest(), size
+
+    async def _acquire(self, content_hash: str) -> str | None:
+        """add reference to file_storage of content_hash if it is stored, in current transaction"""
+        return await self.object_storage_repo_async.session.scalar(
+            update(FileStorageModel)
+            .where(FileStorageModel.content_hash == content_hash)
+            .values(ref_count=FileStorageModel.ref_count + 1)
+            .returning(FileStorageModel.uuid))
+
+    async def _set_content_hash_or_merge(self, file_storage_uuid: str, content_hash: str) -> str:
+        """
+        set content_hash of file_storage, or, if file_storage of the same content exists,
+        move references of this one to it (leaving this one with none), in current transaction.
+        returns uuid of file_storage that is kept
+        """
+        session = self.object_storage_repo_async.session
+        while True:
+            try:
+                async with session.begin_nested():
+                    await session.execute(update(FileStorageModel)
+                                          .where(FileStorageModel.uuid == file_storage_uuid)
+                                          .values(content_hash=content_hash))
+                return file_storage_uuid
+            except IntegrityError:
+                pass
+            ref_count = await session.scalar(select(FileStorageModel.ref_count)
+                                             .filter(FileStorageModel.uuid == file_storage_uuid)
+                                             .with_for_update())
+            kept_uuid = await session.scalar(update(FileStorageModel)
+                                             .where(FileStorageModel.content_hash == content_hash)
+                                             .values(ref_count=FileStorageModel.ref_count + max(ref_count or 0, 0))
+                                             .returning(FileStorageModel.uuid))
+            # else it was removed meanwhile, so content_hash is free again
+            if kept_uuid is not None:
+                await session.execute(update(FileStorageModel)
+                                      .where(FileStorageModel.uuid == file_storage_uuid)
+                                      .values(ref_count=0))
+                return kept_uuid
+
+    async def _store(self, file: fa.UploadFile) -> tuple[str, int, str]:
+        """
+        get reference to file_storage of uploaded file's content, new one is written only if content is not stored,
+        upload is hashed first and then written FILE_STORAGE_CHUNK_SIZE at a time, never read as a whole.
+        returns file_storage_uuid, size and sha256 hex of data
+        """
+        content_hash, size = await self._hash_upload(file)
+        session = self.object_storage_repo_async.session
+        try:
+            file_storage_uuid = await self._acquire(content_hash)
+            if file_storage_uuid is None:
+                new_file_storage_uuid = str(uuid.uuid4())
+                await session.execute(insert(FileStorageModel)
+                                      .values(uuid=new_file_storage_uuid, size=size,
+                                              chunk_size=config.FILE_STORAGE_CHUNK_SIZE))
+                index = 0
+                while chunk := await file.read(config.FILE_STORAGE_CHUNK_SIZE):
+                    await session.execute(insert(FileChunkModel)
+                                          .values(file_storage_uuid=new_file_storage_uuid, index=index, data=chunk))
+                    index += 1
+                file_storage_uuid = await self._set_content_hash_or_merge(new_file_storage_uuid, content_hash)
+                if file_storage_uuid != new_file_storage_uuid:
+                    # same content was stored by concurrent upload
+                    await session.execute(delete(FileStorageModel)
+                                          .where(FileStorageModel.uuid == new_file_storage_uuid))
+                else:
+                    logger.debug(f'written {size=} in {index} chunks to {file_storage_uuid=}')
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        return file_storage_uuid, size, content_hash
+
+    async def _release(self, file_storage_uuid: str) -> bool:
+        """remove reference to file_storage, it is removed (file_chunk rows by cascade) with the last one"""
+        session = self.object_storage_repo_async.session
+        try:
+            ref_count = await session.scalar(update(FileStorageModel)
+                                             .where(FileStorageModel.uuid == file_storage_uuid)
+                                             .values(ref_count=FileStorageModel.ref_count - 1)
+                                             .returning(FileStorageModel.ref_count))
+            is_removed = ref_count is not None and ref_count <= 0
+            if is_removed:
+                await session.execute(delete(FileStorageModel)
+                                      .where(FileStorageModel.uuid == file_storage_uuid))
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        if is_removed:
+            await self.blob_cache.delete(self._file_storage_cache_key(file_storage_uuid))
+        return is_removed
+
+    @staticmethod
+    async def _read_chunks(file_storage_uuid: str, start_index: int = 0, stop_index: int | None = None,
+                           session: AsyncSession | None = None) -> AsyncIterator[bytes]:
+        """
+        chunks of file_storage in order (from start_index up to stop_index),
+        fetched FILE_STORAGE_CHUNKS_PER_FETCH at a time with server side cursor.
+        session is its own unless given, as response is streamed after request's dependencies are closed.
+        it is of primary, as size (Content-Length) is, so that body of just written file is there and matches it
+        """
+        stmt = (select(FileChunkModel.data)
+                .filter(FileChunkModel.file_storage_uuid == file_storage_uuid,
+                        FileChunkModel.index >= start_index)
+                .order_by(FileChunkModel.index)
+                .execution_options(yield_per=config.FILE_STORAGE_CHUNKS_PER_FETCH))
+        if stop_index is not None:
+            stmt = stmt.filter(FileChunkModel.index < stop_index)
+        if session is not None:
+            async for chunk in await session.stream_scalars(stmt):
+                yield chunk
+            return
+        async with SessionLocalObjStorageAsync() as own_session:
+            async for chunk in await own_session.stream_scalars(stmt):
+                yield chunk
+
+    async def _iter_chunks(self, file_storage_uuid: str, meta: dict | None,
+                           start_index: int = 0, stop_index: int | None = None) -> AsyncIterator[bytes]:
+        """chunks from blob cache if its meta is given, from db otherwise or from where cached chunks are gone"""
+        if meta is not None:
+            try:
+                async for chunk in self.blob_cache.iter_chunks(self._file_storage_cache_key(file_storage_uuid), meta,
+                                                               start_index, stop_index):
+                    yield chunk
+                    start_index += 1
+                return
+            except BlobCacheMissException as e:
+                # cached chunks are db chunks, so the rest is read from db
+                logger.warning(f'{e}, continuing from db')
+        async for chunk in self._read_chunks(file_storage_uuid, start_index, stop_index):
+            yield chunk
+
+    async def _read_chunks_caching(self, file_storage_uuid: str, chunk_size: int,
+                                   compress: bool) -> AsyncIterator[bytes]:
+        """all chunks from db, cached on the way, blob becomes visible only if whole file was sent"""
+        writer = self.blob_cache.writer(self._file_storage_cache_key(file_storage_uuid), compress=compress,
+                                        chunk_size=chunk_size)
+        async for chunk in self._read_chunks(file_storage_uuid):
+            yield chunk
+            await writer.write(chunk)
+        await writer.commit()
+
+    async def _iter_range(self, file_storage_uuid: str, meta: dict | None, chunk_size: int,
+                          start: int, end: int) -> AsyncIterator[bytes]:
+        """bytes from start to end inclusive, only chunks they are in are read"""
+        start_index = start // chunk_size
+        offset = start_index * chunk_size
+        async for chunk in self._iter_chunks(file_storage_uuid, meta, start_index, end // chunk_size + 1):
+            yield chunk[max(start - offset, 0):end + 1 - offset]
+            offset += len(chunk)
+
+    async def _get_size_and_chunk_size(self, file_storage_uuid: str) -> tuple[int, int]:
+        row = (await self.object_storage_repo_async.session.execute(
+            select(FileStorageModel.size, FileStorageModel.chunk_size)
+            .filter(FileStorageModel.uuid == file_storage_uuid))).first()
+        if row is None:
+            raise NotFoundException(detail='file data not found')
+        return row.size, row.chunk_size
+
+    @staticmethod
+    def _get_headers(name: str, content_type: str, size: int) -> dict:
+        return {'Content-Disposition': f"attachment; filename*=UTF-8''{quote(name)}",
+                'Content-Type': content_type,
+                'Content-Length': str(size)}
+
+    @staticmethod
+    def _get_etag(file_index_dict: dict, last_modified: dt.datetime) -> str:
+        """strong etag is content hash, files uploaded before it was stored get weak one of uuid and update time"""
+        if file_index_dict.get('content_hash') is not None:
+            return f'"{file_index_dict["content_hash"]}"'
+        return f'W/"{file_index_dict["uuid"]}-{int(last_modified.timestamp())}"'
+
+    @staticmethod
+    def _get_caching_headers(etag: str, last_modified: dt.datetime, is_immutable: bool) -> dict:
+        """file requested with ?v=<content_hash> never changes under this url"""
+        cache_control = ('public, max-age=31536000, immutable' if is_immutable
+                         else f'public, max-age={config.FILE_HTTP_MAX_AGE_SECONDS}')
+        return {'ETag': etag,
+                'Last-Modified': http_ranges.format_http_date(last_modified),
+                'Cache-Control': cache_control,
+                'Accept-Ranges': 'bytes'}
+
     async def create(self,
                      file_index_ser: FileIndexCreateSerializer,
-                     file_storage_ser: FileStorageCreateSerializer,
+                     file: fa.UploadFile,
                      ) -> FileIndexModel:
 
-        self._raise_if_file_index_name_exists(file_index_ser.name)
-
-        file_storage = None
-        file_index = None
+        await self._raise_if_file_index_name_exists(file_index_ser.name)
 
+        file_index_ser.file_storage_uuid, file_index_ser.size, file_index_ser.content_hash = await self._store(file)
         try:
-            file_storage = self.object_storage_repo_sync.create(FileStorageModel, file_storage_ser)
-            file_index_ser.file_storage_uuid = file_storage.uuid
-            file_index = self.index_repo_sync.create(FileIndexModel, file_index_ser)
-            return file_index
+            file_index = await self.index_repo_async.create(FileIndexModel, file_index_ser)
         except Exception as e:
-            if file_storage is not None:
-                self.object_storage_repo_sync.remove_by_uuid(FileStorageModel, file_storage.uuid)
-            if file_index is not None:
-                self.index_repo_sync.remove_by_uuid(FileIndexModel, file_index.uuid)
+            await self._release(file_index_ser.file_storage_uuid)
             raise e
+        if image_derivatives.is_derivable(file_index.content_type):
+            await self._enqueue_derivatives(file_index.uuid)
+        return file_index
 
     async def get_file_storage(self, file_index_uuid: str) -> FileStorageModel:
         """get file_storage by file_index_uuid with async repos"""
 
-        file_index = await self.index_repo_async.get(FileIndexModel, uuid=file_index_uuid)
+        file_index = await self.index_repo_async.get(FileIndexModel, raise_if_not_found=True, uuid=file_index_uuid)
         file_storage = await self.object_storage_repo_async.get(FileStorageModel, uuid=file_index.file_storage_uuid)
         return file_storage
 
-    async def get(self, file_index_uuid: str) -> fa.responses.StreamingResponse:
-        """get streamed file_starage.file_data with async repos"""
+    async def _get_file_index_dict(self, file_index_uuid: str) -> dict:
+        file_index: FileIndexModel = await self.index_repo_async.get(FileIndexModel, raise_if_not_found=True,
+                                                                     uuid=file_index_uuid)
+        return FileIndexReadAsyncCachedSerializer.model_validate(file_index).model_dump(mode='json')
 
-        file_index: FileIndexModel = await self.index_repo_async.get(FileIndexModel, uuid=file_index_uuid)
-        file_storage = await self.object_storage_repo_async.get(FileStorageModel, uuid=file_index.file_storage_uuid)
-        headers = {'Content-Disposition': f'attachment; filename*=UTF-8"{quote(file_index.name)}"',
-                   'Content-Type': file_index.content_type}
+    async def _get_file_index_dict_cached(self, file_index_uuid: str) -> dict:
+        return await self.cache.get_or_compute(CacheNamespacesEnum.file_index, file_index_uuid,
+                                               lambda: self._get_file_index_dict(file_index_uuid))
 
-        def file_data_generator():
-            # Define chunk size (e.g., 10KB, 32KB, etc.)
-            chunk_size = 32 * 1024  # 32KB
-            for i in range(0, len(file_storage.file_data), chunk_size):
-                yield file_storage.file_data[i:i + chunk_size]
+    async def _get_variants(self, file_index_uuid: str) -> list[dict]:
+        result = await self.index_repo_async.session.execute(
+            select(FileIndexModel.uuid, FileIndexModel.width)
+            .filter(FileIndexModel.parent_uuid == file_index_uuid)
+            .order_by(FileIndexModel.width))
+        return [{'uuid': row.uuid, 'width': row.width} for row in result]
 
-        return fa.responses.StreamingResponse(content=file_data_generator(), headers=headers)
+    async def _choose_file_index_dict(self, file_index_dict: dict, size: int | None,
+                                      v: str | None) -> tuple[dict, bool]:
+        """
+        file_index of smallest variant not narrower than size (original if there is none), and if it is immutable.
+        variants are derived from content, so they are immutable with ?v=<content_hash of original> too,
+        but original served instead of variants that are not derived yet is not
+        """
+        is_immutable = v is not None and v == file_index_dict.get('content_hash')
+        if size is None or not image_derivatives.is_derivable(file_index_dict.get('content_type')):
+            return file_index_dict, is_immutable
 
-    async def get_cached(self, file_index_uuid: str) -> fa.responses.StreamingResponse:
-        """get with async repos using cache"""
+        if file_index_dict.get('width') is None:
+            await self._enqueue_derivatives(file_index_dict['uuid'])
+            return file_index_dict, False
+        if file_index_dict['width'] == image_derivatives.UNDERIVABLE_SIZE:
+            return file_index_dict, is_immutable
 
-        # file_index: FileIndexModel = await self.index_repo_async.get(FileIndexModel, uuid=file_index_uuid)
-        # file_storage = await self.object_storage_repo_async.get(FileStorageModel, uuid=file_index.file_storage_uuid)
+        file_index_uuid = file_index_dict['uuid']
+        variants = await self.cache.get_or_compute(CacheNamespacesEnum.file_variants, file_index_uuid,
+                                                   lambda: self._get_variants(file_index_uuid))
+        variant = next((variant for variant in variants if variant['width'] >= size), None)
+        if variant is None:
+            return file_index_dict, is_immutable
+        return await self._get_file_index_dict_cached(variant['uuid']), is_immutable
 
-        file_index_cache_key = f"file_index_uuid:{file_index_uuid}"
-        file_index_dict = await self.cache.get_cache(file_index_cache_key)
+    async def get(self, file_index_uuid: str, request: fa.Request, v: str | None = None) -> fa.Response:
+        """get file data streamed from db"""
 
-        if file_index_dict is None:
-            file_index: FileIndexModel = await self.index_repo_async.get(FileIndexModel, uuid=file_index_uuid)
-            file_index_name = file_index.name
-            file_index_content_type = file_index.content_type
-            file_storage_uuid = file_index.file_storage_uuid
-            file_index_dict = FileIndexReadAsyncCachedSerializer.model_validate(file_index).model_dump()
-            await self.cache.set_cache(file_index_cache_key, file_index_dict)
+        file_index_dict = await self._get_file_index_dict(file_index_uuid)
+        is_immutable = v is not None and v == file_index_dict.get('content_hash')
+        return await self._get_response(file_index_dict, request, is_immutable, use_blob_cache=False)
 
+    async def get_cached(self, file_index_uuid: str, request: fa.Request, v: str | None = None,
+                         size: int | None = None) -> fa.Response:
+        """
+        get using cache, data of files admitted by blob cache is cached chunk by chunk while being streamed.
+        revalidation (304) is answered from cached file_index, without object storage db.
+        images requested with size (width in pixels) are served as their best matching variant,
+        missing variants are queued to be derived and original is served meanwhile
+        """
+
+        file_index_dict = await self._get_file_index_dict_cached(file_index_uuid)
+        file_index_dict, is_immutable = await self._choose_file_index_dict(file_index_dict, size, v)
+        return await self._get_response(file_index_dict, request, is_immutable, use_blob_cache=True)
+
+    async def _get_response(self, file_index_dict: dict, request: fa.Request, is_immutable: bool,
+                            use_blob_cache: bool) -> fa.Response:
+        """
+        200 with whole file, 206 with one range or multipart/byteranges of several, 304 if client's copy is fresh,
+        416 if no requested range is within file
+        """
+        file_index_name = file_index_dict.get('name')
+        file_index_content_type = file_index_dict.get('content_type')
+        file_storage_uuid = file_index_dict.get('file_storage_uuid')
+
+        last_modified = dt.datetime.fromisoformat(file_index_dict.get('updated_at') or file_index_dict['created_at'])
+        etag = self._get_etag(file_index_dict, last_modified)
+        headers = self._get_caching_headers(etag, last_modified, is_immutable)
+
+        if http_ranges.is_not_modified(request.headers.get('if-none-match'), request.headers.get('if-modified-since'),
+                                       etag, last_modified):
+            return fa.Response(status_code=fa.status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        blob_cache_key = self._file_storage_cache_key(file_storage_uuid)
+        meta = await self.blob_cache.get_meta(blob_cache_key) if use_blob_cache else None
+        if meta is not None:
+            size, chunk_size = meta['size'], meta.get('chunk_size', config.BLOB_CACHE_CHUNK_SIZE)
         else:
-            file_index_name = file_index_dict.get('name')
-            file_index_content_type = file_index_dict.get('content_type')
-            file_storage_uuid = file_index_dict.get('file_storage_uuid')
-
-        file_storage_cache_key = f"file_storage_uuid:{file_storage_uuid}"
-        file_storage_dict = await self.cache.get_cache(file_storage_cache_key)
-
-        if file_storage_dict is None:
-            file_storage: FileStorageModel = await self.object_storage_repo_async.get(FileStorageModel,
-                                                                                      uuid=file_storage_uuid)
-            file_storage_file_data = file_storage.file_data
-            file_storage_dict = FileStorageReadAsyncCachedSerializer.model_validate(file_storage).model_dump()
-            await self.cache.set_cache(file_storage_cache_key, file_storage_dict)
-        else:
-            file_storage_file_data = base64.b64decode(file_storage_dict.get('file_data'))
+            size, chunk_size = await self._get_size_and_chunk_size(file_storage_uuid)
+
+        ranges = None
+        if http_ranges.is_range_applicable(request.headers.get('if-range'), etag, last_modified):
+            ranges = http_ranges.parse_range(request.headers.get('range'), size)
+
+        if ranges is None:
+            headers.update(self._get_headers(file_index_name, file_index_content_type, size))
+            if meta is None and use_blob_cache and self.blob_cache.admits(size):
+                # media is compressed already
+                compress = not file_index_content_type.startswith(('image/', 'audio/', 'video/'))
+                content = self._read_chunks_caching(file_storage_uuid, chunk_size, compress)
+            else:
+                content = self._iter_chunks(file_storage_uuid, meta)
+            return fa.responses.StreamingResponse(content=content, headers=headers)
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            headers.update(self._get_headers(file_index_name, file_index_content_type, end - start + 1))
+            headers['Content-Range'] = http_ranges.get_content_range(start, end, size)
+            return fa.responses.StreamingResponse(
+                content=self._iter_range(file_storage_uuid, meta, chunk_size, start, end),
+                status_code=fa.status.HTTP_206_PARTIAL_CONTENT, headers=headers)
 
-        headers = {'Content-Disposition': f'attachment; filename*=UTF-8"{quote(file_index_name)}"',
-                   'Content-Type': file_index_content_type}
+        boundary = uuid.uuid4().hex
 
-        def file_data_generator():
-            # Define chunk size (e.g., 10KB, 32KB, etc.)
-            chunk_size = 32 * 1024  # 32KB
-            for i in range(0, len(file_storage_file_data), chunk_size):
-                yield file_storage_file_data[i:i + chunk_size]
+        async def multipart_generator():
+            for start, end in ranges:
+                yield http_ranges.get_part_header(boundary, file_index_content_type, start, end, size)
+                async for data in self._iter_range(file_storage_uuid, meta, chunk_size, start, end):
+                    yield data
+                yield b'\r\n'
+            yield http_ranges.get_closing(boundary)
 
-        return fa.responses.StreamingResponse(content=file_data_generator(), headers=headers)
+        length = http_ranges.get_multipart_length(boundary, file_index_content_type, ranges, size)
+        headers.update(self._get_headers(file_index_name, f'multipart/byteranges; boundary={boundary}', length))
+        return fa.responses.StreamingResponse(content=multipart_generator(),
+                                              status_code=fa.status.HTTP_206_PARTIAL_CONTENT, headers=headers)
 
     async def update(self, file_index_uuid: str, file_index_ser: FileIndexUpdateSerializer,
                      file: fa.UploadFile | None) -> FileIndexModel:
-        """update with sync repos"""
-        file_index = self.index_repo_sync.get(FileIndexModel, uuid=file_index_uuid)
+        """new data gets file_storage of its own content, file_storage of old one may be shared, so it is released"""
+        file_index = await self.index_repo_async.get(FileIndexModel, raise_if_not_found=True, uuid=file_index_uuid)
+        old_file_storage_uuid = file_index.file_storage_uuid
 
         if file is not None:
-            file_data = await file.read()
-            file_storage_ser = FileStorageUpdateSerializer(file_data=file_data)
-            file_storage = self.object_storage_repo_sync.get(FileStorageModel, uuid=file_index.file_storage_uuid)
-            self.object_storage_repo_sync.update(file_storage, file_storage_ser)
-        return self.index_repo_sync.update(file_index, file_index_ser)
+            file_index_ser.file_storage_uuid, file_index_ser.size, file_index_ser.content_hash = await self._store(file)
+        try:
+            file_index = await self.index_repo_async.update(file_index, file_index_ser)
+        except Exception as e:
+            if file is not None:
+                await self._release(file_index_ser.file_storage_uuid)
+            raise e
+        if file is not None:
+            await self._release(old_file_storage_uuid)
+            await self._remove_variants(file_index.uuid)
+        await self._invalidate_cache(file_index.uuid)
+        if file is not None and image_derivatives.is_derivable(file_index.content_type):
+            await self._enqueue_derivatives(file_index.uuid, force=True)
+        return file_index
 
     async def remove(self, file_uuid: str) -> None:
-        """remove with sync repos"""
-        file_index = self.index_repo_sync.get(FileIndexModel, uuid=file_uuid)
-        self.object_storage_repo_sync.remove_by_uuid(FileStorageModel, file_index.file_storage_uuid)
-        self.index_repo_sync.remove_by_uuid(FileIndexModel, file_uuid)
+        """only reference to file_storage is removed, file_storage itself is removed with the last one"""
+        file_index = await self.index_repo_async.get(FileIndexModel, raise_if_not_found=True, uuid=file_uuid)
+        file_storage_uuid = file_index.file_storage_uuid
+        await self._remove_variants(file_uuid)
+        await self.index_repo_async.remove_by_uuid(FileIndexModel, file_uuid)
+        await self._release(file_storage_uuid)
+        await self._invalidate_cache(file_uuid)
+
+    async def _remove_variants(self, file_index_uuid: str) -> None:
+        """variants with their references to file_storage, original is marked as not derived"""
+        session = self.index_repo_async.session
+        try:
+            variants = (await session.execute(
+                delete(FileIndexModel)
+                .where(FileIndexModel.parent_uuid == file_index_uuid)
+                .returning(FileIndexModel.uuid, FileIndexModel.file_storage_uuid)
+                .execution_options(synchronize_session=False))).all()
+            await session.execute(update(FileIndexModel)
+                                  .where(FileIndexModel.uuid == file_index_uuid)
+                                  .values(width=None, height=None)
+                                  .execution_options(synchronize_session=False))
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        for variant in variants:
+            await self._release(variant.file_storage_uuid)
+        await self._invalidate_cache(file_index_uuid, *(variant.uuid for variant in variants))
+        await self.cache.invalidate(CacheNamespacesEnum.file_variants, file_index_uuid)
+
+    async def _enqueue_derivatives(self, file_index_uuid: str, force: bool = False) -> bool:
+        """
+        queue derivation of image variants, at most once in FILE_DERIVATIVES_QUEUED_EXPIRES_IN_SECONDS
+        (unless forced, f.e. for new data), so that requests for missing ones don't flood queue
+        """
+        key = f'file_derivatives_queued:{file_index_uuid}'
+        try:
+            if force:
+                await self.redis.set(key, 1, ex=config.FILE_DERIVATIVES_QUEUED_EXPIRES_IN_SECONDS)
+            elif not await self.redis.set(key, 1, nx=True, ex=config.FILE_DERIVATIVES_QUEUED_EXPIRES_IN_SECONDS):
+                return False
+        except RedisError as e:
+            logger.error(f"can't mark {file_index_uuid=} as queued for derivation, not queueing: {e}")
+            return False
+        files_create_derivatives_task.apply_async(
+            args=[file_index_uuid],
+            queue='default',
+            priority=CELERY_TASK_PRIORITIES[TasksNamesEnum.files_create_derivatives_task]
+        )
+        return True
+
+    async def create_derivatives(self, file_index_uuid: str) -> int:
+        """
+        store resized copies of image of FILE_IMAGE_VARIANT_WIDTHS (smaller than it) as its variants,
+        width and height of original are set after that, so that it is not derived again,
+        originals that can't be derived get UNDERIVABLE_SIZE ones, till their data is updated.
+        returns number of created variants
+        """
+        file_index = await self.index_repo_async.get(FileIndexModel, uuid=file_index_uuid)
+        if (file_index is None or file_index.parent_uuid is not None or file_index.width is not None
+                or not image_derivatives.is_derivable(file_index.content_type)):
+            return 0
+        size, _ = await self._get_size_and_chunk_size(file_index.file_storage_uuid)
+        if size > config.FILE_IMAGE_MAX_SIZE_BYTES:
+            logger.warning(f'{file_index_uuid=} of {size=} is too big to be derived')
+            await self._mark_underivable(file_index)
+            return 0
+
+        # from primary, task is queued right after upload is committed there and replica may lag behind
+        data = b''.join([chunk async for chunk in self._read_chunks(
+            file_index.file_storage_uuid, session=self.object_storage_repo_async.session)])
+        try:
+            width, height, derivatives = await asyncio.to_thread(image_derivatives.render_derivatives,
+                                                                 data, config.FILE_IMAGE_VARIANT_WIDTHS)
+        except image_derivatives.UnreadableImageException as e:
+            logger.warning(f"can't derive {file_index_uuid=}: {e}")
+            await self._mark_underivable(file_index)
+            return 0
+
+        existing_widths = {variant['width'] for variant in await self._get_variants(file_index_uuid)}
+        created_uuids = []
+        for derivative in derivatives:
+            if derivative.width in existing_widths:
+                continue
+            file_index_ser = FileIndexCreateSerializer(
+                name=f'{Path(file_index.name or file_index_uuid).stem}_{derivative.width}w.{derivative.extension}',
+                content_type=derivative.content_type,
+                parent_uuid=file_index_uuid,
+                width=derivative.width,
+                height=derivative.height,
+            )
+            derivative_file = fa.UploadFile(file=io.BytesIO(derivative.data), size=len(derivative.data))
+            file_index_ser.file_storage_uuid, file_index_ser.size, file_index_ser.content_hash = await self._store(
+                derivative_file)
+            try:
+                variant = await self.index_repo_async.create(FileIndexModel, file_index_ser)
+            except Exception as e:
+                await self._release(file_index_ser.file_storage_uuid)
+                raise e
+            created_uuids.append(variant.uuid)
+
+        await self.index_repo_async.update(file_index, FileIndexUpdateSerializer(width=width, height=height))
+        await self._invalidate_cache(file_index_uuid)
+        await self.cache.invalidate(CacheNamespacesEnum.file_variants, file_index_uuid)
+        logger.debug(f'derived {len(created_uuids)} variants of {file_index_uuid=} ({width}x{height})')
+        return len(created_uuids)
+
+    async def _mark_underivable(self, file_index: FileIndexModel) -> None:
+        """served as it is, not queued again by backfill or requests with size"""
+        await self.index_repo_async.update(file_index, FileIndexUpdateSerializer(
+            width=image_derivatives.UNDERIVABLE_SIZE, height=image_derivatives.UNDERIVABLE_SIZE))
+        await self._invalidate_cache(file_index.uuid)
+
+    async def enqueue_missing_derivatives(self) -> int:
+        """
+        queue derivation of images that have no variants yet, returns number of queued ones.
+        underivable ones have width set, so they are not selected
+        """
+        queued, last_id = 0, 0
+        while True:
+            rows = (await self.index_repo_async.session.execute(
+                select(FileIndexModel.id, FileIndexModel.uuid)
+                .filter(FileIndexModel.parent_uuid.is_(None),
+                        FileIndexModel.width.is_(None),
+                        FileIndexModel.content_type.in_(image_derivatives.DERIVABLE_CONTENT_TYPES),
+                        FileIndexModel.id > last_id)
+                .order_by(FileIndexModel.id)
+                .limit(config.FILE_DERIVATIVES_BACKFILL_BATCH_SIZE))).all()
+            if not rows:
+                return queued
+            last_id = rows[-1].id
+            for row in rows:
+                queued += await self._enqueue_derivatives(row.uuid)
+
+    async def _hash_stored(self, file_storage_uuid: str) -> str:
+        content_hash = hashlib.sha256()
+        async for chunk in self._read_chunks(file_storage_uuid):
+            content_hash.update(chunk)
+        return content_hash.hexdigest()
+
+    async def _repoint(self, from_file_storage_uuid: str, to_file_storage_uuid: str,
+                       content_hash: str, size: int) -> int:
+        """point file_index rows of one file_storage to another one, with its content_hash and size"""
+        session = self.index_repo_async.session
+        try:
+            file_index_uuids = (await session.scalars(
+                update(FileIndexModel)
+                .where(FileIndexModel.file_storage_uuid == from_file_storage_uuid)
+                .values(file_storage_uuid=to_file_storage_uuid, content_hash=content_hash, size=size)
+                .returning(FileIndexModel.uuid)
+                .execution_options(synchronize_session=False))).all()
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        await self._invalidate_cache(*file_index_uuids)
+        return len(file_index_uuids)
+
+    async def _fill_file_index_hashes(self) -> int:
+        """content_hash and size of file_index rows created before they were stored, from their file_storage"""
+        updated, last_id = 0, 0
+        while True:
+            rows = (await self.index_repo_async.session.execute(
+                select(FileIndexModel.id, FileIndexModel.uuid, FileIndexModel.file_storage_uuid)
+                .filter(FileIndexModel.content_hash.is_(None), FileIndexModel.id > last_id)
+                .order_by(FileIndexModel.id)
+                .limit(config.FILE_DEDUPE_BATCH_SIZE))).all()
+            if not rows:
+                return updated
+            last_id = rows[-1].id
+            file_storages = await self.object_storage_repo_async.bulk_get_by_uuids(
+                FileStorageModel, [row.file_storage_uuid for row in rows])
+            values, file_index_uuids = [], []
+            for row, file_storage in zip(rows, file_storages):
+                if file_storage is not None and file_storage.content_hash is not None:
+                    values.append({'id': row.id, 'content_hash': file_storage.content_hash, 'size': file_storage.size})
+                    file_index_uuids.append(row.uuid)
+            if values:
+                await self.index_repo_async.bulk_update(FileIndexModel, values)
+                await self._invalidate_cache(*file_index_uuids)
+                updated += len(values)
+
+    async def dedupe(self) -> dict:
+        """
+        hash file_storage rows stored before deduplication and merge rows of same content into one.
+        references are added to the kept row first, then file_index rows are repointed to it, then duplicate is removed,
+        so that interrupted run can only leave row that is never removed, never file_index pointing to removed one,
+        and next run finishes merge of duplicate (it is left unhashed with no references)
+        """
+        session = self.object_storage_repo_async.session
+        stats = {'hashed': 0, 'merged': 0, 'bytes_freed': 0, 'file_indexes_repointed': 0}
+        last_id = 0
+        while True:
+            rows = (await session.execute(
+                select(FileStorageModel.id, FileStorageModel.uuid, FileStorageModel.size)
+                .filter(FileStorageModel.content_hash.is_(None), FileStorageModel.id > last_id)
+                .order_by(FileStorageModel.id)
+                .limit(config.FILE_DEDUPE_BATCH_SIZE))).all()
+            await session.commit()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            for row in rows:
+                content_hash = await self._hash_stored(row.uuid)
+                stats['hashed'] += 1
+                try:
+                    kept_uuid = await self._set_content_hash_or_merge(row.uuid, content_hash)
+                    await session.commit()
+                except Exception:
+                    await session.rollback()
+                    raise
+                stats['file_indexes_repointed'] += await self._repoint(row.uuid, kept_uuid, content_hash, row.size)
+                # duplicate has no references left, so it is removed
+                if kept_uuid != row.uuid and await self._release(row.uuid):
+                    stats['merged'] += 1
+                    stats['bytes_freed'] += row.size
+        stats['file_indexes_filled'] = await self._fill_file_index_hashes()
+        return stats
 
 
 async def file_manager_dependency(
-        index_repo_sync: SqlAlchemyRepositorySync = fa.Depends(sqlalchemy_repo_sync_dependency),
-        object_storage_repo_sync: SqlAlchemyRepositorySync = fa.Depends(sqlalchemy_repo_obj_storage_sync_dependency),
         index_repo_async: SqlAlchemyRepositoryAsync = fa.Depends(sqlalchemy_repo_async_dependency),
         object_storage_repo_async: SqlAlchemyRepositoryAsync = fa.Depends(sqlalchemy_repo_obj_storage_async_dependency),
 ):
     return FileManager(
-        index_repo_sync=index_repo_sync,
-        object_storage_repo_sync=object_storage_repo_sync,
         index_repo_async=index_repo_async,
         object_storage_repo_async=object_storage_repo_async,
     )
@@ -0,0 +1,122 @@
+import datetime as dt
+import re
+from email.utils import format_datetime, parsedate_to_datetime
+
+from core import config
+from core.exceptions import RangeNotSatisfiableException
+
+ETAG_RE = re.compile(r'\*|(?:W/)?"[^"]*"')
+RANGE_SPEC_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+
+def format_http_date(value: dt.datetime) -> str:
+    return format_datetime(value.astimezone(dt.timezone.utc), usegmt=True)
+
+
+def parse_http_date(value: str | None) -> dt.datetime | None:
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=dt.timezone.utc)
+
+
+def _opaque(etag: str) -> str:
+    return etag.removeprefix('W/')
+
+
+def is_not_modified(if_none_match: str | None, if_modified_since: str | None,
+                    etag: str, last_modified: dt.datetime) -> bool:
+    """
+    If-None-Match is compared weakly, If-Modified-Since is looked at only without If-None-Match (rfc 9110 13.2.2),
+    http dates are of seconds precision, so last_modified is truncated before comparing
+    """
+    if if_none_match is not None:
+        etags = ETAG_RE.findall(if_none_match)
+        return '*' in etags or _opaque(etag) in {_opaque(e) for e in etags}
+    since = parse_http_date(if_modified_since)
+    return since is not None and last_modified.replace(microsecond=0) <= since
+
+
+def is_range_applicable(if_range: str | None, etag: str, last_modified: dt.datetime) -> bool:
+    """If-Range requires strong etag match or exact date, otherwise Range is ignored and whole file is sent"""
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        return not etag.startswith('W/') and if_range == etag
+    date = parse_http_date(if_range)
+    return date is not None and last_modified.replace(microsecond=0) == date
+
+
+def parse_range(header: str | None, size: int) -> list[tuple[int, int]] | None:
+    """
+    inclusive (start, end) byte ranges of Range header, sorted and merged.
+    None if header should be ignored (absent, not 'bytes', malformed or of more than FILE_HTTP_MAX_RANGES ranges),
+    RangeNotSatisfiableException if none of ranges is within file
+    """
+    if header is None:
+        return None
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs:
+        return None
+    specs = specs.split(',')
+    if len(specs) > config.FILE_HTTP_MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        match = RANGE_SPEC_RE.match(spec)
+        if match is None:
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+        elif last:
+            # suffix range, last n bytes
+            start, end = max(size - int(last), 0), size - 1
+            if int(last) == 0:
+                continue
+        else:
+            return None
+        if start < size:
+            ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiableException(size)
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def get_content_range(start: int, end: int, size: int) -> str:
+    return f'bytes {start}-{end}/{size}'
+
+
+def get_part_header(boundary: str, content_type: str, start: int, end: int, size: int) -> bytes:
+    return (f'--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: {get_content_range(start, end, size)}\r\n'
+            f'\r\n').encode()
+
+
+def get_closing(boundary: str) -> bytes:
+    return f'--{boundary}--\r\n'.encode()
+
+
+def get_multipart_length(boundary: str, content_type: str, ranges: list[tuple[int, int]], size: int) -> int:
+    """exact length of multipart/byteranges body, every part is followed by crlf"""
+    return sum(len(get_part_header(boundary, content_type, start, end, size)) + end - start + 1 + 2
+               for start, end in ranges) + len(get_closing(boundary))
@@ -0,0 +1,87 @@
+import io
+from pathlib import Path
+from typing import NamedTuple
+
+from PIL import ExifTags, Image, ImageOps, features
+
+from core import config
+from core.logger_config import setup_logger
+
+logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
+
+# bigger images are refused by pillow as decompression bombs
+Image.MAX_IMAGE_PIXELS = config.FILE_IMAGE_MAX_PIXELS
+
+# animated (gif) and vector (svg) images are served as they are
+DERIVABLE_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/bmp', 'image/tiff')
+
+# width and height of originals that can't be derived (unreadable or too big), so that they are not queued again
+UNDERIVABLE_SIZE = 0
+
+# exif orientations of images stored rotated by 90 degrees
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+class UnreadableImageException(Exception):
+    """data is not an image pillow can decode, or it is too big"""
+    pass
+
+
+class ImageDerivative(NamedTuple):
+    width: int
+    height: int
+    content_type: str
+    extension: str
+    data: bytes
+
+
+def is_derivable(content_type: str | None) -> bool:
+    return content_type in DERIVABLE_CONTENT_TYPES
+
+
+def _get_format() -> tuple[str, str, str]:
+    """pillow format, content type and extension of derivatives"""
+    if config.FILE_IMAGE_VARIANT_FORMAT == 'webp':
+        if features.check('webp'):
+            return 'WEBP', 'image/webp', 'webp'
+        logger.warning('pillow is built without webp, derivatives are jpeg')
+    return 'JPEG', 'image/jpeg', 'jpg'
+
+
+def render_derivatives(data: bytes, widths: list[int]) -> tuple[int, int, list[ImageDerivative]]:
+    """
+    width and height of image (as displayed, with exif orientation applied) and its resized copies
+    of those widths that are smaller than it, copies that are not smaller than data itself are skipped.
+    cpu bound, to be run in thread
+    """
+    pillow_format, content_type, extension = _get_format()
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            if image.getexif().get(ExifTags.Base.Orientation) in TRANSPOSED_ORIENTATIONS:
+                width, height = height, width
+            widths = sorted(w for w in set(widths) if 0 < w < width)
+            if not widths:
+                return width, height, []
+            # jpeg is decoded at reduced scale right away, not smaller than biggest derivative
+            image.draft('RGB', (widths[-1], widths[-1]))
+            image = ImageOps.exif_transpose(image)
+            if pillow_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            elif image.mode not in ('RGB', 'RGBA', 'L'):
+                image = image.convert('RGBA')
+
+            derivatives = []
+            for derivative_width in widths:
+                derivative_height = max(round(height * derivative_width / width), 1)
+                # reduced by box filter first, then resampled, much faster on big images and hardly distinguishable
+                resized = image.resize((derivative_width, derivative_height), Image.Resampling.LANCZOS,
+                                       reducing_gap=3.0)
+                buffer = io.BytesIO()
+                resized.save(buffer, format=pillow_format, quality=config.FILE_IMAGE_VARIANT_QUALITY)
+                if buffer.tell() < len(data):
+                    derivatives.append(ImageDerivative(derivative_width, derivative_height, content_type, extension,
+                                                       buffer.getvalue()))
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise UnreadableImageException(f'{e.__class__.__name__}: {e}')
+    return width, height, derivatives
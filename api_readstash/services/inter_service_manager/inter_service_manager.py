@@ -1,50 +1,150 @@
+import asyncio
 import httpx
 import traceback
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import AsyncIterator
 
+from core import config
 from core.config import settings
 from core.enums import RequestMethodsEnum
 from core.logger_config import setup_logger
 from core.security import generate_timestamp_hmac
+from core.shared import close_client_on_its_loop, singleton_decorator
 
 logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
 
+# url_postfix prefix -> read timeout, the longest matching prefix wins
+NLP_ENDPOINTS_READ_TIMEOUTS_SECONDS = {
+    'analyses/analyze': 60,
+    'translations/translate': 30,
+    'translations/translate-batch': 300,
+}
 
+
+@singleton_decorator
 class InterServiceManager:
+    """one pooled keep-alive client per process (and event loop), closed from app lifespan"""
+
+    def __init__(self):
+        self._client: httpx.AsyncClient | None = None
+        self._client_loop: asyncio.AbstractEventLoop | None = None
+        self.in_flight = 0
+        self.in_flight_peak = 0
+        self.requests_total: dict[str, int] = {}
+        self.errors_total: dict[str, int] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        # connections can't be shared across event loops (f.e. celery tasks run their own loops)
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            close_client_on_its_loop(self._client, self._client_loop)
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(config.INTER_SERVICE_TIMEOUT_SECONDS,
+                                      connect=config.INTER_SERVICE_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(max_connections=config.INTER_SERVICE_MAX_CONNECTIONS,
+                                    max_keepalive_connections=config.INTER_SERVICE_MAX_KEEPALIVE_CONNECTIONS,
+                                    keepalive_expiry=config.INTER_SERVICE_KEEPALIVE_EXPIRY_SECONDS),
+                http2=config.INTER_SERVICE_HTTP2,
+            )
+            self._client_loop = loop
+        return self._client
+
+    @staticmethod
+    def _get_timeout(url_postfix: str) -> httpx.Timeout:
+        matching = [prefix for prefix in NLP_ENDPOINTS_READ_TIMEOUTS_SECONDS if url_postfix.startswith(prefix)]
+        read_timeout = NLP_ENDPOINTS_READ_TIMEOUTS_SECONDS[max(matching, key=len)] if matching \
+            else config.INTER_SERVICE_TIMEOUT_SECONDS
+        return httpx.Timeout(config.INTER_SERVICE_TIMEOUT_SECONDS,
+                             connect=config.INTER_SERVICE_CONNECT_TIMEOUT_SECONDS,
+                             read=read_timeout)
+
+    @asynccontextmanager
+    async def _track(self, url_postfix: str):
+        endpoint = url_postfix.split('?')[0]
+        self.requests_total[endpoint] = self.requests_total.get(endpoint, 0) + 1
+        self.in_flight += 1
+        self.in_flight_peak = max(self.in_flight_peak, self.in_flight)
+        try:
+            yield
+        except Exception:
+            self.errors_total[endpoint] = self.errors_total.get(endpoint, 0) + 1
+            logger.error(traceback.format_exc())
+            raise
+        finally:
+            self.in_flight -= 1
+
     async def __send_request_async(self,
                                    method: RequestMethodsEnum,
                                    url: str,
                                    json=None,
                                    data=None,
                                    params=None,
-                                   headers: dict | None = None):
-        """send request with httpx client"""
-        try:
-            async with httpx.AsyncClient(timeout=httpx.Timeout(timeout=60)) as client:
-                if method == RequestMethodsEnum.get:
-                    resp = await client.get(url, params=params, headers=headers)
-                elif method == RequestMethodsEnum.delete:
-                    resp = await client.delete(url, params=params, headers=headers)
-                elif method == RequestMethodsEnum.post:
-                    resp = await client.post(url, json=json, data=data, headers=headers)
-                else:
-                    resp = await client.put(url, json=json, data=data, headers=headers)
-            return resp
-        except Exception:
-            logger.error(traceback.format_exc())
-            raise
+                                   headers: dict | None = None,
+                                   timeout: httpx.Timeout | None = None):
+        """send request with pooled httpx client"""
+        timeout = timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        if method == RequestMethodsEnum.get:
+            return await self.client.get(url, params=params, headers=headers, timeout=timeout)
+        elif method == RequestMethodsEnum.delete:
+            return await self.client.delete(url, params=params, headers=headers, timeout=timeout)
+        elif method == RequestMethodsEnum.post:
+            return await self.client.post(url, json=json, data=data, headers=headers, timeout=timeout)
+        else:
+            return await self.client.put(url, json=json, data=data, headers=headers, timeout=timeout)
 
-    async def send_request_to_nlp(self, method: RequestMethodsEnum,
-                                  url_postfix: str,
-                                  json=None,
-                                  data=None,
-                                  params=None) -> tuple[str, int, bytes]:
+    @staticmethod
+    async def _get_nlp_url_and_headers(url_postfix: str) -> tuple[str, dict]:
         base_url = f'http://{settings.API_NLP_HOST}:{settings.API_NLP_PORT}/api/v1/internal'
-        url = f'{base_url}/{url_postfix}'
         timestamp, signature = await generate_timestamp_hmac()
         headers = {
             'X-HMAC-Signature': signature,
             'X-Timestamp': str(timestamp)
         }
-        resp = await self.__send_request_async(method, url, json, data, params, headers)
+        return f'{base_url}/{url_postfix}', headers
+
+    async def send_request_to_nlp(self, method: RequestMethodsEnum,
+                                  url_postfix: str,
+                                  json=None,
+                                  data=None,
+                                  params=None) -> tuple[str, int, bytes]:
+        url, headers = await self._get_nlp_url_and_headers(url_postfix)
+        async with self._track(url_postfix):
+            resp = await self.__send_request_async(method, url, json, data, params, headers,
+                                                   self._get_timeout(url_postfix))
         return '{0}://{1}{2}:{3}{4}'.format(*resp.request.url._uri_reference), resp.status_code, resp.content
+
+    async def stream_lines_from_nlp(self, url_postfix: str, json=None) -> AsyncIterator[str]:
+        """post to nlp endpoint responding with NDJSON, yield lines as they arrive"""
+        url, headers = await self._get_nlp_url_and_headers(url_postfix)
+        async with self._track(url_postfix):
+            async with self.client.stream('POST', url, json=json, headers=headers,
+                                          timeout=self._get_timeout(url_postfix)) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if line:
+                        yield line
+
+    def get_metrics(self) -> dict:
+        connections = []
+        if self._client is not None and not self._client.is_closed:
+            # httpx does not expose pool publicly, httpcore pool does
+            pool = getattr(self._client._transport, '_pool', None)
+            connections = getattr(pool, 'connections', [])
+        return {
+            'in_flight': self.in_flight,
+            'in_flight_peak': self.in_flight_peak,
+            'max_connections': config.INTER_SERVICE_MAX_CONNECTIONS,
+            'max_keepalive_connections': config.INTER_SERVICE_MAX_KEEPALIVE_CONNECTIONS,
+            'open_connections': len(connections),
+            'idle_connections': sum(1 for connection in connections if connection.is_idle()),
+            'http2': config.INTER_SERVICE_HTTP2,
+            'requests_total': self.requests_total,
+            'errors_total': self.errors_total,
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
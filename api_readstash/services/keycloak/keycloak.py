@@ -1,17 +1,21 @@
+import asyncio
 import http
+import time
 import traceback
+from collections import defaultdict
 from pathlib import Path
 
 import backoff
 import httpx
-import requests
 
+from core import config
 from core.config import settings
 from core.enums import RequestMethodsEnum, UserRolesEnum
 from core.exceptions import InternalServerError, UnprocessableEntityException, KeycloakRequestException
 from core.logger_config import setup_logger
-from core.shared import singleton_decorator
+from core.shared import close_client_on_its_loop, singleton_decorator
 from db.serializers.user import UserUpdateSerializer, KCUserReadSerializer, UserCreateSerializer
+from services.cache.cache import LRUCache
 from services.keycloak.roles import kc_user_roles
 
 logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
@@ -32,151 +36,217 @@ def backoff_giveup_handler(details):
 
 @singleton_decorator
 class KCAdmin():
+    """
+    keycloak admin api client: one pooled keep-alive client per process (and event loop), closed from app lifespan.
+    admin tokens are fetched lazily and refreshed (with refresh token while it is valid, with password otherwise)
+    KEYCLOAK_TOKEN_REFRESH_MARGIN_SECONDS before they expire, concurrent callers wait for one refresh.
+    users and their roles are cached for KEYCLOAK_CACHE_EXPIRES_IN_SECONDS, changes made here invalidate them.
+    """
 
     def __init__(self):
-        self.admin_access_token = None
-        self.admin_refresh_token = None
-        self._authenticate_sync()
-
-    def _authenticate_sync(self):
-        self.admin_access_token, self.admin_refresh_token = self._get_admin_tokens_sync()
-        logger.debug(f'{self} set its access and refresh tokens')
-
-    async def _authenticate(self):
-        self.admin_access_token, self.admin_refresh_token = await self._get_admin_tokens()
-        logger.debug(f'{self} set its access and refresh tokens')
+        self.admin_access_token: str | None = None
+        self.admin_refresh_token: str | None = None
+        self.access_expires_at = float('-inf')
+        self.refresh_expires_at = float('-inf')
+        self.cache = LRUCache(max_size=config.KEYCLOAK_CACHE_SIZE,
+                              expires_in_seconds=config.KEYCLOAK_CACHE_EXPIRES_IN_SECONDS)
+        self.stats = {'requests': 0, 'errors': 0, 'token_refreshes': 0, 'authentications': 0,
+                      'cache_hits': 0, 'cache_misses': 0}
+        self._client: httpx.AsyncClient | None = None
+        self._client_loop: asyncio.AbstractEventLoop | None = None
+        self._lock: asyncio.Lock | None = None
+        self._lock_loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        # connections can't be shared across event loops (f.e. celery tasks run their own loops)
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            close_client_on_its_loop(self._client, self._client_loop)
+            self._client = httpx.AsyncClient(
+                base_url=settings.KEYCLOAK_BASE_URL,
+                timeout=httpx.Timeout(config.KEYCLOAK_ADMIN_TIMEOUT_SECONDS,
+                                      connect=config.KEYCLOAK_ADMIN_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(max_connections=config.KEYCLOAK_ADMIN_MAX_CONNECTIONS,
+                                    max_keepalive_connections=config.KEYCLOAK_ADMIN_MAX_KEEPALIVE_CONNECTIONS),
+            )
+            self._client_loop = loop
+        return self._client
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    @staticmethod
+    def _url(url_postfix: str) -> str:
+        return f'/admin/realms/{settings.KEYCLOAK_REALM}/{url_postfix}'
+
+    async def _post_to_token_endpoint(self, data: dict) -> None:
+        resp = await self.client.post(
+            '/realms/master/protocol/openid-connect/token',
+            data={'client_id': 'admin-cli', 'client_secret': settings.KEYCLOAK_CLIENT_SECRET, **data})
+        if resp.status_code != http.HTTPStatus.OK:
+            raise KeycloakRequestException(f'keycloak_service failed with {resp.status_code}: {resp.text}')
+        resp_json = resp.json()
+        now = time.monotonic()
+        self.admin_access_token = resp_json['access_token']
+        self.access_expires_at = now + resp_json['expires_in']
+        self.admin_refresh_token = resp_json.get('refresh_token')
+        # 0 is for refresh tokens that never expire by time
+        refresh_expires_in = resp_json.get('refresh_expires_in')
+        self.refresh_expires_at = float('inf') if refresh_expires_in == 0 \
+            else now + refresh_expires_in if refresh_expires_in is not None else float('-inf')
 
     @backoff.on_exception(backoff.constant,
-                          (requests.exceptions.RequestException, KeycloakRequestException),
+                          (httpx.HTTPError, KeycloakRequestException),
                           on_backoff=backoff_retry_handler,
                           on_giveup=backoff_giveup_handler,
                           max_tries=5)
-    def _send_request_sync(self, method: RequestMethodsEnum, url: str, json=None, data=None,
-                           params=None, headers: dict | None = None) -> requests.Response:
-        headers = {"Authorization": f"Bearer {self.admin_access_token}"} if headers is None else headers
-        if method == RequestMethodsEnum.get:
-            resp = requests.get(url, params=params, headers=headers)
-        elif method == RequestMethodsEnum.delete:
-            resp = requests.delete(url, params=params, headers=headers)
-        elif method == RequestMethodsEnum.post:
-            resp = requests.post(url, json=json, data=data, headers=headers)
-        else:
-            resp = requests.put(url, json=json, data=data, headers=headers)
-
-        if resp.status_code > 400:
-            detail = f'keycloak_service failed with {resp.status_code}: {resp.json()}'
-            if resp.status_code == 401:
-                self._authenticate_sync()
-            raise KeycloakRequestException(detail)
+    async def _authenticate(self) -> None:
+        await self._post_to_token_endpoint({
+            'grant_type': 'password',
+            'username': settings.KEYCLOAK_ADMIN,
+            'password': settings.KEYCLOAK_ADMIN_PASSWORD,
+        })
+        self.stats['authentications'] += 1
+        logger.debug(f'{self} set its access and refresh tokens')
 
-        return resp
+    async def _refresh_tokens(self) -> None:
+        if self.admin_refresh_token is not None \
+                and self.refresh_expires_at - time.monotonic() > config.KEYCLOAK_TOKEN_REFRESH_MARGIN_SECONDS:
+            try:
+                await self._post_to_token_endpoint({'grant_type': 'refresh_token',
+                                                    'refresh_token': self.admin_refresh_token})
+                self.stats['token_refreshes'] += 1
+                logger.debug(f'{self} refreshed its access token')
+                return
+            except (httpx.HTTPError, KeycloakRequestException, KeyError) as e:
+                # f.e. admin session was ended in keycloak
+                logger.warning(f"can't refresh admin token, authenticating: {e.__class__.__name__}: {e}")
+        await self._authenticate()
+
+    def _access_token_is_fresh(self) -> bool:
+        return self.access_expires_at - time.monotonic() > config.KEYCLOAK_TOKEN_REFRESH_MARGIN_SECONDS
+
+    async def _get_access_token(self) -> str:
+        if not self._access_token_is_fresh():
+            # single-flight, concurrent callers wait for one refresh
+            async with self.lock:
+                if not self._access_token_is_fresh():
+                    await self._refresh_tokens()
+        return self.admin_access_token
 
     @backoff.on_exception(backoff.constant,
-                          (requests.exceptions.RequestException, KeycloakRequestException),
+                          (httpx.HTTPError, KeycloakRequestException),
                           on_backoff=backoff_retry_handler,
                           on_giveup=backoff_giveup_handler,
                           max_tries=5)
-    async def _send_request(self, method: RequestMethodsEnum, url: str, json=None, data=None,
-                                   params=None, headers: dict | None = None) -> requests.Response:
-        headers = {"Authorization": f"Bearer {self.admin_access_token}"} if headers is None else headers
-
-        async with httpx.AsyncClient() as client:
-            if method == RequestMethodsEnum.get:
-                resp = await client.get(url, params=params, headers=headers)
-            elif method == RequestMethodsEnum.delete:
-                resp = await client.delete(url, params=params, headers=headers)
-            elif method == RequestMethodsEnum.post:
-                resp = await client.post(url, json=json, data=data, headers=headers)
-            else:
-                resp = await client.put(url, json=json, data=data, headers=headers)
+    async def _send_request(self, method: RequestMethodsEnum, url: str, json=None, params=None) -> httpx.Response:
+        access_token = await self._get_access_token()
+        headers = {"Authorization": f"Bearer {access_token}"}
+        self.stats['requests'] += 1
+        try:
+            resp = await self.client.request(str(method), url, json=json, params=params, headers=headers)
+        except httpx.HTTPError:
+            self.stats['errors'] += 1
+            raise
 
         if resp.status_code > 400:
-            detail = f'keycloak_service failed with {resp.status_code}: {resp.json()}'
-            if resp.status_code == 401:
-                await self._authenticate()
+            self.stats['errors'] += 1
+            detail = f'keycloak_service failed with {resp.status_code}: {resp.text}'
+            if resp.status_code == 401 and self.admin_access_token == access_token:
+                # revoked before its expiry, next try gets new one
+                self.access_expires_at = float('-inf')
             raise KeycloakRequestException(detail)
 
         return resp
 
-    def _get_admin_tokens_sync(self) -> tuple[str, str]:
-        try:
-            resp = self._send_request_sync(
-                RequestMethodsEnum.post,
-                url=f'{settings.KEYCLOAK_BASE_URL}/realms/master/protocol/openid-connect/token',
-                headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                data={
-                    "grant_type": "password",
-                    "client_secret": f"{settings.KEYCLOAK_CLIENT_SECRET}",
-                    "client_id": 'admin-cli',
-                    "username": f"{settings.KEYCLOAK_ADMIN}",
-                    "password": f"{settings.KEYCLOAK_ADMIN_PASSWORD}",
-                })
-            resp_json = resp.json()
-            return resp_json['access_token'], resp_json['refresh_token']
-        except Exception as e:
-            logger.error(traceback.format_exc())
-            raise InternalServerError(detail=f"cant get admin tokens: {str(e)}")
-
-    async def _get_admin_tokens(self) -> tuple[str, str]:
-        try:
+    async def _get_all_pages(self, url: str, params: dict | None = None) -> list[dict]:
+        items, first = [], 0
+        while True:
             resp = await self._send_request(
-                RequestMethodsEnum.post,
-                url=f'{settings.KEYCLOAK_BASE_URL}/realms/master/protocol/openid-connect/token',
-                headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                data={
-                    "grant_type": "password",
-                    "client_secret": f"{settings.KEYCLOAK_CLIENT_SECRET}",
-                    "client_id": 'admin-cli',
-                    "username": f"{settings.KEYCLOAK_ADMIN}",
-                    "password": f"{settings.KEYCLOAK_ADMIN_PASSWORD}",
-                })
-            resp_json = resp.json()
-            return resp_json['access_token'], resp_json['refresh_token']
-        except Exception as e:
-            logger.error(traceback.format_exc())
-            raise InternalServerError(detail=f"cant get admin tokens: {str(e)}")
-
-    async def _set_user_role(self, user_uuid: str, role: UserRolesEnum) -> requests.Response:
+                RequestMethodsEnum.get, url,
+                params={**(params or {}), 'first': first, 'max': config.KEYCLOAK_SYNC_PAGE_SIZE})
+            page = resp.json()
+            items.extend(page)
+            if len(page) < config.KEYCLOAK_SYNC_PAGE_SIZE:
+                return items
+            first += config.KEYCLOAK_SYNC_PAGE_SIZE
+
+    def _get_cached(self, cache_key: str):
+        cached = self.cache.get_cache(cache_key)
+        self.stats['cache_hits' if cached is not None else 'cache_misses'] += 1
+        return cached
+
+    def _invalidate_user(self, user_uuid: str) -> None:
+        email = self.cache.get_cache(f'email_of:{user_uuid}')
+        if email is not None:
+            self.cache.delete_cache(f'user:{email}')
+        self.cache.delete_cache(f'roles:{user_uuid}')
+
+    def _cache_user_dict(self, user_dict: dict) -> None:
+        self.cache.set_cache(f"user:{user_dict['email']}", user_dict)
+        self.cache.set_cache(f"email_of:{user_dict['id']}", user_dict['email'])
+
+    @staticmethod
+    def _to_kc_user_ser(user_dict: dict, roles: list[str]) -> KCUserReadSerializer:
+        return KCUserReadSerializer(uuid=user_dict.get('id'),
+                                    email=user_dict.get('email'),
+                                    first_name=user_dict.get('firstName'),
+                                    last_name=user_dict.get('lastName'),
+                                    is_active=user_dict.get('enabled'),
+                                    roles=roles)
+
+    async def _set_user_roles(self, user_uuid: str, roles: list[UserRolesEnum]) -> httpx.Response:
+        """all roles are mapped with one request"""
         return await self._send_request(
-            RequestMethodsEnum.post,
-            url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users/{user_uuid}/role-mappings/realm",
-            json=[kc_user_roles.get(role)])
+            RequestMethodsEnum.post, url=self._url(f'users/{user_uuid}/role-mappings/realm'),
+            json=[kc_user_roles.get(role) for role in roles])
 
-    async def create_user(self, user_ser: UserCreateSerializer) -> KCUserReadSerializer:
-        json = {'email': user_ser.email, 'firstName': user_ser.first_name, 'enabled': True}
+    async def create_user(self, user_ser: UserCreateSerializer, password: str | None = None,
+                          email_verified: bool = False) -> KCUserReadSerializer:
+        json = {'email': user_ser.email, 'firstName': user_ser.first_name, 'enabled': True,
+                'emailVerified': email_verified}
         if user_ser.last_name is not None:
             json['lastName'] = user_ser.last_name
-        resp = await self._send_request(
-            RequestMethodsEnum.post, url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users",
-            json=json)
+        if password is not None:
+            json['credentials'] = [{'type': 'password', 'temporary': False, 'value': password}]
+        resp = await self._send_request(RequestMethodsEnum.post, url=self._url('users'), json=json)
         assert resp.status_code == http.HTTPStatus.CREATED
-        user_uuid = await self.get_user_uuid_by_email(user_ser.email)
+        # location is .../users/{uuid}, so that created user is not looked up by email
+        user_uuid = resp.headers['Location'].rstrip('/').rsplit('/', 1)[-1]
         if user_ser.roles:
-            for role in user_ser.roles:
-                await self._set_user_role(user_uuid, role)
-        kc_user = await self.get_user_by_email(user_ser.email)
-        return kc_user
+            await self._set_user_roles(user_uuid, user_ser.roles)
+        self.cache.delete_cache(f'user:{user_ser.email}')
+        return KCUserReadSerializer(uuid=user_uuid, email=user_ser.email, first_name=user_ser.first_name,
+                                    last_name=user_ser.last_name, is_active=True, roles=user_ser.roles or [])
 
-    async def set_password(self, user_uuid: str, password: str) -> requests.Response:
+    async def set_password(self, user_uuid: str, password: str) -> httpx.Response:
         return await self._send_request(
             RequestMethodsEnum.put,
-            url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users/{user_uuid}/reset-password",
+            url=self._url(f'users/{user_uuid}/reset-password'),
             json={"type": "password", "temporary": "false", "value": password})
 
-    async def verify(self, user_uuid: str) -> requests.Response:
+    async def verify(self, user_uuid: str) -> httpx.Response:
         return await self._send_request(
             RequestMethodsEnum.put,
-            url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users/{user_uuid}",
+            url=self._url(f'users/{user_uuid}'),
             json={"emailVerified": "true"})
 
-    async def update_user_email(self, user_uuid: str, user_ser: UserUpdateSerializer) -> requests.Response:
+    async def update_user_email(self, user_uuid: str, user_ser: UserUpdateSerializer) -> httpx.Response:
         assert user_ser.email is not None, 'email is required'
-        return await self._send_request(
+        resp = await self._send_request(
             RequestMethodsEnum.put,
-            url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users/{user_uuid}",
+            url=self._url(f'users/{user_uuid}'),
             json={'email': user_ser.email})
+        self._invalidate_user(user_uuid)
+        return resp
 
-    async def update_user_names(self, user_uuid: str, user_ser: UserUpdateSerializer) -> requests.Response:
+    async def update_user_names(self, user_uuid: str, user_ser: UserUpdateSerializer) -> httpx.Response:
         assert user_ser.first_name is not None or user_ser.last_name is not None, 'first_name or last_name are required'
         user_ser_credentials = {}
         if user_ser.first_name is not None:
@@ -184,71 +254,159 @@ class KCAdmin():
         if user_ser.last_name is not None:
             user_ser_credentials['lastName'] = user_ser.last_name
 
-        return await self._send_request(
+        resp = await self._send_request(
             RequestMethodsEnum.put,
-            url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users/{user_uuid}",
+            url=self._url(f'users/{user_uuid}'),
             json=user_ser_credentials)
+        self._invalidate_user(user_uuid)
+        return resp
 
-    async def get_user_uuid_by_email(self, email: str) -> str | None:
-        try:
-            resp = await self._send_request(RequestMethodsEnum.get,
-                                            url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users?email={email}")
-            return resp.json()[0]['id']
-        except IndexError:
+    async def _get_user_dict_by_email(self, email: str) -> dict | None:
+        cache_key = f'user:{email}'
+        user_dict = self._get_cached(cache_key)
+        if user_dict is not None:
+            return user_dict
+        # without 'exact' email is matched as substring
+        resp = await self._send_request(RequestMethodsEnum.get, url=self._url('users'),
+                                        params={'email': email, 'exact': 'true'})
+        user_dicts = resp.json()
+        if not user_dicts:
             return None
+        user_dict = user_dicts[0]
+        self._cache_user_dict(user_dict)
+        return user_dict
 
-    async def _delete_user_roles_all(self, user_uuid: str) -> requests.Response:
+    async def get_user_uuid_by_email(self, email: str) -> str | None:
+        user_dict = await self._get_user_dict_by_email(email)
+        return user_dict['id'] if user_dict is not None else None
+
+    async def _delete_user_roles_all(self, user_uuid: str) -> httpx.Response:
         return await self._send_request(
             RequestMethodsEnum.delete,
-            url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users/{user_uuid}/role-mappings/realm")
+            url=self._url(f'users/{user_uuid}/role-mappings/realm'))
 
     async def get_user_by_email(self, email: str) -> KCUserReadSerializer | None:
-        resp = await self._send_request(RequestMethodsEnum.get,
-                                        url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users?email={email}")
-        user_dicts = resp.json()
-        if not user_dicts:
+        user_dict = await self._get_user_dict_by_email(email)
+        if user_dict is None:
             return None
-        user_dict = user_dicts[0]
-        uuid = user_dict.get('id')
-        roles = await self.get_user_roles(uuid)
-        kc_user_ser = KCUserReadSerializer(uuid=uuid,
-                                           email=user_dict.get('email'),
-                                           first_name=user_dict.get('firstName'),
-                                           last_name=user_dict.get('lastName'),
-                                           is_active=user_dict.get('enabled'),
-                                           roles=roles)
-        return kc_user_ser
+        roles = await self.get_user_roles(user_dict['id'])
+        return self._to_kc_user_ser(user_dict, roles)
 
     async def _get_user_role_mappings(self, user_uuid: str) -> list[dict]:
         resp = await self._send_request(
             RequestMethodsEnum.get,
-            url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users/{user_uuid}/role-mappings/realm")
+            url=self._url(f'users/{user_uuid}/role-mappings/realm'))
         return resp.json()
 
     async def get_user_roles(self, user_uuid: str) -> list[str]:
+        cache_key = f'roles:{user_uuid}'
+        roles = self._get_cached(cache_key)
+        if roles is not None:
+            return roles
         user_role_mappings = await self._get_user_role_mappings(user_uuid)
-        return [user_role_mapping.get('name') for user_role_mapping in user_role_mappings
-                if 'default' not in user_role_mapping.get('name')]
+        roles = [user_role_mapping.get('name') for user_role_mapping in user_role_mappings
+                 if 'default' not in user_role_mapping.get('name')]
+        self.cache.set_cache(cache_key, roles)
+        return roles
 
     async def update_user_roles(self, user_uuid: str, user_ser: UserUpdateSerializer):
         if user_ser.roles is None:
             raise UnprocessableEntityException(detail='roles were not provided for updating')
 
         await self._delete_user_roles_all(user_uuid)
-
-        for role in user_ser.roles:
-            await self._set_user_role(user_uuid, role)
+        if user_ser.roles:
+            await self._set_user_roles(user_uuid, user_ser.roles)
+        self._invalidate_user(user_uuid)
 
     async def deactivate_user(self, user_uuid: str) -> None:
         await self._send_request(RequestMethodsEnum.put,
-                                 url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users/{user_uuid}",
+                                 url=self._url(f'users/{user_uuid}'),
                                  json={'enabled': False})
+        self._invalidate_user(user_uuid)
 
     async def activate_user(self, user_uuid: str) -> None:
         await self._send_request(RequestMethodsEnum.put,
-                                 url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users/{user_uuid}",
+                                 url=self._url(f'users/{user_uuid}'),
                                  json={'enabled': True})
+        self._invalidate_user(user_uuid)
 
     async def remove_user(self, user_uuid: str) -> None:
         await self._send_request(RequestMethodsEnum.delete,
-                                 url=f"{settings.KEYCLOAK_BASE_URL}/admin/realms/{settings.KEYCLOAK_REALM}/users/{user_uuid}")
+                                 url=self._url(f'users/{user_uuid}'))
+        self._invalidate_user(user_uuid)
+
+    async def _get_roles_by_user_uuid(self) -> dict[str, list[str]]:
+        """
+        one paginated listing of members per app role instead of role mappings request per user.
+        roles are values, UserRolesEnum is not StrEnumRepr, so it is not formatted as its value
+        """
+        roles = list(kc_user_roles)
+        members_per_role = await asyncio.gather(
+            *(self._get_all_pages(self._url(f'roles/{role.value}/users'), {'briefRepresentation': 'true'})
+              for role in roles))
+        roles_by_user_uuid = defaultdict(list)
+        for role, members in zip(roles, members_per_role):
+            for member in members:
+                roles_by_user_uuid[member['id']].append(role.value)
+        return roles_by_user_uuid
+
+    async def sync_users(self, user_sers: list[UserCreateSerializer],
+                         password: str | None = None) -> dict[str, KCUserReadSerializer]:
+        """
+        reconcile keycloak users with user_sers by email: missing users are created (with password, verified),
+        names and roles of existing ones are updated if they differ.
+        current state is read with paginated listings (not per user), changes are sent
+        with up to KEYCLOAK_SYNC_CONCURRENCY users at once. users that failed are logged and left out of result
+        """
+        user_dicts, roles_by_user_uuid = await asyncio.gather(
+            self._get_all_pages(self._url('users'), {'briefRepresentation': 'false'}),
+            self._get_roles_by_user_uuid())
+        user_dicts_by_email = {user_dict['email']: user_dict for user_dict in user_dicts if user_dict.get('email')}
+        semaphore = asyncio.Semaphore(config.KEYCLOAK_SYNC_CONCURRENCY)
+        counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+
+        async def sync_user(user_ser: UserCreateSerializer) -> KCUserReadSerializer | None:
+            async with semaphore:
+                try:
+                    user_dict = user_dicts_by_email.get(user_ser.email)
+                    if user_dict is None:
+                        kc_user = await self.create_user(user_ser, password=password, email_verified=True)
+                        counts['created'] += 1
+                        return kc_user
+
+                    user_uuid = user_dict['id']
+                    roles = roles_by_user_uuid.get(user_uuid, [])
+                    names_differ = (user_dict.get('firstName'), user_dict.get('lastName')) != \
+                                   (user_ser.first_name, user_ser.last_name)
+                    role_values = [role.value for role in user_ser.roles] if user_ser.roles is not None else None
+                    roles_differ = role_values is not None and set(roles) != set(role_values)
+                    if names_differ and (user_ser.first_name is not None or user_ser.last_name is not None):
+                        await self.update_user_names(user_uuid, UserUpdateSerializer(first_name=user_ser.first_name,
+                                                                                     last_name=user_ser.last_name))
+                        user_dict = {**user_dict, 'firstName': user_ser.first_name, 'lastName': user_ser.last_name}
+                    if roles_differ:
+                        await self.update_user_roles(user_uuid, UserUpdateSerializer(roles=user_ser.roles))
+                        roles = role_values
+                    counts['updated' if names_differ or roles_differ else 'unchanged'] += 1
+                    return self._to_kc_user_ser(user_dict, roles)
+                except Exception:
+                    counts['failed'] += 1
+                    logger.error(f"can't sync {user_ser.email}: {traceback.format_exc()}")
+                    return None
+
+        kc_users = await asyncio.gather(*(sync_user(user_ser) for user_ser in user_sers))
+        logger.debug(f'synced {len(user_sers)} users with keycloak: {counts}')
+        return {kc_user.email: kc_user for kc_user in kc_users if kc_user is not None}
+
+    def get_metrics(self) -> dict:
+        return {
+            **self.stats,
+            'access_token_expires_in_seconds': self.access_expires_at - time.monotonic()
+            if self.admin_access_token is not None else None,
+            'cached': len(self.cache.data),
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -1,17 +1,23 @@
 import abc
+import base64
+import datetime as dt
 import typing
 from pathlib import Path
 from typing import Type, Any
 
 import fastapi as fa
+import orjson
+import sqlalchemy as sa
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel as pd_Model
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext import asyncio as sa_async
 from sqlalchemy.orm.query import Query
 
-from core.enums import ResponseDetailEnum
+from core import config
+from core.enums import ResponseDetailEnum, OrderEnum
 from core.exceptions import BadRequestException, AlreadyExistsException, NotFoundException
 from core.logger_config import setup_logger
 from db import (
@@ -19,7 +25,7 @@ from db import (
     SessionLocalAsync, SessionLocalObjStorageAsync, SessionLocalObjStorageSync, SessionLocalReadSync,
     SessionLocalReadAsync,
 )
-from db.models.association import UserWordStatusFileAssoc, UserTextStatusAssoc
+from db.models.association import UserWordStatusFileAssoc, UserTextStatusAssoc, TextWordAssoc
 from db.models.file_storage import FileStorageModel, FileIndexModel
 from db.models.grammar import GrammarModel
 from db.models.phrase import PhraseModel
@@ -28,7 +34,7 @@ from db.models.user import UserModel
 from db.models.word import WordModel
 
 sa_Model = typing.Union[
-    UserWordStatusFileAssoc, UserTextStatusAssoc,
+    UserWordStatusFileAssoc, UserTextStatusAssoc, TextWordAssoc,
     FileStorageModel, FileIndexModel,
     GrammarModel,
     PhraseModel,
@@ -48,6 +54,28 @@ def get_serializer_data(serializer: pd_Model | dict, exclude_none: bool, exclude
     return serializer_data
 
 
+def chunked(items: list, chunk_size: int = config.REPOSITORY_BULK_CHUNK_SIZE):
+    for i in range(0, len(items), chunk_size):
+        yield items[i:i + chunk_size]
+
+
+def uuids_array(uuids: list[str]):
+    """bind list of uuids as one array parameter, to be used with sa.any_"""
+    return sa.cast(uuids, ARRAY(sa.UUID(as_uuid=False)))
+
+
+def encode_cursor(*values) -> str:
+    """opaque url safe token of keyset pagination position"""
+    return base64.urlsafe_b64encode(orjson.dumps(values)).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        return orjson.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError as e:
+        raise BadRequestException(f'invalid cursor: {e}')
+
+
 class AbstractRepository(abc.ABC):
     @abc.abstractmethod
     def create(self, Model, serializer):
@@ -121,24 +149,25 @@ class SqlAlchemyRepositorySync(AbstractRepository):
         return obj
 
     def get_many_by_id_list(self, Model: Type[sa_Model], id_list: list[int]) -> list[sa_Model]:
-        """getting objs one by one and if cant find any of them, raises 404"""
-        objs = []
+        """getting objs with one query per chunk, in order of id_list, if cant find any of them, raises 404"""
+        objs_by_id = {}
+        for ids_chunk in chunked(list(set(id_list))):
+            objs_by_id.update({obj.id: obj for obj in self.session.query(Model).filter(Model.id.in_(ids_chunk))})
         for id in id_list:
-            obj = self.session.query(Model).get(id)
-            if obj is None:
+            if id not in objs_by_id:
                 raise NotFoundException(f"{Model} {id=:} not found.")
-            objs.append(obj)
-        return objs
+        return [objs_by_id[id] for id in id_list]
 
     def get_many_by_uuid_list(self, Model: Type[sa_Model], uuid_list: list[str]) -> list[sa_Model]:
-        """getting objs one by one and if cant find any of them, raises 404"""
-        objs = []
+        """getting objs with one query per chunk, in order of uuid_list, if cant find any of them, raises 404"""
+        objs_by_uuid = {}
+        for uuids_chunk in chunked(list(set(uuid_list))):
+            objs_by_uuid.update({obj.uuid: obj for obj in
+                                 self.session.query(Model).filter(Model.uuid == sa.any_(uuids_array(uuids_chunk)))})
         for _uuid in uuid_list:
-            obj = self.get(Model, uuid=_uuid)
-            if obj is None:
+            if _uuid not in objs_by_uuid:
                 raise NotFoundException(f"{Model} {_uuid=:} not found.")
-            objs.append(obj)
-        return objs
+        return [objs_by_uuid[_uuid] for _uuid in uuid_list]
 
     def get_all(self, Model: Type[sa_Model]) -> list[sa_Model]:
         return self.session.query(Model).all()
@@ -174,12 +203,18 @@ class SqlAlchemyRepositorySync(AbstractRepository):
 
     def create_many(self, Model: Type[sa_Model], serializers: list[pd_Model | dict],
                     exclude_none=True, exclude_unset=True) -> list[sa_Model]:
+        """one multi-row INSERT ... RETURNING per chunk, objs are in order of serializers"""
+        rows = [get_serializer_data(serializer, exclude_none, exclude_unset) for serializer in serializers]
         objs = []
-        for serializer in serializers:
-            serializer_data = get_serializer_data(serializer, exclude_none, exclude_unset)
-            obj = Model(**serializer_data)
-            self.session.add(obj)
-            objs.append(obj)
+        try:
+            for rows_chunk in chunked(rows):
+                objs.extend(self.session.scalars(insert(Model).returning(Model, sort_by_parameter_order=True),
+                                                 rows_chunk))
+        except IntegrityError as e:
+            self.session.rollback()
+            detail = str(e)
+            logger.error(detail)
+            raise fa.HTTPException(status_code=fa.status.HTTP_500_INTERNAL_SERVER_ERROR, detail=detail)
         self._try_commit_session()
         return objs
 
@@ -285,17 +320,7 @@ class SqlAlchemyRepositoryAsync(AbstractRepository):
         objs = list(result.scalars().all())
         return objs
 
-    async def get_or_create_many(self, Model: type[sa_Model], serializers: list[pd_Model]) -> list[sa_Model]:
-        objs = []
-        for serializer in serializers:
-            serializer_data = my_jsonable_encoder(serializer)
-            stmt = select(Model).filter_by(**serializer_data)
-            result = await self.session.execute(stmt)
-            obj = result.scalars().first()
-            if obj is None:
-                obj = Model(**serializer_data)
-                self.session.add(obj)
-            objs.append(obj)
+    async def _try_commit(self):
         try:
             await self.session.commit()
         except IntegrityError as e:
@@ -303,7 +328,136 @@ class SqlAlchemyRepositoryAsync(AbstractRepository):
             detail = str(e)
             logger.error(detail)
             raise fa.HTTPException(status_code=fa.status.HTTP_500_INTERNAL_SERVER_ERROR, detail=detail)
-        return objs
+
+    async def _bulk_insert_on_conflict(self, Model: type[sa_Model], serializers: list[pd_Model | dict],
+                                       index_elements: list[str], update_fields: list[str] | None,
+                                       exclude_none: bool, exclude_unset: bool,
+                                       ) -> list[tuple[bool, sa_Model]]:
+        """INSERT ... ON CONFLICT (index_elements) DO UPDATE ... RETURNING per chunk, in order of serializers.
+        without update_fields conflicting rows are 'updated' with their own values, so that they are returned too"""
+        rows = [get_serializer_data(serializer, exclude_none, exclude_unset) for serializer in serializers]
+        keys = [tuple(row[field] for field in index_elements) for row in rows]
+        # one statement can't affect same row twice, so duplicates are sent once
+        unique_rows = list({key: row for key, row in zip(keys, rows)}.values())
+
+        results_by_key: dict[tuple, tuple[bool, sa_Model]] = {}
+        for rows_chunk in chunked(unique_rows):
+            stmt = insert(Model).values(rows_chunk)
+            set_fields = update_fields or index_elements[:1]
+            stmt = stmt.on_conflict_do_update(index_elements=index_elements,
+                                              set_={field: stmt.excluded[field] for field in set_fields})
+            # xmax of freshly inserted row version is 0
+            stmt = stmt.returning(Model, sa.literal_column('xmax = 0').label('is_created'))
+            try:
+                result = await self.session.execute(stmt, execution_options={'populate_existing': True})
+            except IntegrityError as e:
+                await self.session.rollback()
+                detail = str(e)
+                logger.error(detail)
+                raise fa.HTTPException(status_code=fa.status.HTTP_500_INTERNAL_SERVER_ERROR, detail=detail)
+            for obj, is_created in result.all():
+                # serializers' rows are json encoded (f.e. datetimes are strings), so are keys of returned objs
+                results_by_key[tuple(my_jsonable_encoder(getattr(obj, field)) for field in index_elements)] = \
+                    (is_created, obj)
+        await self._try_commit()
+        return [results_by_key[key] for key in keys]
+
+    async def bulk_upsert(self, Model: type[sa_Model], serializers: list[pd_Model | dict],
+                          index_elements: list[str], update_fields: list[str] | None = None,
+                          exclude_none=True, exclude_unset=True) -> list[sa_Model]:
+        """insert rows, rows conflicting by index_elements (must be covered by unique constraint)
+        get update_fields updated. returns objs in order of serializers"""
+        results = await self._bulk_insert_on_conflict(Model, serializers, index_elements, update_fields,
+                                                      exclude_none, exclude_unset)
+        return [obj for is_created, obj in results]
+
+    async def bulk_get_or_create(self, Model: type[sa_Model], serializers: list[pd_Model | dict],
+                                 index_elements: list[str],
+                                 exclude_none=True, exclude_unset=True) -> list[tuple[bool, sa_Model]]:
+        """set based get_or_create, existing rows (by index_elements) are left as they are"""
+        return await self._bulk_insert_on_conflict(Model, serializers, index_elements, None,
+                                                   exclude_none, exclude_unset)
+
+    async def bulk_get_by_uuids(self, Model: type[sa_Model], uuids: list[str],
+                                raise_if_not_found=False) -> list[sa_Model | None]:
+        """one 'uuid = ANY(:uuids)' query per chunk, objs are in order of uuids, None for not found ones"""
+        objs_by_uuid = {}
+        for uuids_chunk in chunked(list(set(uuids))):
+            result = await self.session.execute(select(Model).filter(Model.uuid == sa.any_(uuids_array(uuids_chunk))))
+            objs_by_uuid.update({obj.uuid: obj for obj in result.scalars()})
+        if raise_if_not_found and len(objs_by_uuid) < len(set(uuids)):
+            missing = [_uuid for _uuid in uuids if _uuid not in objs_by_uuid]
+            raise NotFoundException(f"{Model.__name__} {missing[:10]} not found")
+        return [objs_by_uuid.get(_uuid) for _uuid in uuids]
+
+    async def bulk_update(self, Model: type[sa_Model], values: list[dict]) -> None:
+        """update by primary key, every dict must contain 'id', one executemany UPDATE per chunk"""
+        for values_chunk in chunked(values):
+            await self.session.execute(sa.update(Model), values_chunk)
+        await self._try_commit()
+
+    async def keyset_paginate(self, stmt: sa.Select, sort_key: str, order_column, id_column,
+                              order: OrderEnum, limit: int, cursor: str | None = None,
+                              ) -> tuple[list[sa_Model], str | None]:
+        """
+        page of stmt results after cursor, ordered by (order_column, id_column).
+        with composite index on (filtered columns, order_column, id) every page costs the same, unlike OFFSET.
+        returns objs and cursor of next page, None if it is the last one
+        """
+        desc = order == OrderEnum.desc
+        if cursor is not None:
+            try:
+                cursor_sort_key, cursor_order, value, last_id = decode_cursor(cursor)
+                if isinstance(order_column.type, sa.DateTime):
+                    value = dt.datetime.fromisoformat(value)
+            except (ValueError, TypeError) as e:
+                raise BadRequestException(f'invalid cursor: {e}')
+            if (cursor_sort_key, cursor_order) != (sort_key, order):
+                raise BadRequestException(f'cursor was issued for other ordering: {cursor_sort_key} {cursor_order}')
+            position = sa.tuple_(order_column, id_column)
+            after = sa.tuple_(sa.literal(value, order_column.type), sa.literal(last_id, id_column.type))
+            stmt = stmt.filter(position < after if desc else position > after)
+
+        direction = sa.desc if desc else sa.asc
+        stmt = (stmt.add_columns(order_column.label('keyset_value'), id_column.label('keyset_id'))
+                .order_by(None)
+                .order_by(direction(order_column), direction(id_column))
+                .limit(limit + 1))
+        rows = (await self.session.execute(stmt)).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            obj, value, last_id = rows[-1]
+            next_cursor = encode_cursor(sort_key, order, value, last_id)
+        return [row[0] for row in rows], next_cursor
+
+    async def estimate_count_by_value(self, Model: type[sa_Model], column_name: str, value) -> int | None:
+        """
+        planner's estimate of rows with column == value: table rows from pg_class times value frequency from pg_stats,
+        None if table was not analyzed yet or value is not among most common ones
+        """
+        result = await self.session.execute(sa.text(
+            'SELECT c.reltuples, s.most_common_vals::text::text[], s.most_common_freqs '
+            'FROM pg_class c '
+            'LEFT JOIN pg_stats s ON s.schemaname = current_schema() '
+            'AND s.tablename = :table_name AND s.attname = :column_name '
+            'WHERE c.oid = CAST(:table_name AS regclass)'
+        ), {'table_name': Model.__tablename__, 'column_name': column_name})
+        row = result.first()
+        if row is None or row.reltuples < 0 or row.most_common_vals is None:
+            return None
+        frequencies = dict(zip(row.most_common_vals, row.most_common_freqs))
+        frequency = frequencies.get(str(value))
+        return round(row.reltuples * frequency) if frequency is not None else None
+
+    async def get_or_create_many(self, Model: type[sa_Model], serializers: list[pd_Model | dict],
+                                 index_elements: list[str],
+                                 exclude_none=True, exclude_unset=True) -> list[sa_Model]:
+        """objs of serializers in their order, rows existing by index_elements (must be covered by unique constraint)
+        are left as they are, missing ones are inserted, with INSERT ... ON CONFLICT per chunk"""
+        results = await self.bulk_get_or_create(Model, serializers, index_elements, exclude_none, exclude_unset)
+        return [obj for is_created, obj in results]
 
     async def get_or_create_by_name(self, Model: type[sa_Model], name: str) -> tuple[bool, sa_Model]:
         is_created = False
@@ -3,6 +3,7 @@ import asyncio
 import backoff
 
 from celery_app import celery_app
+from core.constants import CELERY_TASK_PRIORITIES
 from core.enums import TasksNamesEnum, ChatGPTModelsEnum
 from db import SessionLocalAsync
 from db.models.text import TextModel
@@ -10,6 +11,7 @@ from db.serializers.text import TextUpdateSerializer
 from services.postgres.repository import SqlAlchemyRepositoryAsync
 from services.text_manager.chatgpt_helpers import identify_text_language_chatgpt, identify_text_level_chatgpt
 from services.text_manager.logger_setup import logger
+from services.text_manager.text_ingestion import ingest_text
 
 
 async def identify_text_level(text_uuid: str, gpt_model: ChatGPTModelsEnum = ChatGPTModelsEnum.gpt_4):
@@ -47,36 +49,40 @@ async def identify_text_language(text_uuid: str, gpt_model: ChatGPTModelsEnum =
 async def identify_text_language_and_level(text_uuid: str,
                                            gpt_model: ChatGPTModelsEnum = ChatGPTModelsEnum.gpt_4):
     await identify_text_language(text_uuid, gpt_model)
+    # words can be extracted as soon as language is known, level identification doesn't need to wait for it
+    texts_create_words_from_text_task.apply_async(
+        args=[text_uuid],
+        queue='default',
+        priority=CELERY_TASK_PRIORITIES[TasksNamesEnum.texts_create_words_from_text]
+    )
     await identify_text_level(text_uuid, gpt_model)
 
 
-# async def create_words_from_text(text_uuid: str, gpt_model: ChatGPTModelsEnum = ChatGPTModelsEnum.gpt_4):
-#     async with SessionLocalAsync() as session:
-#         repo = SqlAlchemyRepositoryAsync(session)
-#         word_manager = WordManager(repo)
-#         try:
-#             text = await repo.get(TextModel, raise_if_not_found=True, uuid=text_uuid)
-#             words = await word_manager.get_lemma(text.content, text.language.iso2)
-#             for word_characters in words:
-#                 await word_manager.create_word_if_not_exists(WordCreateSerializer(characters=word_characters,
-#                                                                                   language_uuid=text.language_uuid))
-#         except Exception as e:
-#             detail = (f'{TasksNamesEnum.texts_create_words_from_text} failed with {text_uuid=}: '
-#                       f'{e.__class__.__name__}: {e}')
-#             logger.error(detail)
-#             # notify admin in future
-#             raise e
-#
-# @celery_app.task(name=TasksNamesEnum.texts_create_words_from_text)
-# @backoff.on_exception(backoff.constant, Exception, max_tries=5)
-# def texts_create_words_from_text_task(text_uuid: str):
-#     logger.debug(f'{TasksNamesEnum.texts_create_words_from_text} started with {text_uuid=}')
-#
-#     loop = asyncio.get_event_loop()
-#     if loop.is_running():
-#         asyncio.ensure_future(create_words_from_text(text_uuid))
-#     else:
-#         loop.run_until_complete(create_words_from_text(text_uuid))
+async def create_words_from_text(text_uuid: str, gpt_model: ChatGPTModelsEnum = ChatGPTModelsEnum.gpt_4o):
+    async with SessionLocalAsync() as session:
+        repo = SqlAlchemyRepositoryAsync(session)
+        try:
+            text = await repo.get(TextModel, raise_if_not_found=True, uuid=text_uuid)
+            await ingest_text(repo, text, gpt_model)
+        except Exception as e:
+            detail = (f'{TasksNamesEnum.texts_create_words_from_text} failed with {text_uuid=}: '
+                      f'{e.__class__.__name__}: {e}')
+            logger.error(detail)
+            # notify admin in future
+            raise e
+
+
+@celery_app.task(name=TasksNamesEnum.texts_create_words_from_text)
+@backoff.on_exception(backoff.constant, Exception, max_tries=5)
+def texts_create_words_from_text_task(text_uuid: str, gpt_model: ChatGPTModelsEnum = ChatGPTModelsEnum.gpt_4o):
+    logger.debug(f'{TasksNamesEnum.texts_create_words_from_text} started with {text_uuid=}')
+
+    loop = asyncio.get_event_loop()
+    if loop.is_running():
+        asyncio.ensure_future(create_words_from_text(text_uuid, gpt_model))
+    else:
+        loop.run_until_complete(create_words_from_text(text_uuid, gpt_model))
+
 
 @celery_app.task(name=TasksNamesEnum.texts_identify_language_and_level_task)
 @backoff.on_exception(backoff.constant, Exception, max_tries=5)
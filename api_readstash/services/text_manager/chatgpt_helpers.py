@@ -10,11 +10,16 @@ async def identify_text_language_chatgpt(
                       prompt=f"You are text language identifier. "
                              f"Your reply must consist only of needed language iso2 code.")
     truncated_text = text[:1000]
-    try:
-        language_code = await chatgpt.get_response_text(
-            f"provide language code of '{truncated_text}'. valid codes: {[l for l in LanguagesISO2NamesEnum]}")
+
+    def parse(language_code: str) -> LanguagesISO2NamesEnum:
         assert language_code in (c for c in
                                  LanguagesISO2NamesEnum), f'Invalid language code was identified: {language_code}'
+        return language_code
+
+    try:
+        language_code = await chatgpt.get_response_text(
+            f"provide language code of '{truncated_text}'. valid codes: {[l for l in LanguagesISO2NamesEnum]}",
+            parse=parse)
     except (AssertionError, ChatgptException) as e:
         raise TextIdentifierException(f'During text language identification error: {e}')
     return language_code
@@ -28,10 +33,14 @@ async def identify_text_level_chatgpt(
                       prompt=f"You are text level identifier. "
                              f"Your reply must consist only of one of valid levels.")
     truncated_text = text[:1000]
+
+    def parse(level: str) -> LevelCEFRCodesEnum:
+        assert level in (l for l in LevelCEFRCodesEnum), f'Invalid level was identified: {level}'
+        return level
+
     try:
         level = await chatgpt.get_response_text(
-            f"'{truncated_text=}', {system=}, valid_levels={[l for l in LevelCEFRCodesEnum]}")
-        assert level in (l for l in LevelCEFRCodesEnum), f'Invalid level was identified: {level}'
+            f"'{truncated_text=}', {system=}, valid_levels={[l for l in LevelCEFRCodesEnum]}", parse=parse)
     except (AssertionError, ChatgptException) as e:
         raise TextIdentifierException(f'During text level identification error: {e}')
     return level
@@ -0,0 +1,154 @@
+import asyncio
+import re
+from collections import Counter
+
+from redis.exceptions import RedisError
+
+from core import config
+from core.constants import PARTS_OF_SPEECH
+from core.enums import ChatGPTModelsEnum, LanguagesISO2NamesEnum, RequestMethodsEnum
+from db.models.association import TextWordAssoc
+from db.models.text import TextModel
+from db.models.word import WordModel
+from db.serializers.analyses import AnalysesOutSerializer
+from db.serializers.word import WordCreateSerializer
+from services.cache.cache import RedisCache
+from services.inter_service_manager.inter_service_manager import InterServiceManager
+from services.postgres.repository import SqlAlchemyRepositoryAsync
+from services.text_manager.logger_setup import logger
+from services.word_manager.vocabulary_index import VocabularyIndex
+from services.word_manager.word_manager import WordManager
+
+sentence_end_regex = re.compile(r'(?<=[.!?…])\s+')
+
+# universal pos tags that don't make vocabulary
+SKIPPED_UPOS = {'PUNCT', 'SYM', 'NUM', 'X'}
+
+
+def split_to_chunks(content: str, max_chars: int = config.TEXT_INGESTION_CHUNK_MAX_CHARS) -> list[str]:
+    """join sentences into chunks of up to max_chars, so that words are never cut in half"""
+    chunks, chunk = [], ''
+    for sentence in sentence_end_regex.split(content):
+        if chunk and len(chunk) + len(sentence) + 1 > max_chars:
+            chunks.append(chunk)
+            chunk = ''
+        chunk = f'{chunk} {sentence}' if chunk else sentence
+    if chunk.strip():
+        chunks.append(chunk)
+    return chunks
+
+
+class TextIngestionProgress:
+    """progress of text ingestion in redis hash per text, kept for TEXT_INGESTION_PROGRESS_EXPIRES_IN_SECONDS"""
+    key_prefix = 'text_ingestion'
+
+    def __init__(self, text_uuid: str):
+        self.redis = RedisCache().redis
+        self.key = f'{self.key_prefix}:{text_uuid}'
+
+    async def set(self, **fields) -> None:
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(self.key, mapping={field: str(value) for field, value in fields.items()})
+                pipe.expire(self.key, config.TEXT_INGESTION_PROGRESS_EXPIRES_IN_SECONDS)
+                await pipe.execute()
+        except RedisError as e:
+            logger.error(f"can't set {self.key}: {e}")
+
+    async def incr(self, field: str, amount: int = 1) -> None:
+        try:
+            await self.redis.hincrby(self.key, field, amount)
+        except RedisError as e:
+            logger.error(f"can't increment {self.key} {field}: {e}")
+
+    async def get(self) -> dict | None:
+        try:
+            raw = await self.redis.hgetall(self.key)
+        except RedisError as e:
+            logger.error(f"can't get {self.key}: {e}")
+            return None
+        if not raw:
+            return None
+        progress = {field.decode(): value.decode() for field, value in raw.items()}
+        return {field: int(value) if value.isdigit() else value for field, value in progress.items()}
+
+
+async def analyze_chunks(text_uuid: str, chunks: list[str], iso2: LanguagesISO2NamesEnum) -> Counter:
+    """send chunks to nlp api concurrently (up to TEXT_INGESTION_CONCURRENCY at once),
+    count (lemma, upos) pairs as chunks are done"""
+    inter_serv_manager = InterServiceManager()
+    progress = TextIngestionProgress(text_uuid)
+    semaphore = asyncio.Semaphore(config.TEXT_INGESTION_CONCURRENCY)
+
+    async def analyze_chunk(chunk: str) -> AnalysesOutSerializer:
+        async with semaphore:
+            url, code, resp = await inter_serv_manager.send_request_to_nlp(
+                RequestMethodsEnum.post, 'analyses/analyze', {'content': chunk, 'iso2': iso2})
+        assert code == 200, f'{url} responded with {code=}'
+        return AnalysesOutSerializer.model_validate_json(resp)
+
+    lemmas_counter = Counter()
+    for analysis in asyncio.as_completed([analyze_chunk(chunk) for chunk in chunks]):
+        an_res = await analysis
+        for word in an_res.words or []:
+            lemma, upos = word.get('lemma'), word.get('pos')
+            if not lemma or upos in SKIPPED_UPOS or upos not in PARTS_OF_SPEECH[iso2]:
+                continue
+            # word.characters is varchar(50)
+            if len(lemma) > 50:
+                continue
+            lemmas_counter[(lemma, upos)] += 1
+        await progress.incr('chunks_done')
+    return lemmas_counter
+
+
+async def ingest_text(repo: SqlAlchemyRepositoryAsync,
+                      text: TextModel,
+                      gpt_model: ChatGPTModelsEnum = ChatGPTModelsEnum.gpt_4o) -> dict:
+    """
+    create words of text's lemmas that don't exist yet and link all of them to text:
+    content is analyzed in sentence chunks, lemmas are deduplicated, words and links are bulk upserted,
+    only created words are queued for level identification
+    """
+    assert text.language_iso_2 is not None, f'language of {text.uuid=} must be identified first'
+    iso2 = LanguagesISO2NamesEnum(text.language_iso_2)
+    progress = TextIngestionProgress(text.uuid)
+
+    chunks = split_to_chunks(text.content)
+    await progress.set(status='analyzing', chunks_total=len(chunks), chunks_done=0, words_total=0, words_created=0)
+    try:
+        lemmas_counter = await analyze_chunks(text.uuid, chunks, iso2)
+
+        await progress.set(status='saving')
+        # words are unique by (characters, language), first met pos wins for homographs
+        occurrences_by_lemma = Counter()
+        pos_by_lemma = {}
+        for (lemma, upos), count in lemmas_counter.most_common():
+            occurrences_by_lemma[lemma] += count
+            pos_by_lemma.setdefault(lemma, PARTS_OF_SPEECH[iso2][upos])
+
+        results = await repo.bulk_get_or_create(
+            WordModel,
+            [WordCreateSerializer(characters=lemma, lemma=lemma, pos=pos, language_iso_2=iso2)
+             for lemma, pos in pos_by_lemma.items()],
+            index_elements=['characters', 'language_iso_2'])
+        await repo.bulk_upsert(
+            TextWordAssoc,
+            [{'text_uuid': text.uuid, 'word_uuid': word.uuid, 'occurrences': occurrences_by_lemma[word.characters]}
+             for is_created, word in results],
+            index_elements=['text_uuid', 'word_uuid'],
+            update_fields=['occurrences'])
+
+        created_words = [word for is_created, word in results if is_created]
+        created_uuids = [word.uuid for word in created_words]
+        if created_uuids:
+            await VocabularyIndex().publish_words(created_words)
+            await WordManager(repo).queue_words_level_identification(created_uuids, iso2, gpt_model)
+    except Exception:
+        await progress.set(status='failed')
+        raise
+
+    result = {'status': 'done', 'words_total': len(results), 'words_created': len(created_uuids)}
+    await progress.set(**result)
+    logger.debug(f'ingested {text=}: {result}')
+    return result
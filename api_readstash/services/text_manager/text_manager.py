@@ -3,7 +3,7 @@ import fastapi as fa
 from core.constants import CELERY_TASK_PRIORITIES
 from core.enums import ChatGPTModelsEnum, ResponseDetailEnum, DBSessionModeEnum, UserTextStatusEnum, \
     TasksNamesEnum
-from core.exceptions import AlreadyExistsException
+from core.exceptions import AlreadyExistsException, NotFoundException
 from db.models.association import UserTextStatusAssoc
 from db.models.text import TextModel
 from db.models.word import WordModel
@@ -11,9 +11,11 @@ from db.serializers.association import UserTextStatusCreateSerializer, UserTextS
 from db.serializers.text import TextUpdateSerializer, TextCreateSerializer
 from services.postgres.repository import SqlAlchemyRepositoryAsync, sqlalchemy_repo_async_dependency, \
     sqlalchemy_repo_async_read_dependency
-from services.text_manager.celery_tasks import texts_identify_language_and_level_task
+from services.text_manager.celery_tasks import texts_identify_language_and_level_task, \
+    texts_create_words_from_text_task
 from services.text_manager.chatgpt_helpers import identify_text_language_chatgpt, identify_text_level_chatgpt
 from services.text_manager.logger_setup import logger
+from services.text_manager.text_ingestion import TextIngestionProgress
 
 
 class TextManager:
@@ -88,6 +90,27 @@ class TextManager:
         text = await self.repo_write.update(text, TextUpdateSerializer(level_cefr_code=level_cefr_code))
         return text
 
+    async def start_text_ingestion(self,
+                                   text_uuid: str,
+                                   gpt_model: ChatGPTModelsEnum = ChatGPTModelsEnum.gpt_4o) -> dict:
+        """(re)create words of text and link them to it in background"""
+        text = await self.get_text(text_uuid, session_mode=DBSessionModeEnum.rw)
+        assert text.language_iso_2 is not None, 'text language must be identified first'
+        await TextIngestionProgress(text.uuid).set(status='queued')
+        texts_create_words_from_text_task.apply_async(
+            args=[text.uuid, gpt_model],
+            queue='default',
+            priority=CELERY_TASK_PRIORITIES[TasksNamesEnum.texts_create_words_from_text]
+        )
+        return {"detail": ResponseDetailEnum.ok}
+
+    @staticmethod
+    async def get_text_ingestion_progress(text_uuid: str) -> dict:
+        progress = await TextIngestionProgress(text_uuid).get()
+        if progress is None:
+            raise NotFoundException(f'no ingestion of {text_uuid=} in progress or recently done')
+        return progress
+
     async def add_to_users_texts_with_status(self,
                                              user_uuid: str,
                                              text_uuid: str,
@@ -0,0 +1,75 @@
+"""
+local stand-in for keycloak realm issuing access tokens, to run app or load tests without keycloak:
+    uvicorn services.token_verifier.mock_issuer:app --port 8011
+and set JWT_ISSUER=http://localhost:8011/realms/mock,
+    JWT_JWKS_URL=http://localhost:8011/realms/mock/protocol/openid-connect/certs
+tokens are issued for any claims posted to /realms/mock/token, /realms/mock/rotate replaces signing key
+(previous one stays published, as keycloak does during rotation)
+"""
+import os
+import time
+import uuid
+
+import fastapi as fa
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+MOCK_BASE_URL = os.getenv('JWT_MOCK_ISSUER_BASE_URL', 'http://localhost:8011')
+MOCK_TOKEN_EXPIRES_IN_SECONDS = int(os.getenv('JWT_MOCK_TOKEN_EXPIRES_IN_SECONDS', 5 * 60))
+
+issuer = f'{MOCK_BASE_URL}/realms/mock'
+app = fa.FastAPI(title='keycloak mock')
+# newest first
+signing_keys: list[tuple[str, rsa.RSAPrivateKey]] = []
+
+
+def rotate_key() -> str:
+    kid = uuid.uuid4().hex
+    signing_keys.insert(0, (kid, rsa.generate_private_key(public_exponent=65537, key_size=2048)))
+    del signing_keys[2:]
+    return kid
+
+
+rotate_key()
+
+
+@app.get('/realms/mock/.well-known/openid-configuration')
+async def openid_configuration():
+    return {
+        'issuer': issuer,
+        'jwks_uri': f'{issuer}/protocol/openid-connect/certs',
+        'token_endpoint': f'{issuer}/token',
+        'authorization_endpoint': f'{issuer}/auth',
+    }
+
+
+@app.get('/realms/mock/protocol/openid-connect/certs')
+async def certs():
+    keys = []
+    for kid, private_key in signing_keys:
+        jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+        keys.append({**jwk, 'kid': kid, 'use': 'sig', 'alg': 'RS256'})
+    return {'keys': keys}
+
+
+@app.post('/realms/mock/token')
+async def token(claims: dict = fa.Body({})):
+    """f.e. {"email": "head@mail.ru", "realm_access": {"roles": ["head"]}}"""
+    kid, private_key = signing_keys[0]
+    now = int(time.time())
+    payload = {
+        'iss': issuer,
+        'sub': str(uuid.uuid4()),
+        'iat': now,
+        'exp': now + MOCK_TOKEN_EXPIRES_IN_SECONDS,
+        'realm_access': {'roles': []},
+        **claims,
+    }
+    return {'access_token': jwt.encode(payload, private_key, algorithm='RS256', headers={'kid': kid}),
+            'token_type': 'Bearer',
+            'expires_in': payload['exp'] - now}
+
+
+@app.post('/realms/mock/rotate')
+async def rotate():
+    return {'kid': rotate_key()}
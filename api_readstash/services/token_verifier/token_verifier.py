@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import time
+from pathlib import Path
+
+import httpx
+import jwt
+
+from core import config
+from core.exceptions import UnauthorizedException
+from core.logger_config import setup_logger
+from core.shared import singleton_decorator
+from services.cache.cache import LRUCache
+
+logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
+
+
+class JWKSUnavailableException(Exception):
+    pass
+
+
+@singleton_decorator
+class TokenVerifier:
+    """
+    verifies access tokens locally with issuer's public keys (JWKS), without request to keycloak per token.
+    keys are fetched lazily and refreshed every JWKS_REFRESH_INTERVAL_SECONDS, or earlier if token is signed
+    with unknown 'kid' (key rotation), but not more often than JWKS_MIN_REFRESH_INTERVAL_SECONDS.
+    if issuer is unavailable, known keys keep being used for JWKS_MAX_STALE_SECONDS.
+    claims of verified tokens are cached until their 'exp'.
+    """
+
+    def __init__(self, issuer: str = config.JWT_ISSUER, jwks_url: str = config.JWT_JWKS_URL):
+        self.issuer = issuer
+        self.jwks_url = jwks_url
+        self.keys: dict[str, jwt.PyJWK] = {}
+        self.fetched_at: float | None = None
+        self.fetch_attempted_at: float = float('-inf')
+        self.claims_cache = LRUCache(max_size=config.JWT_CLAIMS_CACHE_SIZE)
+        self.stats = {'verified': 0, 'cache_hits': 0, 'rejected': 0, 'jwks_fetches': 0, 'jwks_fetch_errors': 0}
+        self._lock: asyncio.Lock | None = None
+        self._lock_loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def _fetch_jwks(self) -> None:
+        self.fetch_attempted_at = time.monotonic()
+        self.stats['jwks_fetches'] += 1
+        async with httpx.AsyncClient(timeout=config.JWT_JWKS_TIMEOUT_SECONDS) as client:
+            resp = await client.get(self.jwks_url)
+            resp.raise_for_status()
+        keys = {}
+        for key_data in resp.json()['keys']:
+            if key_data.get('use', 'sig') != 'sig' or key_data.get('kid') is None:
+                continue
+            try:
+                keys[key_data['kid']] = jwt.PyJWK(key_data)
+            except jwt.PyJWKError as e:
+                logger.warning(f"skipping key {key_data.get('kid')}: {e}")
+        self.keys = keys
+        self.fetched_at = time.monotonic()
+        logger.debug(f'fetched {len(keys)} keys from {self.jwks_url}')
+
+    async def _refresh_jwks(self, force: bool = False) -> None:
+        """single-flight, concurrent callers wait for one fetch"""
+        async with self.lock:
+            now = time.monotonic()
+            if now - self.fetch_attempted_at < config.JWT_JWKS_MIN_REFRESH_INTERVAL_SECONDS:
+                return
+            if not force and self.fetched_at is not None \
+                    and now - self.fetched_at < config.JWT_JWKS_REFRESH_INTERVAL_SECONDS:
+                return
+            try:
+                await self._fetch_jwks()
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                self.stats['jwks_fetch_errors'] += 1
+                logger.error(f"can't fetch {self.jwks_url}: {e.__class__.__name__}: {e}")
+
+    async def _get_key(self, kid: str) -> jwt.PyJWK:
+        if self.fetched_at is None or time.monotonic() - self.fetched_at >= config.JWT_JWKS_REFRESH_INTERVAL_SECONDS:
+            await self._refresh_jwks()
+        if kid not in self.keys:
+            # signed with key issued after last fetch
+            await self._refresh_jwks(force=True)
+        if self.fetched_at is None or time.monotonic() - self.fetched_at >= config.JWT_JWKS_MAX_STALE_SECONDS:
+            raise JWKSUnavailableException(f"keys of {self.issuer} can't be fetched")
+        key = self.keys.get(kid)
+        if key is None:
+            raise jwt.InvalidKeyError(f'unknown {kid=}')
+        return key
+
+    async def verify(self, token: str) -> dict:
+        cache_key = hashlib.sha256(token.encode()).hexdigest()
+        cached = self.claims_cache.get_cache(cache_key)
+        if cached is not None:
+            exp, claims = cached
+            if exp > time.time():
+                self.stats['cache_hits'] += 1
+                return claims
+            self.claims_cache.delete_cache(cache_key)
+
+        try:
+            header = jwt.get_unverified_header(token)
+            key = await self._get_key(header.get('kid'))
+            # audience of keycloak access tokens depends on client mappers, it is not checked as before
+            claims = jwt.decode(token, key=key.key, algorithms=config.JWT_ALGORITHMS, issuer=self.issuer,
+                                leeway=config.JWT_LEEWAY_SECONDS,
+                                options={'verify_aud': False, 'require': ['exp', 'iat', 'sub']})
+        except JWKSUnavailableException as e:
+            logger.error(str(e))
+            raise UnauthorizedException(detail='token can not be verified now')
+        except jwt.PyJWTError as e:
+            self.stats['rejected'] += 1
+            raise UnauthorizedException(detail=f'invalid token: {e}')
+
+        self.stats['verified'] += 1
+        self.claims_cache.set_cache(cache_key, (claims['exp'], claims))
+        return claims
+
+    def get_metrics(self) -> dict:
+        return {
+            **self.stats,
+            'keys': list(self.keys),
+            'keys_age_seconds': time.monotonic() - self.fetched_at if self.fetched_at is not None else None,
+            'cached_claims': len(self.claims_cache.data),
+        }
@@ -0,0 +1,29 @@
+import asyncio
+from pathlib import Path
+
+import backoff
+
+from celery_app import celery_app
+from core.enums import TasksNamesEnum
+from core.logger_config import setup_logger
+from db import SessionLocalAsync
+from services.translation_memory.translation_memory import TranslationMemory
+
+logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
+
+
+@celery_app.task(name=TasksNamesEnum.translation_memory_cleanup_task)
+@backoff.on_exception(backoff.constant, Exception, max_tries=5)
+def translation_memory_cleanup_task():
+    logger.debug(f'{TasksNamesEnum.translation_memory_cleanup_task} started')
+
+    async def cleanup_async():
+        async with SessionLocalAsync() as session:
+            deleted = await TranslationMemory.cleanup(session)
+            logger.debug(f'{TasksNamesEnum.translation_memory_cleanup_task} deleted {deleted} entries')
+
+    loop = asyncio.get_event_loop()
+    if loop.is_running():
+        asyncio.ensure_future(cleanup_async())
+    else:
+        loop.run_until_complete(cleanup_async())
@@ -0,0 +1,202 @@
+import datetime as dt
+import hashlib
+import re
+import unicodedata
+from pathlib import Path
+
+import orjson
+import sqlalchemy as sa
+from redis.exceptions import RedisError
+from sqlalchemy.dialects.postgresql import insert
+
+from core import config
+from core.enums import TranslationModelsEnum
+from core.logger_config import setup_logger
+from core.shared import singleton_decorator
+from db import SessionLocalAsync
+from db.models.translation_memory import TranslationMemoryModel
+from db.serializers.translations import TranslNlpAPIInSerializer, TranslNlpAPIOutSerializer
+from services.cache.cache import RedisCache
+
+logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
+
+whitespace_regex = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """same text typed or pasted differently should hit same memory entry, case is kept as it affects translation"""
+    return whitespace_regex.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+@singleton_decorator
+class TranslationMemory:
+    """
+    translations already made by nlp api.
+    redis keeps recently used entries for TRANSLATION_MEMORY_REDIS_EXPIRES_IN_SECONDS,
+    postgres 'translation_memory' table keeps everything, redis misses are filled from it.
+    """
+    stats_key = 'translation_memory:stats'
+
+    def __init__(self):
+        self.cache = RedisCache()
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+    @classmethod
+    def _cache_key(cls, text_hash: str, in_ser: TranslNlpAPIInSerializer, model: TranslationModelsEnum) -> str:
+        return f'translation_memory:{model}:{in_ser.input_lang_iso2}:{in_ser.target_lang_iso2}:{text_hash}'
+
+    async def _incr_stats(self, counts: dict[str, int]) -> None:
+        try:
+            async with self.cache.redis.pipeline(transaction=False) as pipe:
+                for field, count in counts.items():
+                    if count:
+                        pipe.hincrby(self.stats_key, field, count)
+                await pipe.execute()
+        except RedisError as e:
+            logger.error(f"can't increment {counts}: {e}")
+
+    async def _set_redis_many(self, out_dicts_by_cache_key: dict[str, dict]) -> None:
+        if not out_dicts_by_cache_key:
+            return
+        try:
+            async with self.cache.redis.pipeline(transaction=False) as pipe:
+                for cache_key, out_dict in out_dicts_by_cache_key.items():
+                    pipe.set(cache_key, orjson.dumps(out_dict), ex=config.TRANSLATION_MEMORY_REDIS_EXPIRES_IN_SECONDS)
+                await pipe.execute()
+        except RedisError as e:
+            logger.error(f"can't set {len(out_dicts_by_cache_key)} entries: {e}")
+
+    async def get_many(
+            self,
+            in_sers: list[TranslNlpAPIInSerializer],
+            model: TranslationModelsEnum = TranslationModelsEnum.marianmt,
+    ) -> list[TranslNlpAPIOutSerializer | None]:
+        """
+        translations in order of in_sers, None for ones not in memory.
+        one redis MGET, redis misses with one UPDATE ... RETURNING, which counts hits of found rows and returns them
+        """
+        if not in_sers:
+            return []
+        text_hashes = [self._hash(in_ser.text_input) for in_ser in in_sers]
+        cache_keys = [self._cache_key(text_hash, in_ser, model) for text_hash, in_ser in zip(text_hashes, in_sers)]
+        unique_cache_keys = list(dict.fromkeys(cache_keys))
+        try:
+            cached = await self.cache.redis.mget(unique_cache_keys)
+        except RedisError as e:
+            logger.error(f"can't get {len(unique_cache_keys)} entries: {e}")
+            cached = [None] * len(unique_cache_keys)
+        out_dicts_by_cache_key = {cache_key: orjson.loads(data)
+                                  for cache_key, data in zip(unique_cache_keys, cached) if data is not None}
+        counts = {'redis_hits': len(out_dicts_by_cache_key), 'postgres_hits': 0, 'misses': 0}
+
+        # (text_hash, input_lang_iso2, target_lang_iso2) of redis misses, by their cache keys
+        missed = {cache_key: (text_hash, in_ser.input_lang_iso2, in_ser.target_lang_iso2)
+                  for cache_key, text_hash, in_ser in zip(cache_keys, text_hashes, in_sers)
+                  if cache_key not in out_dicts_by_cache_key}
+        if missed:
+            async with SessionLocalAsync() as session:
+                result = await session.execute(
+                    sa.update(TranslationMemoryModel)
+                    .where(sa.tuple_(TranslationMemoryModel.text_hash,
+                                     TranslationMemoryModel.input_lang_iso2,
+                                     TranslationMemoryModel.target_lang_iso2).in_(list(missed.values())),
+                           TranslationMemoryModel.model == model)
+                    .values(hits=TranslationMemoryModel.hits + 1, last_used_at=sa.func.now())
+                    .returning(TranslationMemoryModel.text_hash,
+                               TranslationMemoryModel.input_lang_iso2,
+                               TranslationMemoryModel.target_lang_iso2,
+                               TranslationMemoryModel.text_output)
+                    .execution_options(synchronize_session=False))
+                rows = result.all()
+                await session.commit()
+            found = {(row.text_hash, row.input_lang_iso2, row.target_lang_iso2): row.text_output for row in rows}
+            found_out_dicts = {}
+            for cache_key, key in missed.items():
+                if key in found:
+                    found_out_dicts[cache_key] = TranslNlpAPIOutSerializer(
+                        text_output=found[key], input_lang_iso2=key[1], target_lang_iso2=key[2]).model_dump()
+            counts['postgres_hits'] = len(found_out_dicts)
+            counts['misses'] = len(missed) - len(found_out_dicts)
+            await self._set_redis_many(found_out_dicts)
+            out_dicts_by_cache_key.update(found_out_dicts)
+
+        await self._incr_stats(counts)
+        return [TranslNlpAPIOutSerializer(**out_dicts_by_cache_key[cache_key])
+                if cache_key in out_dicts_by_cache_key else None
+                for cache_key in cache_keys]
+
+    async def get(
+            self,
+            in_ser: TranslNlpAPIInSerializer,
+            model: TranslationModelsEnum = TranslationModelsEnum.marianmt,
+    ) -> TranslNlpAPIOutSerializer | None:
+        return (await self.get_many([in_ser], model))[0]
+
+    async def set_many(
+            self,
+            in_out_sers: list[tuple[TranslNlpAPIInSerializer, TranslNlpAPIOutSerializer]],
+            model: TranslationModelsEnum = TranslationModelsEnum.marianmt,
+    ) -> None:
+        """one multi-row INSERT ... ON CONFLICT and one redis pipeline"""
+        # INSERT ... ON CONFLICT DO UPDATE can't affect same row twice, last translation of same text wins
+        values_by_cache_key, out_dicts_by_cache_key = {}, {}
+        for in_ser, out_ser in in_out_sers:
+            text_hash = self._hash(in_ser.text_input)
+            cache_key = self._cache_key(text_hash, in_ser, model)
+            values_by_cache_key[cache_key] = {
+                'text_hash': text_hash,
+                'input_lang_iso2': in_ser.input_lang_iso2,
+                'target_lang_iso2': in_ser.target_lang_iso2,
+                'model': model,
+                'text_input': normalize_text(in_ser.text_input),
+                'text_output': out_ser.text_output,
+            }
+            out_dicts_by_cache_key[cache_key] = out_ser.model_dump()
+        if not values_by_cache_key:
+            return
+
+        async with SessionLocalAsync() as session:
+            stmt = insert(TranslationMemoryModel).values(list(values_by_cache_key.values()))
+            await session.execute(stmt.on_conflict_do_update(
+                constraint='uq_translation_memory_text_hash_langs_model',
+                set_={'text_output': stmt.excluded.text_output, 'last_used_at': sa.func.now()}))
+            await session.commit()
+        await self._set_redis_many(out_dicts_by_cache_key)
+
+    async def set(
+            self,
+            in_ser: TranslNlpAPIInSerializer,
+            out_ser: TranslNlpAPIOutSerializer,
+            model: TranslationModelsEnum = TranslationModelsEnum.marianmt,
+    ) -> None:
+        await self.set_many([(in_ser, out_ser)], model)
+
+    async def get_stats(self) -> dict:
+        stats = {'redis_hits': 0, 'postgres_hits': 0, 'misses': 0}
+        try:
+            raw = await self.cache.redis.hgetall(self.stats_key)
+            stats.update({field.decode(): int(value) for field, value in raw.items()})
+        except RedisError as e:
+            logger.error(f"can't get stats: {e}")
+        total = sum(stats.values())
+        stats['hit_rate'] = (stats['redis_hits'] + stats['postgres_hits']) / total if total else 0
+        return stats
+
+    @staticmethod
+    async def cleanup(session) -> int:
+        """delete entries not used for TRANSLATION_MEMORY_TTL_DAYS,
+        then least recently used ones beyond TRANSLATION_MEMORY_MAX_ROWS"""
+        expired_before = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=config.TRANSLATION_MEMORY_TTL_DAYS)
+        expired = await session.execute(
+            sa.delete(TranslationMemoryModel).where(TranslationMemoryModel.last_used_at < expired_before))
+
+        overflow_ids = (sa.select(TranslationMemoryModel.id)
+                        .order_by(TranslationMemoryModel.last_used_at.desc())
+                        .offset(config.TRANSLATION_MEMORY_MAX_ROWS))
+        overflow = await session.execute(
+            sa.delete(TranslationMemoryModel).where(TranslationMemoryModel.id.in_(overflow_ids)))
+        await session.commit()
+        return expired.rowcount + overflow.rowcount
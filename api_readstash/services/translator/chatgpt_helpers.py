@@ -33,17 +33,18 @@ async def translate_word_chatgpt(
     {response_example}
     """
 
+    def parse(resp_text: str) -> TranslWordOutSerializer:
+        resp_json = json.loads(resp_text)
+        return TranslWordOutSerializer(word_output=resp_json['word_output'],
+                                       word_pos=resp_json['word_pos'],
+                                       context_output=resp_json['context_output'],
+                                       input_lang_iso2=input_lang_iso2,
+                                       target_lang_iso2=target_lang_iso2
+                                       )
+
     chatgpt = ChatGPT(model=gpt_model, prompt=prompt)
-    resp_text = await chatgpt.get_response_text(
-        f"'{word_input=}', '{input_lang_iso2=}', '{target_lang_iso2=}', '{context_input=}'")
-    resp_json = json.loads(resp_text)
-    transl_word_out_ser = TranslWordOutSerializer(word_output=resp_json['word_output'],
-                                                  word_pos=resp_json['word_pos'],
-                                                  context_output=resp_json['context_output'],
-                                                  input_lang_iso2=input_lang_iso2,
-                                                  target_lang_iso2=target_lang_iso2
-                                                  )
-    return transl_word_out_ser
+    return await chatgpt.get_response_text(
+        f"'{word_input=}', '{input_lang_iso2=}', '{target_lang_iso2=}', '{context_input=}'", parse=parse)
 
 
 async def translate_phrase_chatgpt(
@@ -66,7 +67,11 @@ async def translate_phrase_chatgpt(
     Punctuation, capitalization must be the same as in provided input. If input was in quotes - screen them.
     """
 
+    def parse(resp_text: str) -> dict:
+        resp_dict = json.loads(resp_text)
+        assert resp_dict['phrase_output'], 'no phrase translation was provided'
+        return resp_dict
+
     chatgpt = ChatGPT(model=model, prompt=prompt)
-    resp_text = await chatgpt.get_response_text(
-        f"'{phrase_input=}', '{input_language_iso2_name=}', '{target_language_iso2_name=}'")
-    return json.loads(resp_text)
+    return await chatgpt.get_response_text(
+        f"'{phrase_input=}', '{input_language_iso2_name=}', '{target_language_iso2_name=}'", parse=parse)
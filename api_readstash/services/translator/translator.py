@@ -1,7 +1,9 @@
 from core.enums import RequestMethodsEnum, ChatGPTModelsEnum
+from core.exceptions import InternalServerError
 from db.serializers.translations import TranslNlpAPIOutSerializer, TranslWordOutSerializer, TranslNlpAPIInSerializer, \
-    TranslWordInSerializer
+    TranslWordInSerializer, TranslNlpAPIBatchInSerializer, TranslNlpAPIBatchItemOutSerializer
 from services.inter_service_manager.inter_service_manager import InterServiceManager
+from services.translation_memory.translation_memory import TranslationMemory
 from services.translator.chatgpt_helpers import translate_word_chatgpt
 
 
@@ -22,9 +24,50 @@ async def translate_word_with_gpt(
 async def translate_with_nlp_api(
         transl_in_ser: TranslNlpAPIInSerializer,
 ) -> TranslNlpAPIOutSerializer:
+    translation_memory = TranslationMemory()
+    transl_out_ser = await translation_memory.get(transl_in_ser)
+    if transl_out_ser is not None:
+        return transl_out_ser
+
     inter_serv_manager = InterServiceManager()
     url, code, resp = await inter_serv_manager.send_request_to_nlp(RequestMethodsEnum.post,
                                                                    'translations/translate',
                                                                    transl_in_ser.model_dump())
     transl_out_ser = TranslNlpAPIOutSerializer.model_validate_json(resp)
+    await translation_memory.set(transl_in_ser, transl_out_ser)
     return transl_out_ser
+
+
+async def translate_many_with_nlp_api(
+        transl_in_sers: list[TranslNlpAPIInSerializer],
+) -> list[TranslNlpAPIOutSerializer]:
+    """translate all segments (f.e. all sentences of a text) in one request, results are in input order"""
+    translation_memory = TranslationMemory()
+    transl_out_sers: list[TranslNlpAPIOutSerializer | None] = await translation_memory.get_many(transl_in_sers)
+    # only segments missing in translation memory are sent, index_map maps batch index to input index
+    index_map = [i for i, transl_out_ser in enumerate(transl_out_sers) if transl_out_ser is None]
+    if not index_map:
+        return transl_out_sers
+
+    inter_serv_manager = InterServiceManager()
+    batch_ser = TranslNlpAPIBatchInSerializer(segments=[transl_in_sers[i] for i in index_map])
+    translated = []
+    try:
+        async for line in inter_serv_manager.stream_lines_from_nlp('translations/translate-batch',
+                                                                   batch_ser.model_dump()):
+            item_ser = TranslNlpAPIBatchItemOutSerializer.model_validate_json(line)
+            if item_ser.error is not None:
+                raise InternalServerError(f'failed to translate segment {index_map[item_ser.index]}: {item_ser.error}')
+            transl_out_ser = TranslNlpAPIOutSerializer(
+                text_output=item_ser.text_output,
+                input_lang_iso2=item_ser.input_lang_iso2,
+                target_lang_iso2=item_ser.target_lang_iso2,
+            )
+            transl_out_sers[index_map[item_ser.index]] = transl_out_ser
+            translated.append((transl_in_sers[index_map[item_ser.index]], transl_out_ser))
+    finally:
+        # segments translated before failure are kept too
+        await translation_memory.set_many(translated)
+    if None in transl_out_sers:
+        raise InternalServerError('nlp api returned incomplete translate-batch response')
+    return transl_out_sers
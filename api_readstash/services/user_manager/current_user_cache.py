@@ -0,0 +1,82 @@
+import datetime as dt
+import hashlib
+from pathlib import Path
+
+import orjson
+import sqlalchemy as sa
+from redis.exceptions import RedisError
+
+from core import config
+from core.logger_config import setup_logger
+from core.shared import singleton_decorator
+from db.models.user import UserModel
+from db.serializers.user import UserCreateSerializer
+from services.cache.cache import LRUCache, RedisCache
+
+logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
+
+
+@singleton_decorator
+class CurrentUserCache:
+    """
+    users resolved from access token claims, keyed by 'sub'.
+    entry is valid only for the same claims (email, names, roles), so changes made in keycloak are picked up
+    with first token carrying them, changes made through UserManager invalidate entry explicitly.
+    in-process tier expires fast, as other workers' invalidations don't reach it.
+    """
+    key_prefix = 'current_user'
+
+    def __init__(self):
+        self.lru = LRUCache(max_size=config.CURRENT_USER_CACHE_LRU_SIZE,
+                            expires_in_seconds=config.CURRENT_USER_CACHE_LRU_EXPIRES_IN_SECONDS)
+        self.redis_cache = RedisCache()
+
+    @classmethod
+    def _cache_key(cls, sub: str) -> str:
+        return f'{cls.key_prefix}:{sub}'
+
+    @staticmethod
+    def claims_hash(user_ser: UserCreateSerializer) -> str:
+        claims = user_ser.model_dump(include={'email', 'first_name', 'last_name', 'roles'})
+        return hashlib.sha256(orjson.dumps(claims, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    @staticmethod
+    def _dump(user: UserModel) -> dict:
+        return {column.name: getattr(user, column.name) for column in UserModel.__table__.columns}
+
+    @staticmethod
+    def _load(user_data: dict) -> UserModel:
+        """detached (never added to session) user, relationships are not available"""
+        for column in UserModel.__table__.columns:
+            value = user_data.get(column.name)
+            if isinstance(value, str) and isinstance(column.type, sa.DateTime):
+                user_data[column.name] = dt.datetime.fromisoformat(value)
+        return UserModel(**user_data)
+
+    async def get(self, sub: str, claims_hash: str) -> UserModel | None:
+        cache_key = self._cache_key(sub)
+        entry = self.lru.get_cache(cache_key)
+        if entry is None:
+            entry = await self.redis_cache.get_cache(cache_key)
+            if entry is None:
+                return None
+            self.lru.set_cache(cache_key, entry)
+        if entry['claims_hash'] != claims_hash:
+            return None
+        return self._load(dict(entry['user']))
+
+    async def set(self, sub: str, claims_hash: str, user: UserModel) -> None:
+        cache_key = self._cache_key(sub)
+        entry = {'claims_hash': claims_hash, 'user': self._dump(user)}
+        self.lru.set_cache(cache_key, entry)
+        await self.redis_cache.set_cache(cache_key, entry, config.CURRENT_USER_CACHE_REDIS_EXPIRES_IN_SECONDS)
+
+    async def invalidate(self, sub: str | None) -> None:
+        if sub is None:
+            return
+        cache_key = self._cache_key(sub)
+        self.lru.delete_cache(cache_key)
+        try:
+            await self.redis_cache.redis.delete(cache_key)
+        except RedisError as e:
+            logger.error(f"can't invalidate {cache_key}: {e}")
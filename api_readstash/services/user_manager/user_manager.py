@@ -1,3 +1,4 @@
+import asyncio
 from pathlib import Path
 
 import fastapi as fa
@@ -11,6 +12,7 @@ from db.serializers.user import UserCreateSerializer, UserUpdateSerializer, KCUs
 from services.keycloak.keycloak import KCAdmin
 from services.postgres.repository import SqlAlchemyRepositoryAsync, sqlalchemy_repo_async_dependency, \
     sqlalchemy_repo_async_read_dependency
+from services.user_manager.current_user_cache import CurrentUserCache
 
 logger = setup_logger(log_name=Path(__file__).resolve().parent.stem)
 
@@ -28,9 +30,7 @@ class UserManager():
         kc_user = await self.kc_admin.get_user_by_email(user_ser.email)
 
         if kc_user is None:
-            kc_user = await self.kc_admin.create_user(user_ser)
-            await self.kc_admin.set_password(kc_user.uuid, password)
-            await self.kc_admin.verify(kc_user.uuid)
+            kc_user = await self.kc_admin.create_user(user_ser, password=password, email_verified=True)
         else:
             if kc_user.last_name != user_ser.last_name or kc_user.first_name != user_ser.first_name:
                 await self.kc_admin.update_user_names(kc_user.uuid, UserUpdateSerializer(first_name=user_ser.first_name,
@@ -51,6 +51,7 @@ class UserManager():
                     user.uuid != user_ser.uuid
             ):
                 user = await self.repo_write.update(user, user_ser)
+                await CurrentUserCache().invalidate(user.uuid)
         return user
 
     async def get_or_create_or_update_user(self, user_ser: UserCreateSerializer | UserUpdateSerializer,
@@ -60,6 +61,26 @@ class UserManager():
         db_user = await self.get_or_create_or_update_user_in_local_db(user_ser)
         return db_user
 
+    async def sync_users(self, user_sers: list[UserCreateSerializer], password='test') -> list[UserModel]:
+        """get_or_create_or_update_user for many users: they are reconciled with keycloak in bulk,
+        then upserted to local db by email. users failed to sync with keycloak are skipped"""
+        kc_users = await self.kc_admin.sync_users(user_sers, password=password)
+        synced_user_sers = []
+        for user_ser in user_sers:
+            kc_user = kc_users.get(user_ser.email)
+            if kc_user is not None:
+                user_ser.uuid = kc_user.uuid
+                synced_user_sers.append(user_ser)
+        if not synced_user_sers:
+            return []
+        users = await self.repo_write.bulk_upsert(UserModel, synced_user_sers, index_elements=['email'],
+                                                  update_fields=['uuid', 'first_name', 'last_name', 'roles'],
+                                                  exclude_none=False, exclude_unset=False)
+        current_user_cache = CurrentUserCache()
+        await asyncio.gather(*(current_user_cache.invalidate(user.uuid) for user in users))
+        logger.debug(f'synced {len(users)} of {len(user_sers)} users')
+        return users
+
     async def _email_exists_in_local_db(self, email: pd.EmailStr) -> None:
         user_with_the_same_email = await self.repo_write.get(UserModel, email=email)
         return user_with_the_same_email is not None
@@ -123,6 +144,7 @@ class UserManager():
             await self.kc_admin.update_user_roles(user.uuid, user_ser)
 
         user = await self.repo_write.update(user, user_ser, exclude_none=exclude_none, exclude_unset=exclude_unset)
+        await CurrentUserCache().invalidate(user.uuid)
         logger.debug(f'updated {user=}')
         return user
 
@@ -131,6 +153,7 @@ class UserManager():
         user = await self.repo_write.get(UserModel, uuid=user_uuid)
         if not user.is_active:
             await self.repo_write.update(user, UserUpdateSerializer(is_active=True))
+            await CurrentUserCache().invalidate(user.uuid)
         logger.debug(f'activated {user=}')
         return {'detail': ResponseDetailEnum.ok}
 
@@ -139,6 +162,7 @@ class UserManager():
         user = await self.repo_write.get(UserModel, uuid=user_uuid)
         if user.is_active:
             await self.repo_write.update(user, UserUpdateSerializer(is_active=False))
+            await CurrentUserCache().invalidate(user.uuid)
         logger.debug(f'deactivated {user=}')
         return {'detail': ResponseDetailEnum.ok}
 
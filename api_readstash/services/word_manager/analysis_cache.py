@@ -0,0 +1,89 @@
+import orjson
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from core import config
+from core.constants import PARTS_OF_SPEECH_UPOS
+from core.enums import LanguagesISO2NamesEnum
+from core.shared import singleton_decorator
+from db import SessionLocalReadAsync
+from db.models.word import WordModel
+from services.cache.cache import LRUCache, RedisCache
+from services.word_manager.logger_setup import logger
+
+
+@singleton_decorator
+class WordAnalysisCache:
+    """
+    lemma and universal pos of single words, as returned by nlp api 'analyses/analyze'.
+    first tier is in-process LRU, second is redis shared by all workers.
+    words stored in 'word' table are already analyzed, so both tiers are pre-warmed from it.
+    """
+    prewarmed_key = 'word_analysis:prewarmed'
+    prewarm_batch_size = 5_000
+
+    def __init__(self):
+        self.lru = LRUCache(max_size=config.ANALYSIS_CACHE_LRU_SIZE)
+        self.redis_cache = RedisCache()
+
+    @staticmethod
+    def _cache_key(characters: str, iso2: LanguagesISO2NamesEnum | str) -> str:
+        return f'word_analysis:{iso2}:{characters}'
+
+    async def get(self, characters: str, iso2: LanguagesISO2NamesEnum) -> dict | None:
+        cache_key = self._cache_key(characters, iso2)
+        analysis = self.lru.get_cache(cache_key)
+        if analysis is None:
+            analysis = await self.redis_cache.get_cache(cache_key)
+            if analysis is not None:
+                self.lru.set_cache(cache_key, analysis)
+        return analysis
+
+    async def set(self, characters: str, iso2: LanguagesISO2NamesEnum, analysis: dict) -> None:
+        cache_key = self._cache_key(characters, iso2)
+        analysis = {'lemma': analysis['lemma'], 'pos': analysis['pos']}
+        self.lru.set_cache(cache_key, analysis)
+        await self.redis_cache.set_cache(cache_key, analysis, config.ANALYSIS_CACHE_REDIS_EXPIRES_IN_SECONDS)
+
+    async def prewarm(self) -> None:
+        """fill LRU with most recently created words from read replica,
+        redis is filled with all words by only one worker per ANALYSIS_CACHE_REDIS_EXPIRES_IN_SECONDS"""
+        try:
+            fill_redis = await self.redis_cache.redis.set(self.prewarmed_key, 1, nx=True,
+                                                          ex=config.ANALYSIS_CACHE_REDIS_EXPIRES_IN_SECONDS)
+        except RedisError as e:
+            logger.error(f"can't check {self.prewarmed_key}: {e}")
+            fill_redis = False
+
+        stmt = (select(WordModel.characters, WordModel.lemma, WordModel.pos, WordModel.language_iso_2)
+                .order_by(WordModel.id.desc())
+                .execution_options(yield_per=self.prewarm_batch_size))
+        if not fill_redis:
+            stmt = stmt.limit(config.ANALYSIS_CACHE_LRU_SIZE)
+
+        lru_filled = 0
+        async with SessionLocalReadAsync() as session:
+            result = await session.stream(stmt)
+            async for rows in result.partitions():
+                mapping = {}
+                for characters, lemma, pos, iso2 in rows:
+                    upos = PARTS_OF_SPEECH_UPOS.get(iso2, {}).get(pos)
+                    if upos is None:
+                        continue
+                    cache_key = self._cache_key(characters, iso2)
+                    analysis = {'lemma': lemma, 'pos': upos}
+                    # newest first, so older ones must not push them out of LRU
+                    if lru_filled < config.ANALYSIS_CACHE_LRU_SIZE:
+                        self.lru.set_cache(cache_key, analysis)
+                        lru_filled += 1
+                    mapping[cache_key] = orjson.dumps(analysis)
+                if fill_redis and mapping:
+                    try:
+                        async with self.redis_cache.redis.pipeline(transaction=False) as pipe:
+                            for cache_key, data in mapping.items():
+                                pipe.set(cache_key, data, ex=config.ANALYSIS_CACHE_REDIS_EXPIRES_IN_SECONDS)
+                            await pipe.execute()
+                    except RedisError as e:
+                        logger.error(f"can't prewarm redis: {e}")
+                        fill_redis = False
+        logger.debug(f'prewarmed word analysis cache, {lru_filled=}')
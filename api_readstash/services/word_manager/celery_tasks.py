@@ -1,14 +1,26 @@
 import asyncio
+import math
+
 import backoff
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY
 
 from celery_app import celery_app
-from core.enums import TasksNamesEnum, ChatGPTModelsEnum
+from core import config
+from core.constants import CELERY_TASK_PRIORITIES
+from core.enums import TasksNamesEnum, ChatGPTModelsEnum, LanguagesISO2NamesEnum, CacheNamespacesEnum
 from db import SessionLocalAsync
 from db.models.word import WordModel
 from db.serializers.word import WordUpdateSerializer
+from services.cache.tiered_cache import TieredCache
 from services.postgres.repository import SqlAlchemyRepositoryAsync
-from services.word_manager.chatgpt_helpers import identify_word_level_chatgpt
+from services.word_manager.chatgpt_helpers import identify_word_level_chatgpt, identify_words_levels_chatgpt
+from services.word_manager.level_identification_buffer import WordsLevelBuffer
 from services.word_manager.logger_setup import logger
+from services.word_manager.vocabulary_index import VocabularyIndex
+
+# model answered with something that is not levels of words, same batch would most likely fail the same way
+BATCH_RESPONSE_ERRORS = (ValueError, KeyError, TypeError, AttributeError)
 
 
 @celery_app.task(name=TasksNamesEnum.words_identify_level_task)
@@ -23,6 +35,8 @@ def words_identify_level_task(word_uuid: str, gpt_model: ChatGPTModelsEnum):
                 word = await repo.get(WordModel, raise_if_not_found=True, uuid=word_uuid)
                 level_cefr_code = await identify_word_level_chatgpt(word.characters, word.language_iso_2, gpt_model)
                 word = await repo.update(word, WordUpdateSerializer(level_cefr_code=level_cefr_code))
+                await VocabularyIndex().publish_words([word])
+                await TieredCache().invalidate(CacheNamespacesEnum.word, word.uuid)
                 logger.debug(f'updated {word=} level to {level_cefr_code=}')
             except Exception as e:
                 detail = f'{TasksNamesEnum.words_identify_level_task} failed with {word_uuid=}: {e.__class__.__name__}: {e}'
@@ -35,3 +49,94 @@ def words_identify_level_task(word_uuid: str, gpt_model: ChatGPTModelsEnum):
         asyncio.ensure_future(identify_word_level_async(word_uuid, gpt_model))
     else:
         loop.run_until_complete(identify_word_level_async(word_uuid, gpt_model))
+
+
+def identify_words_levels_one_by_one(word_uuids: list[str], gpt_model: ChatGPTModelsEnum):
+    for word_uuid in word_uuids:
+        words_identify_level_task.apply_async(
+            args=[word_uuid, gpt_model],
+            queue='default',
+            priority=CELERY_TASK_PRIORITIES[TasksNamesEnum.words_identify_level_task]
+        )
+
+
+@celery_app.task(name=TasksNamesEnum.words_identify_level_batch_task)
+@backoff.on_exception(backoff.constant, Exception, max_tries=5)
+def words_identify_level_batch_task(iso2: LanguagesISO2NamesEnum, gpt_model: ChatGPTModelsEnum):
+    """identify levels of up to WORDS_LEVEL_BATCH_SIZE pending words of language with one prompt"""
+    logger.debug(f'{TasksNamesEnum.words_identify_level_batch_task} started with {iso2=}')
+
+    async def identify_words_levels_async(iso2: LanguagesISO2NamesEnum, gpt_model: ChatGPTModelsEnum):
+        buffer = WordsLevelBuffer()
+        word_uuids = await buffer.pop_batch(iso2, gpt_model)
+        if not word_uuids:
+            return
+        try:
+            async with SessionLocalAsync() as session:
+                result = await session.execute(
+                    sa.select(WordModel.id, WordModel.characters, WordModel.uuid, WordModel.pos)
+                    .filter(WordModel.uuid == sa.any_(sa.cast(word_uuids, ARRAY(sa.UUID(as_uuid=False))))))
+                words = result.all()
+                if not words:
+                    return
+                try:
+                    levels = await identify_words_levels_chatgpt([word.characters for word in words], iso2, gpt_model)
+                except BATCH_RESPONSE_ERRORS as e:
+                    logger.warning(f'invalid response for batch of {len(words)} {iso2} words, '
+                                   f'identifying them one by one: {e.__class__.__name__}: {e}')
+                    await buffer.clear_attempts(iso2, gpt_model, word_uuids)
+                    identify_words_levels_one_by_one([word.uuid for word in words], gpt_model)
+                    return
+                values = [{'id': word.id, 'level_cefr_code': level}
+                          for word, level in zip(words, levels) if level is not None]
+                if values:
+                    # orm bulk update by primary key, executemany of one UPDATE statement
+                    await session.execute(sa.update(WordModel), values)
+                    await session.commit()
+                    await VocabularyIndex().publish([
+                        {'iso2': iso2, 'characters': word.characters, 'uuid': word.uuid, 'pos': word.pos,
+                         'level_cefr_code': level}
+                        for word, level in zip(words, levels) if level is not None])
+                    await TieredCache().invalidate(
+                        CacheNamespacesEnum.word, *(word.uuid for word, level in zip(words, levels) if level is not None))
+                await buffer.clear_attempts(iso2, gpt_model, word_uuids)
+                # words the model answered no valid cefr code for
+                identify_words_levels_one_by_one([word.uuid for word, level in zip(words, levels) if level is None],
+                                                 gpt_model)
+                logger.debug(f'updated levels of {len(values)}/{len(words)} {iso2} words')
+        except Exception as e:
+            detail = (f'{TasksNamesEnum.words_identify_level_batch_task} failed with {iso2=}, {len(word_uuids)=}: '
+                      f'{e.__class__.__name__}: {e}')
+            logger.error(detail)
+            exhausted_word_uuids = await buffer.push_back(iso2, gpt_model, word_uuids)
+            if exhausted_word_uuids:
+                logger.warning(f'{len(exhausted_word_uuids)} {iso2} words failed in '
+                               f'{config.WORDS_LEVEL_BATCH_MAX_ATTEMPTS} batches, identifying them one by one')
+                identify_words_levels_one_by_one(exhausted_word_uuids, gpt_model)
+            raise e
+
+    loop = asyncio.get_event_loop()
+    if loop.is_running():
+        asyncio.ensure_future(identify_words_levels_async(iso2, gpt_model))
+    else:
+        loop.run_until_complete(identify_words_levels_async(iso2, gpt_model))
+
+
+@celery_app.task(name=TasksNamesEnum.words_identify_level_flush_task)
+def words_identify_level_flush_task():
+    """periodic, schedules batch tasks for all pending words, so words of small batches don't wait forever"""
+
+    async def flush_async():
+        for iso2, gpt_model, pending_count in await WordsLevelBuffer().list_pending():
+            for _ in range(math.ceil(pending_count / config.WORDS_LEVEL_BATCH_SIZE)):
+                words_identify_level_batch_task.apply_async(
+                    args=[iso2, gpt_model],
+                    queue='default',
+                    priority=CELERY_TASK_PRIORITIES[TasksNamesEnum.words_identify_level_batch_task]
+                )
+
+    loop = asyncio.get_event_loop()
+    if loop.is_running():
+        asyncio.ensure_future(flush_async())
+    else:
+        loop.run_until_complete(flush_async())
@@ -23,12 +23,43 @@ async def identify_word_level_chatgpt(
         valid codes: {valid_codes}
         """
 
+    def parse(resp_text: str) -> LevelCEFRCodesEnum:
+        level_cefr_code = json.loads(resp_text)['level_cefr_code']
+        assert level_cefr_code in valid_codes, 'not valid code was identified'
+        return level_cefr_code
+
     chatgpt = ChatGPT(model=model, prompt=prompt)
-    resp_text = await chatgpt.get_response_text(f"'{word_input=}', '{input_lang_iso2=}'")
-    resp_dict = json.loads(resp_text)
-    level_cefr_code = resp_dict['level_cefr_code']
-    assert level_cefr_code in valid_codes, 'not valid code was identified'
-    return level_cefr_code
+    return await chatgpt.get_response_text(f"'{word_input=}', '{input_lang_iso2=}'", parse=parse)
+
+
+async def identify_words_levels_chatgpt(
+        words_input: list[str],
+        input_lang_iso2: LanguagesISO2NamesEnum,
+        model: ChatGPTModelsEnum = ChatGPTModelsEnum.gpt_4,
+        system: LevelSystemNamesEnum = LevelSystemNamesEnum.CEFR,
+) -> list[LevelCEFRCodesEnum | None]:
+    """identify levels of many words with one prompt, None for words model failed to return valid code"""
+    response_words_levels_ex_1 = """
+        {
+          "levels": {"1": "...", "2": "..."}
+        }
+        """
+    valid_codes = [l for l in LevelCEFRCodesEnum]
+    prompt = f"""You are words' CEFR level identifier.
+        I provide you numbered words of one language.
+        Your response must be exactly as the following example, with level for every number:
+        {response_words_levels_ex_1}
+        valid codes: {valid_codes}
+        """
+
+    def parse(resp_text: str) -> list[LevelCEFRCodesEnum | None]:
+        levels = json.loads(resp_text)['levels']
+        return [levels.get(str(i)) if levels.get(str(i)) in valid_codes else None
+                for i in range(1, len(words_input) + 1)]
+
+    numbered_words = '\n'.join(f'{i}. {word}' for i, word in enumerate(words_input, start=1))
+    chatgpt = ChatGPT(model=model, prompt=prompt)
+    return await chatgpt.get_response_text(f"'{input_lang_iso2=}'\n{numbered_words}", parse=parse)
 
 
 async def identify_word_part_of_speech_chatgpt(
@@ -48,9 +79,13 @@ async def identify_word_part_of_speech_chatgpt(
     Valid pos vars: {', '.join(PARTS_OF_SPEECH[input_lang_iso2].values())}
     """
 
+    def parse(resp_text: str) -> dict:
+        resp_dict = json.loads(resp_text)
+        assert resp_dict['word_pos'] in PARTS_OF_SPEECH[input_lang_iso2].values(), 'not valid pos was identified'
+        return resp_dict
+
     chatgpt = ChatGPT(model=model, prompt=prompt)
-    resp_text = await chatgpt.get_response_text(f"'{text_input=}', '{input_lang_iso2=}'")
-    return json.loads(resp_text)
+    return await chatgpt.get_response_text(f"'{text_input=}', '{input_lang_iso2=}'", parse=parse)
 
 
 async def identify_word_lemma_chatgpt(
@@ -71,6 +106,10 @@ async def identify_word_lemma_chatgpt(
     Punctuation, capitalization must be the same as in provided input.
     """
 
+    def parse(resp_text: str) -> dict:
+        resp_dict = json.loads(resp_text)
+        assert resp_dict['lemma'], 'no lemma was identified'
+        return resp_dict
+
     chatgpt = ChatGPT(model=model, prompt=prompt)
-    resp_text = await chatgpt.get_response_text(f"'{input_text=}', '{input_language_iso2_name=}'")
-    return json.loads(resp_text)
+    return await chatgpt.get_response_text(f"'{input_text=}', '{input_language_iso2_name=}'", parse=parse)
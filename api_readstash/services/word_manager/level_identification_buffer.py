@@ -0,0 +1,70 @@
+from redis.asyncio import Redis
+
+from core import config
+from core.enums import ChatGPTModelsEnum, LanguagesISO2NamesEnum
+from services.cache.cache import RedisCache
+
+
+class WordsLevelBuffer:
+    """
+    redis lists of word uuids waiting for CEFR level identification, one list per (language, gpt model),
+    so that words are classified by words_identify_level_batch_task with one prompt per WORDS_LEVEL_BATCH_SIZE words
+    """
+    key_prefix = 'words_identify_level:pending'
+    attempts_key_prefix = 'words_identify_level:attempts'
+
+    def __init__(self):
+        self.redis: Redis = RedisCache().redis
+
+    @classmethod
+    def _key(cls, iso2: LanguagesISO2NamesEnum | str, gpt_model: ChatGPTModelsEnum | str) -> str:
+        return f'{cls.key_prefix}:{iso2}:{gpt_model}'
+
+    async def push(self, iso2: LanguagesISO2NamesEnum, gpt_model: ChatGPTModelsEnum, *word_uuids: str) -> int:
+        """returns number of pending words of this language and model"""
+        return await self.redis.rpush(self._key(iso2, gpt_model), *word_uuids)
+
+    async def pop_batch(self, iso2: LanguagesISO2NamesEnum, gpt_model: ChatGPTModelsEnum,
+                        size: int = config.WORDS_LEVEL_BATCH_SIZE) -> list[str]:
+        word_uuids = await self.redis.lpop(self._key(iso2, gpt_model), size)
+        return [word_uuid.decode() for word_uuid in word_uuids or []]
+
+    @classmethod
+    def _attempts_key(cls, iso2: LanguagesISO2NamesEnum | str, gpt_model: ChatGPTModelsEnum | str) -> str:
+        return f'{cls.attempts_key_prefix}:{iso2}:{gpt_model}'
+
+    async def push_back(self, iso2: LanguagesISO2NamesEnum, gpt_model: ChatGPTModelsEnum,
+                        word_uuids: list[str]) -> list[str]:
+        """
+        return words of failed batch to the head of list, except words that were in WORDS_LEVEL_BATCH_MAX_ATTEMPTS
+        failed batches already, so that one word can't make its batch fail forever. returns those words
+        """
+        if not word_uuids:
+            return []
+        attempts_key = self._attempts_key(iso2, gpt_model)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for word_uuid in word_uuids:
+                pipe.hincrby(attempts_key, word_uuid, 1)
+            pipe.expire(attempts_key, config.WORDS_LEVEL_ATTEMPTS_EXPIRES_IN_SECONDS)
+            *attempts, _ = await pipe.execute()
+        exhausted = [word_uuid for word_uuid, attempt in zip(word_uuids, attempts)
+                     if attempt >= config.WORDS_LEVEL_BATCH_MAX_ATTEMPTS]
+        retried = [word_uuid for word_uuid, attempt in zip(word_uuids, attempts)
+                   if attempt < config.WORDS_LEVEL_BATCH_MAX_ATTEMPTS]
+        if retried:
+            await self.redis.lpush(self._key(iso2, gpt_model), *reversed(retried))
+        await self.clear_attempts(iso2, gpt_model, exhausted)
+        return exhausted
+
+    async def clear_attempts(self, iso2: LanguagesISO2NamesEnum, gpt_model: ChatGPTModelsEnum,
+                             word_uuids: list[str]) -> None:
+        if word_uuids:
+            await self.redis.hdel(self._attempts_key(iso2, gpt_model), *word_uuids)
+
+    async def list_pending(self) -> list[tuple[str, str, int]]:
+        """(iso2, gpt model, number of pending words) of all non empty lists"""
+        pending = []
+        async for key in self.redis.scan_iter(match=f'{self.key_prefix}:*'):
+            iso2, gpt_model = key.decode().removeprefix(f'{self.key_prefix}:').split(':', 1)
+            pending.append((iso2, gpt_model, await self.redis.llen(key)))
+        return pending
@@ -0,0 +1,171 @@
+import asyncio
+import time
+import uuid
+from array import array
+from bisect import bisect_left
+from typing import NamedTuple, Iterable
+
+import orjson
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from core import config
+from core.enums import LanguagesISO2NamesEnum
+from core.shared import singleton_decorator
+from db import SessionLocalReadAsync
+from db.models.word import WordModel
+from services.cache.cache import RedisCache
+from services.word_manager.logger_setup import logger
+
+
+class VocabularyEntry(NamedTuple):
+    uuid: str
+    pos: str
+    level_cefr_code: str | None
+
+
+class LanguageVocabulary:
+    """
+    words of one language: sorted characters searched with bisect, parallel arrays of
+    uuids (packed 16 bytes each), pos and level (indexes in small tuples of distinct values).
+    changes since build are kept in overlay (None for removed words) until next rebuild.
+    """
+
+    def __init__(self, rows: list[tuple[str, str, str, str | None]]):
+        rows.sort(key=lambda row: row[0])
+        self.pos_values = tuple(sorted({row[2] for row in rows}))
+        self.level_values = (None, *sorted({row[3] for row in rows if row[3] is not None}))
+        pos_indexes = {pos: i for i, pos in enumerate(self.pos_values)}
+        level_indexes = {level: i for i, level in enumerate(self.level_values)}
+
+        self.characters: list[str] = [row[0] for row in rows]
+        self.uuids = b''.join(uuid.UUID(row[1]).bytes for row in rows)
+        self.pos = array('H', (pos_indexes[row[2]] for row in rows))
+        self.levels = array('B', (level_indexes[row[3]] for row in rows))
+        self.overlay: dict[str, VocabularyEntry | None] = {}
+
+    def __len__(self):
+        return len(self.characters)
+
+    def get(self, characters: str) -> VocabularyEntry | None:
+        if characters in self.overlay:
+            return self.overlay[characters]
+        i = bisect_left(self.characters, characters)
+        if i == len(self.characters) or self.characters[i] != characters:
+            return None
+        return VocabularyEntry(uuid=str(uuid.UUID(bytes=self.uuids[i * 16:(i + 1) * 16])),
+                               pos=self.pos_values[self.pos[i]],
+                               level_cefr_code=self.level_values[self.levels[i]])
+
+    def set(self, characters: str, entry: VocabularyEntry | None):
+        self.overlay[characters] = entry
+
+
+@singleton_decorator
+class VocabularyIndex:
+    """
+    in-process index of 'word' table per language, to check words existence without going to postgres.
+    built from read replica and rebuilt every VOCABULARY_INDEX_REBUILD_INTERVAL_SECONDS,
+    changes made by any process are published to redis channel and applied by all subscribed ones.
+    until language is built (or if it failed to) lookups return None and callers fall back to postgres.
+    """
+    channel = 'vocabulary_index:changes'
+    build_batch_size = 10_000
+
+    def __init__(self):
+        self.redis_cache = RedisCache()
+        self.languages: dict[str, LanguageVocabulary] = {}
+        self.built_at: float | None = None
+
+    def is_built(self, iso2: LanguagesISO2NamesEnum | str) -> bool:
+        return str(iso2) in self.languages
+
+    def get(self, iso2: LanguagesISO2NamesEnum | str, characters: str) -> VocabularyEntry | None:
+        vocabulary = self.languages.get(str(iso2))
+        return vocabulary.get(characters) if vocabulary is not None else None
+
+    def contains(self, iso2: LanguagesISO2NamesEnum | str, characters: str) -> bool | None:
+        """None if not known, because index of language is not built"""
+        if not self.is_built(iso2):
+            return None
+        return self.get(iso2, characters) is not None
+
+    async def build(self) -> None:
+        rows_by_iso2: dict[str, list[tuple[str, str, str, str | None]]] = {}
+        stmt = (select(WordModel.language_iso_2, WordModel.characters, WordModel.uuid, WordModel.pos,
+                       WordModel.level_cefr_code)
+                .filter(WordModel.language_iso_2.is_not(None))
+                .execution_options(yield_per=self.build_batch_size))
+        async with SessionLocalReadAsync() as session:
+            result = await session.stream(stmt)
+            async for rows in result.partitions():
+                for iso2, characters, word_uuid, pos, level_cefr_code in rows:
+                    rows_by_iso2.setdefault(iso2, []).append((characters, word_uuid, pos, level_cefr_code))
+        # sorting and packing of millions of rows shouldn't stall event loop for its whole duration
+        self.languages = await asyncio.to_thread(
+            lambda: {iso2: LanguageVocabulary(rows) for iso2, rows in rows_by_iso2.items()})
+        self.built_at = time.time()
+        logger.debug(f'built vocabulary index: { {iso2: len(v) for iso2, v in self.languages.items()} }')
+
+    def _apply(self, changes: list[dict]) -> None:
+        for change in changes:
+            vocabulary = self.languages.get(change['iso2'])
+            if vocabulary is None:
+                # language appeared after build, it will be indexed by next one
+                continue
+            entry = None if change.get('removed') else VocabularyEntry(
+                uuid=change['uuid'], pos=change['pos'], level_cefr_code=change.get('level_cefr_code'))
+            vocabulary.set(change['characters'], entry)
+
+    async def publish(self, changes: list[dict]) -> None:
+        """changes are dicts with iso2, characters, uuid, pos, level_cefr_code or with iso2, characters, removed"""
+        self._apply(changes)
+        try:
+            await self.redis_cache.redis.publish(self.channel, orjson.dumps(changes))
+        except RedisError as e:
+            # other processes get it with next rebuild
+            logger.error(f"can't publish {len(changes)} vocabulary changes: {e}")
+
+    async def publish_words(self, words: Iterable[WordModel]) -> None:
+        """created or updated words"""
+        changes = [{'iso2': word.language_iso_2, 'characters': word.characters, 'uuid': word.uuid,
+                    'pos': word.pos, 'level_cefr_code': word.level_cefr_code}
+                   for word in words if word.language_iso_2 is not None]
+        if changes:
+            await self.publish(changes)
+
+    async def publish_removed(self, iso2: LanguagesISO2NamesEnum | str, characters: str) -> None:
+        await self.publish([{'iso2': str(iso2), 'characters': characters, 'removed': True}])
+
+    async def run(self) -> None:
+        """
+        subscribe, build, then apply published changes and rebuild periodically, to be run as background task.
+        messages published while building wait in subscription and are applied after it, so nothing is missed.
+        after connection loss everything is rebuilt, as changes could be missed meanwhile.
+        """
+        while True:
+            try:
+                async with self.redis_cache.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    await self.build()
+                    rebuild_at = time.monotonic() + config.VOCABULARY_INDEX_REBUILD_INTERVAL_SECONDS
+                    while True:
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                        if message is not None:
+                            self._apply(orjson.loads(message['data']))
+                        if time.monotonic() >= rebuild_at:
+                            await self.build()
+                            rebuild_at = time.monotonic() + config.VOCABULARY_INDEX_REBUILD_INTERVAL_SECONDS
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'vocabulary index failed, retrying: {e.__class__.__name__}: {e}')
+                self.languages = {}
+                await asyncio.sleep(config.VOCABULARY_INDEX_RETRY_INTERVAL_SECONDS)
+
+    def get_stats(self) -> dict:
+        return {
+            'built_at': self.built_at,
+            'languages': {iso2: {'words': len(vocabulary), 'overlay': len(vocabulary.overlay)}
+                          for iso2, vocabulary in self.languages.items()},
+        }
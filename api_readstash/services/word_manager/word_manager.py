@@ -1,10 +1,15 @@
+import asyncio
+import hashlib
+
 import fastapi as fa
+import orjson
 import sqlalchemy as sa
 from sqlalchemy import select
 
+from core import config
 from core.constants import CELERY_TASK_PRIORITIES, PARTS_OF_SPEECH
 from core.enums import ChatGPTModelsEnum, OrderEnum, UserWordStatusEnum, DBSessionModeEnum, TasksNamesEnum, \
-    ResponseDetailEnum, LanguagesISO2NamesEnum, RequestMethodsEnum
+    ResponseDetailEnum, LanguagesISO2NamesEnum, RequestMethodsEnum, CountModeEnum, CacheNamespacesEnum
 from core.exceptions import AlreadyExistsException
 from db.models.association import UserWordStatusFileAssoc
 from db.models.file_storage import FileIndexModel
@@ -13,14 +18,22 @@ from db.serializers.analyses import AnalysesOutSerializer
 from db.serializers.association import UserWordStatusFileCreateSerializer, UserWordStatusFileUpdateSerializer
 from db.serializers.translations import TranslWordInSerializer, TranslWordOutSerializer, TranslNlpAPIInSerializer, \
     TranslNlpAPIOutSerializer
-from db.serializers.word import WordCreateSerializer, WordUpdateSerializer, WordOrderByEnum, WordsPaginatedSerializer
+from db.serializers.word import WordCreateSerializer, WordUpdateSerializer, WordOrderByEnum, WordsPaginatedSerializer, \
+    WordAutocompleteSerializer, WordReadSerializer
+from services.cache.tiered_cache import TieredCache
 from services.inter_service_manager.inter_service_manager import InterServiceManager
 from services.postgres.repository import SqlAlchemyRepositoryAsync, sqlalchemy_repo_async_dependency, \
     sqlalchemy_repo_async_read_dependency
 from services.translator.translator import translate_with_nlp_api
-from services.word_manager.celery_tasks import words_identify_level_task
+from services.word_manager.analysis_cache import WordAnalysisCache
+from services.word_manager.celery_tasks import words_identify_level_batch_task
 from services.word_manager.chatgpt_helpers import identify_word_level_chatgpt
+from services.word_manager.level_identification_buffer import WordsLevelBuffer
 from services.word_manager.logger_setup import logger
+from services.word_manager.vocabulary_index import VocabularyIndex
+
+# strong references to tasks left running after response, so they are not garbage collected
+background_tasks: set[asyncio.Task] = set()
 
 
 class WordManager:
@@ -52,17 +65,28 @@ class WordManager:
             query = query.filter(WordModel.level_cefr_code == level_cefr_code)
         return query
 
-    async def _paginate_query(
-            self,
-            stmt: sa.Select,
-            order_by: WordOrderByEnum,
-            order: OrderEnum,
-            pagination_params: dict,
-    ) -> sa.Select:
-        order = sa.desc if order == OrderEnum.desc else sa.asc
-        stmt = stmt.order_by(order(getattr(WordModel, order_by)))
-        stmt = stmt.offset(pagination_params["offset"]).limit(pagination_params["limit"])
-        return stmt
+    @staticmethod
+    def _order_column(order_by: WordOrderByEnum):
+        if order_by == WordOrderByEnum.updated_at:
+            # updated_at is NULL until first update, keyset pagination needs not null sort key
+            return sa.func.coalesce(WordModel.updated_at, WordModel.created_at)
+        return getattr(WordModel, order_by)
+
+    async def _count(self, query: sa.Select, count_mode: CountModeEnum, cache_key_parts: dict) -> int | None:
+        """'estimated' count is exact one cached for LISTING_COUNT_CACHE_EXPIRES_IN_SECONDS"""
+        if count_mode == CountModeEnum.none:
+            return None
+        cache = TieredCache()
+        key_hash = hashlib.sha256(orjson.dumps(cache_key_parts, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+        async def count_exact() -> int:
+            return await self.repo_read.session.scalar(select(sa.func.count()).select_from(query.subquery()))
+
+        if count_mode == CountModeEnum.estimated:
+            return await cache.get_or_compute(CacheNamespacesEnum.words_count, key_hash, count_exact)
+        count = await count_exact()
+        await cache.set(CacheNamespacesEnum.words_count, key_hash, count)
+        return count
 
     async def get_word(self,
                        uuid: str,
@@ -77,37 +101,55 @@ class WordManager:
             word = await self.repo_write.get(WordModel, raise_if_not_found=raise_if_not_found, uuid=uuid)
         return word
 
+    async def get_word_cached(self, uuid: str) -> dict:
+        """
+        serialized word from tiered cache, invalidated on word changes.
+        recomputed from primary, replica may still lag behind change that invalidated it
+        """
+
+        async def get_word_dict() -> dict:
+            word = await self.get_word(uuid, session_mode=DBSessionModeEnum.rw)
+            return WordReadSerializer.model_validate(word).model_dump(mode='json')
+
+        return await TieredCache().get_or_compute(CacheNamespacesEnum.word, uuid, get_word_dict)
+
     async def list_filtered_paginated_words(self,
                                             word_params: dict,
                                             pagination_params: dict,
                                             order_by: WordOrderByEnum,
                                             order: OrderEnum,
+                                            count_mode: CountModeEnum = CountModeEnum.estimated,
                                             base_query=None,
+                                            count_scope: dict | None = None,
                                             ) -> WordsPaginatedSerializer:
-        """list all words for particular language"""
+        """list all words for particular language, page by page with cursor ('next_cursor' of previous page)"""
         assert self.repo_read is not None, 'repo_read must be provided'
 
         language_iso_2 = word_params.get('language_iso_2')
+        count_scope = {**(count_scope or {}), 'language_iso_2': language_iso_2}
 
         query = base_query if base_query is not None else select(WordModel).filter_by(language_iso_2=language_iso_2)
 
-        total_count_result = await self.repo_read.session.execute(
-            select(sa.func.count()).select_from(query.subquery())
-        )
-        total_count = total_count_result.scalar()
+        total_count = None
+        if base_query is None and count_mode == CountModeEnum.estimated:
+            total_count = await self.repo_read.estimate_count_by_value(WordModel, 'language_iso_2', language_iso_2)
+        if total_count is None:
+            total_count = await self._count(query, count_mode, count_scope)
 
+        filters = {key: value for key, value in word_params.items() if key != 'language_iso_2' and value is not None}
         query = await self._filter_query(query, word_params)
 
-        filtered_count_result = await self.repo_read.session.execute(
-            select(sa.func.count()).select_from(query.subquery()))
-        filtered_count = filtered_count_result.scalar()
+        filtered_count = total_count
+        if filters:
+            filtered_count = await self._count(query, count_mode, {**count_scope, **filters})
 
-        query = await self._paginate_query(query, order_by, order, pagination_params)
-        result = await self.repo_read.session.execute(query)
-        words = list(result.scalars().all())
+        words, next_cursor = await self.repo_read.keyset_paginate(
+            query, order_by, self._order_column(order_by), WordModel.id, order,
+            pagination_params['limit'], pagination_params['cursor'])
 
         return WordsPaginatedSerializer(
             words=words,
+            next_cursor=next_cursor,
             total_count=total_count,
             filtered_count=filtered_count)
 
@@ -118,6 +160,7 @@ class WordManager:
                                                             order_by: WordOrderByEnum,
                                                             order: OrderEnum,
                                                             status: UserWordStatusEnum,
+                                                            count_mode: CountModeEnum = CountModeEnum.estimated,
                                                             ) -> WordsPaginatedSerializer:
         """list words of user with particular language"""
         query = (
@@ -127,79 +170,163 @@ class WordManager:
             .filter(sa.and_(UserWordStatusFileAssoc.user_uuid == user_uuid,
                             UserWordStatusFileAssoc.status == status))
         )
-        return await self.list_filtered_paginated_words(word_params, pagination_params, order_by, order, query)
+        return await self.list_filtered_paginated_words(word_params, pagination_params, order_by, order,
+                                                        count_mode=count_mode,
+                                                        base_query=query,
+                                                        count_scope={'user_uuid': user_uuid, 'status': status})
+
+    async def autocomplete_words(self,
+                                 iso2: LanguagesISO2NamesEnum,
+                                 prefix: str,
+                                 limit: int = 10,
+                                 ) -> list[WordAutocompleteSerializer]:
+        """
+        words of language starting with prefix, read as range of 'ix_word_language_iso_2_characters_lower_c',
+        topped up with most similar ones by 'ix_word_characters_trgm' if there are less than limit of them
+        """
+        assert self.repo_read is not None, 'repo_read must be provided'
+        assert 0 < limit <= config.WORD_AUTOCOMPLETE_MAX_LIMIT, f'limit must be in 1..{config.WORD_AUTOCOMPLETE_MAX_LIMIT}'
+        prefix = prefix.strip().lower()
+        assert prefix, 'prefix must not be empty'
+
+        # range instead of LIKE 'prefix%', so that generic plans of prepared statements use index too
+        lower_characters = sa.func.lower(WordModel.characters).collate('C')
+        prefix_upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        columns = (WordModel.uuid, WordModel.characters, WordModel.lemma, WordModel.pos, WordModel.level_cefr_code)
+
+        result = await self.repo_read.session.execute(
+            select(*columns)
+            .filter(WordModel.language_iso_2 == iso2,
+                    lower_characters >= prefix,
+                    lower_characters < prefix_upper_bound)
+            .order_by(lower_characters)
+            .limit(limit))
+        words = [WordAutocompleteSerializer(**row._mapping, rank=1) for row in result]
+
+        # trigrams of shorter prefixes match too many words to be of any use
+        if len(words) < limit and len(prefix) >= 3:
+            similarity = sa.func.similarity(WordModel.characters, prefix)
+            stmt = (select(*columns, similarity.label('rank'))
+                    .filter(WordModel.language_iso_2 == iso2,
+                            WordModel.characters.op('%')(prefix))
+                    .order_by(similarity.desc())
+                    .limit(limit - len(words)))
+            if words:
+                stmt = stmt.filter(WordModel.uuid.notin_([word.uuid for word in words]))
+            result = await self.repo_read.session.execute(stmt)
+            words.extend(WordAutocompleteSerializer(**row._mapping) for row in result)
+        return words
 
     async def analyze_word_with_nlp_api(
             self,
             characters: str,
             iso2: LanguagesISO2NamesEnum,
     ) -> AnalysesOutSerializer:
+        analysis_cache = WordAnalysisCache()
+        analysis = await analysis_cache.get(characters, iso2)
+        if analysis is not None:
+            return AnalysesOutSerializer(words=[analysis], iso2=iso2)
 
         inter_serv_manager = InterServiceManager()
         url, code, resp = await inter_serv_manager.send_request_to_nlp(RequestMethodsEnum.post, 'analyses/analyze',
                                                                        {'content': characters, 'iso2': iso2})
         an_res = AnalysesOutSerializer.model_validate_json(resp)
+        if an_res.words:
+            await analysis_cache.set(characters, iso2, an_res.words[0])
         return an_res
 
+    async def queue_words_level_identification(
+            self,
+            word_uuids: list[str],
+            iso2: LanguagesISO2NamesEnum,
+            gpt_model: ChatGPTModelsEnum = ChatGPTModelsEnum.gpt_4o,
+    ) -> None:
+        """buffer words for batched level identification, start batch task as soon as full batch is pending,
+        the rest is flushed by periodic words_identify_level_flush_task"""
+        pending_count = await WordsLevelBuffer().push(iso2, gpt_model, *word_uuids)
+        for _ in range(pending_count // config.WORDS_LEVEL_BATCH_SIZE
+                       - (pending_count - len(word_uuids)) // config.WORDS_LEVEL_BATCH_SIZE):
+            words_identify_level_batch_task.apply_async(
+                args=[iso2, gpt_model],
+                queue='default',
+                priority=CELERY_TASK_PRIORITIES[TasksNamesEnum.words_identify_level_batch_task]
+            )
+
+    async def _find_word(self, characters: str, iso2: LanguagesISO2NamesEnum) -> WordModel | None:
+        """not existing words are answered by vocabulary index, existing ones are loaded by uuid,
+        by characters only if index of language is not built"""
+        vocabulary_index = VocabularyIndex()
+        if vocabulary_index.is_built(iso2):
+            entry = vocabulary_index.get(iso2, characters)
+            if entry is None:
+                return None
+            word = await self.repo_write.get(WordModel, uuid=entry.uuid)
+            if word is not None:
+                return word
+        return await self.repo_write.get(WordModel, characters=characters, language_iso_2=iso2)
+
+    async def _create_analyzed_word(
+            self,
+            word_ser: WordCreateSerializer,
+            gpt_model: ChatGPTModelsEnum,
+    ) -> tuple[bool, WordModel]:
+        an_res = await self.analyze_word_with_nlp_api(word_ser.characters, word_ser.language_iso_2)
+        word_res = an_res.words[0]
+        word_ser.lemma = word_res['lemma']
+        word_ser.pos = PARTS_OF_SPEECH[word_ser.language_iso_2][word_res['pos']]
+        # insert ... on conflict, vocabulary index may not know word created by other process yet
+        [(is_created, word)] = await self.repo_write.bulk_get_or_create(
+            WordModel, [word_ser], index_elements=['characters', 'language_iso_2'])
+        if is_created:
+            await VocabularyIndex().publish_words([word])
+            logger.debug(f'Created {word=}, queueing for {TasksNamesEnum.words_identify_level_batch_task}...')
+            await self.queue_words_level_identification([word.uuid], word.language_iso_2, gpt_model)
+        return is_created, word
+
     async def create_word(
             self,
             word_ser: WordCreateSerializer,
             gpt_model: ChatGPTModelsEnum = ChatGPTModelsEnum.gpt_4o,
     ):
-        word = await self.repo_write.get(WordModel, characters=word_ser.characters,
-                                         language_iso_2=word_ser.language_iso_2)
-        if word is not None:
+        exists = VocabularyIndex().contains(word_ser.language_iso_2, word_ser.characters)
+        if exists is None:
+            exists = await self.repo_write.get(WordModel, characters=word_ser.characters,
+                                               language_iso_2=word_ser.language_iso_2) is not None
+        if exists:
             raise AlreadyExistsException
-        else:
-            an_res = await self.analyze_word_with_nlp_api(word_ser.characters, word_ser.language_iso_2)
-            word_res = an_res.words[0]
-            word_ser.lemma = word_res['lemma']
-            word_ser.pos = PARTS_OF_SPEECH[word_ser.language_iso_2][word_res['pos']]
-            word = await self.repo_write.create(WordModel, word_ser)
-
-            logger.debug(f'Created {word=}, starting celery {TasksNamesEnum.words_identify_level_task}...')
-
-            words_identify_level_task.apply_async(
-                args=[word.uuid, gpt_model],
-                queue='default',
-                priority=CELERY_TASK_PRIORITIES[TasksNamesEnum.words_identify_level_task]
-            )
-            return word
+        is_created, word = await self._create_analyzed_word(word_ser, gpt_model)
+        if not is_created:
+            raise AlreadyExistsException
+        return word
 
     async def get_or_create_word(
             self,
             word_ser: WordCreateSerializer,
             gpt_model: ChatGPTModelsEnum = ChatGPTModelsEnum.gpt_4o,
     ) -> tuple[bool, WordModel]:
-        is_created = False
-        word = await self.repo_write.get(WordModel, characters=word_ser.characters,
-                                         language_iso_2=word_ser.language_iso_2)
-        if word is None:
-            an_res = await self.analyze_word_with_nlp_api(word_ser.characters, word_ser.language_iso_2)
-            word_res = an_res.words[0]
-            word_ser.lemma = word_res['lemma']
-            word_ser.pos = PARTS_OF_SPEECH[word_ser.language_iso_2][word_res['pos']]
-            word = await self.repo_write.create(WordModel, word_ser)
-            is_created = True
-
-            logger.debug(f'Created {word=}, starting celery {TasksNamesEnum.words_identify_level_task}...')
-
-            words_identify_level_task.apply_async(
-                args=[word.uuid, gpt_model],
-                queue='default',
-                priority=CELERY_TASK_PRIORITIES[TasksNamesEnum.words_identify_level_task]
-            )
-        return is_created, word
+        word = await self._find_word(word_ser.characters, word_ser.language_iso_2)
+        if word is not None:
+            return False, word
+        return await self._create_analyzed_word(word_ser, gpt_model)
 
     async def update_word(self, word_uuid: str, word_ser: WordUpdateSerializer,
                           exclude_none=True, exclude_unset=True) -> WordModel:
         word = await self.repo_write.get(WordModel, raise_if_not_found=True, uuid=word_uuid)
+        iso2, characters = word.language_iso_2, word.characters
         word = await self.repo_write.update(word, word_ser, exclude_none=exclude_none, exclude_unset=exclude_unset)
+        if (iso2, characters) != (word.language_iso_2, word.characters):
+            await VocabularyIndex().publish_removed(iso2, characters)
+        await VocabularyIndex().publish_words([word])
+        await TieredCache().invalidate(CacheNamespacesEnum.word, word.uuid)
         logger.debug(f'updated {word=}')
         return word
 
     async def remove_word(self, word_uuid):
+        word = await self.repo_write.get(WordModel, raise_if_not_found=True, uuid=word_uuid)
+        iso2, characters = word.language_iso_2, word.characters
         res = await self.repo_write.remove_by_uuid(WordModel, word_uuid)
+        await VocabularyIndex().publish_removed(iso2, characters)
+        await TieredCache().invalidate(CacheNamespacesEnum.word, word_uuid)
         logger.debug(f'removed {word_uuid=}')
         return res
 
@@ -207,6 +334,8 @@ class WordManager:
         word = await self.get_word(word_uuid, session_mode=DBSessionModeEnum.rw)
         level_cefr_code = await identify_word_level_chatgpt(word.characters, word.language_iso_2, gpt_model)
         word = await self.repo_write.update(word, WordUpdateSerializer(level_cefr_code=level_cefr_code))
+        await VocabularyIndex().publish_words([word])
+        await TieredCache().invalidate(CacheNamespacesEnum.word, word.uuid)
         logger.debug(f'updated {word=} level to {level_cefr_code=}')
         return word
 
@@ -227,45 +356,72 @@ class WordManager:
             await self.repo_write.update(assoc, UserWordStatusFileUpdateSerializer(status=status))
         return {"detail": ResponseDetailEnum.ok}
 
-    async def get_analyzed_word_translation_with_nlp_api(
+    async def _get_analyzed_lemma_word_and_image(
             self,
             word_transl_in_ser: TranslWordInSerializer,
-    ) -> TranslWordOutSerializer:
-
-        word_image_file_index_uuid = None
-
-        word_transl_out: TranslNlpAPIOutSerializer = await translate_with_nlp_api(
-            TranslNlpAPIInSerializer(text_input=word_transl_in_ser.word_input,
-                                     input_lang_iso2=word_transl_in_ser.input_lang_iso2,
-                                     target_lang_iso2=word_transl_in_ser.target_lang_iso2))
-        word_output = word_transl_out.text_output
-
+    ) -> tuple[str, WordModel, str | None]:
+        """analysis -> lemma word lookup (or creation) -> lemma word image lookup, the only branch using session"""
         an_res: AnalysesOutSerializer = await self.analyze_word_with_nlp_api(characters=word_transl_in_ser.word_input,
                                                                              iso2=word_transl_in_ser.input_lang_iso2)
         word_pos = PARTS_OF_SPEECH[word_transl_in_ser.input_lang_iso2][an_res.words[0]['pos']]
         lemma = an_res.words[0]['lemma']
-        lemma_word = await self.repo_write.get(WordModel, pos=word_pos, characters=lemma)
-        if lemma_word is None:
-            lemma_word = await self.create_word(WordCreateSerializer(
-                characters=lemma, lemma=lemma, pos=word_pos, language_iso_2=word_transl_in_ser.input_lang_iso2
-            ))
-
-        word_image_assoc = await self.repo_write.get(UserWordStatusFileAssoc, user_uuid=None, word_uuid=lemma_word.uuid)
-        if word_image_assoc is not None:
-            word_image_file_index = await self.repo_write.get(FileIndexModel, uuid=word_image_assoc.file_index_uuid)
-            if word_image_file_index is not None:
-                word_image_file_index_uuid = word_image_file_index.uuid
-
-        context_transl_out: TranslNlpAPIOutSerializer = await translate_with_nlp_api(
+        is_created, lemma_word = await self.get_or_create_word(WordCreateSerializer(
+            characters=lemma, lemma=lemma, pos=word_pos, language_iso_2=word_transl_in_ser.input_lang_iso2
+        ))
+
+        word_image_file_index_uuid = await self.repo_write.session.scalar(
+            select(FileIndexModel.uuid)
+            .join(UserWordStatusFileAssoc, UserWordStatusFileAssoc.file_index_uuid == FileIndexModel.uuid)
+            .filter(UserWordStatusFileAssoc.user_uuid.is_(None),
+                    UserWordStatusFileAssoc.word_uuid == lemma_word.uuid)
+            .limit(1))
+        return word_pos, lemma_word, word_image_file_index_uuid
+
+    async def get_analyzed_word_translation_with_nlp_api(
+            self,
+            word_transl_in_ser: TranslWordInSerializer,
+    ) -> TranslWordOutSerializer:
+        """
+        word translation, context translation and analysis -> lemma -> image branches run concurrently.
+        if context translation does not finish within WORD_CONTEXT_TRANSLATION_DEADLINE_SECONDS,
+        result is returned without context_output, translation itself goes on to land in translation memory.
+        """
+        started = asyncio.get_running_loop().time()
+        context_transl_task = asyncio.create_task(translate_with_nlp_api(
             TranslNlpAPIInSerializer(text_input=word_transl_in_ser.context_input,
                                      input_lang_iso2=word_transl_in_ser.input_lang_iso2,
-                                     target_lang_iso2=word_transl_in_ser.target_lang_iso2)
-        )
-        context_output = context_transl_out.text_output
+                                     target_lang_iso2=word_transl_in_ser.target_lang_iso2)))
+        word_transl_task = asyncio.create_task(translate_with_nlp_api(
+            TranslNlpAPIInSerializer(text_input=word_transl_in_ser.word_input,
+                                     input_lang_iso2=word_transl_in_ser.input_lang_iso2,
+                                     target_lang_iso2=word_transl_in_ser.target_lang_iso2)))
+        lemma_task = asyncio.create_task(self._get_analyzed_lemma_word_and_image(word_transl_in_ser))
+        try:
+            word_transl_out, (word_pos, lemma_word, word_image_file_index_uuid) = await asyncio.gather(
+                word_transl_task, lemma_task)
+        except Exception:
+            for task in (context_transl_task, word_transl_task, lemma_task):
+                task.cancel()
+            # survivor is awaited, lemma branch must be done with session before request closes it
+            await asyncio.gather(word_transl_task, lemma_task, return_exceptions=True)
+            raise
+
+        context_output = None
+        remaining = config.WORD_CONTEXT_TRANSLATION_DEADLINE_SECONDS - (asyncio.get_running_loop().time() - started)
+        try:
+            context_transl_out: TranslNlpAPIOutSerializer = await asyncio.wait_for(
+                asyncio.shield(context_transl_task), timeout=max(remaining, 0))
+            context_output = context_transl_out.text_output
+        except asyncio.TimeoutError:
+            logger.warning(f'context translation of {word_transl_in_ser.word_input=} exceeded deadline')
+            background_tasks.add(context_transl_task)
+            context_transl_task.add_done_callback(background_tasks.discard)
+        except Exception as e:
+            logger.error(f'context translation of {word_transl_in_ser.word_input=} failed: {e}')
 
         return TranslWordOutSerializer(
             word_input=word_transl_in_ser.word_input,
-            word_output=word_output,
+            word_output=word_transl_out.text_output,
             word_pos=word_pos,
             context_output=context_output,
             input_lang_iso2=word_transl_in_ser.input_lang_iso2,
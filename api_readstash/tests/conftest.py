@@ -0,0 +1,71 @@
+import importlib
+import os
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+# settings are required by core.config at import, unit tests don't reach services they point to.
+# modules importing core.security (f.e. through celery_app) migrate postgres at import, so they need it running
+TEST_SETTINGS = {
+    'API_READSTASH_HOST': 'localhost',
+    'API_READSTASH_PORT': '8001',
+    'API_NLP_HOST': 'localhost',
+    'API_NLP_PORT': '8002',
+    'PROJECT_NAME': 'readstash',
+    'SMTP_HOST': 'localhost',
+    'SMTP_PORT': '25',
+    'EMAILS_FROM_EMAIL': 'test@example.com',
+    'POSTGRES_READSTASH_HOST': 'localhost',
+    'POSTGRES_READSTASH_PORT': '5432',
+    'POSTGRES_READSTASH_USER': 'postgres',
+    'POSTGRES_READSTASH_DB': 'readstash',
+    'POSTGRES_READSTASH_PASSWORD': 'postgres',
+    'POSTGRES_READSTASH_READ_HOST': 'localhost',
+    'POSTGRES_READSTASH_READ_PORT': '5432',
+    'POSTGRES_READSTASH_READ_USER': 'postgres',
+    'POSTGRES_READSTASH_READ_DB': 'readstash',
+    'POSTGRES_READSTASH_READ_PASSWORD': 'postgres',
+    'POSTGRES_OBJECT_STORAGE_HOST': 'localhost',
+    'POSTGRES_OBJECT_STORAGE_PORT': '5432',
+    'POSTGRES_OBJECT_STORAGE_USER': 'postgres',
+    'POSTGRES_OBJECT_STORAGE_DB': 'object_storage',
+    'POSTGRES_OBJECT_STORAGE_PASSWORD': 'postgres',
+    'POSTGRES_OBJECT_STORAGE_READ_HOST': 'localhost',
+    'POSTGRES_OBJECT_STORAGE_READ_PORT': '5432',
+    'POSTGRES_OBJECT_STORAGE_READ_USER': 'postgres',
+    'POSTGRES_OBJECT_STORAGE_READ_DB': 'object_storage',
+    'POSTGRES_OBJECT_STORAGE_READ_PASSWORD': 'postgres',
+    'REDIS_HOST': 'localhost',
+    'REDIS_PORT': '6379',
+    'KEYCLOAK_BASE_URL': 'http://localhost:8080',
+    'KEYCLOAK_REALM': 'readstash',
+    'KEYCLOAK_CLIENT_ID': 'readstash',
+    'KEYCLOAK_REDIRECT_URL': 'http://localhost:8001',
+    'KEYCLOAK_ADMIN': 'admin',
+    'KEYCLOAK_ADMIN_PASSWORD': 'admin',
+    'KEYCLOAK_CLIENT_SECRET': 'secret',
+    'OPENAI_API_KEY': 'test',
+    'INTER_SERVICE_SECRET': 'secret',
+    'CELERY_BROKER_URL': 'memory://',
+    'CELERY_RESULT_BACKEND': 'cache+memory://',
+    'CELERY_TIMEZONE': 'UTC',
+}
+
+for name, value in TEST_SETTINGS.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture(scope='session')
+def import_migrating():
+    """
+    import of module that migrates postgres at import (through core.security),
+    tests using it are skipped if postgres is not reachable
+    """
+
+    def import_module(name: str):
+        try:
+            return importlib.import_module(name)
+        except OperationalError as e:
+            pytest.skip(f'{name} migrates postgres at import, it is not reachable: {e.orig}')
+
+    return import_module
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from services.cache import blob_cache
+from services.cache.blob_cache import LZ4, RAW, ZSTD, _decode, _encode
+
+COMPRESSIBLE = b'readstash ' * 1000
+INCOMPRESSIBLE = os.urandom(10_000)
+
+
+def available_codecs() -> list:
+    codecs = [RAW]
+    if blob_cache.lz4 is not None:
+        codecs.append(LZ4)
+    if blob_cache.zstandard is not None:
+        codecs.append(ZSTD)
+    return codecs
+
+
+@pytest.mark.parametrize('codec', available_codecs())
+@pytest.mark.parametrize('chunk', [b'', b'x', COMPRESSIBLE, INCOMPRESSIBLE])
+def test_round_trip(codec, chunk):
+    assert _decode(_encode(chunk, codec)) == chunk
+
+
+@pytest.mark.parametrize('codec', [codec for codec in available_codecs() if codec != RAW])
+def test_compressible_chunk_is_stored_compressed(codec):
+    stored = _encode(COMPRESSIBLE, codec)
+    assert stored[:1] == codec
+    assert len(stored) < len(COMPRESSIBLE)
+
+
+@pytest.mark.parametrize('codec', available_codecs())
+def test_incompressible_chunk_is_stored_raw(codec):
+    assert _encode(INCOMPRESSIBLE, codec) == RAW + INCOMPRESSIBLE
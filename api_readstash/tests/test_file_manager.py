@@ -0,0 +1,38 @@
+import pytest
+
+CHUNK_SIZE = 10
+DATA = bytes(range(95))
+
+
+@pytest.fixture(scope='module')
+def file_manager(import_migrating):
+    """file manager reading DATA in chunks of CHUNK_SIZE, without db and caches"""
+    FileManager = import_migrating('services.file_manager.file_manager').FileManager
+    file_manager = FileManager.__new__(FileManager)
+
+    async def iter_chunks(file_storage_uuid, meta, start_index=0, stop_index=None):
+        chunks = [DATA[i:i + CHUNK_SIZE] for i in range(0, len(DATA), CHUNK_SIZE)]
+        for chunk in chunks[start_index:stop_index]:
+            yield chunk
+
+    file_manager._iter_chunks = iter_chunks
+    return file_manager
+
+
+@pytest.mark.parametrize('start, end', [
+    (0, 94),
+    (0, 0),
+    (94, 94),
+    (0, 9),
+    (10, 19),
+    (9, 10),
+    (5, 25),
+    (13, 17),
+    (30, 94),
+    (85, 94),
+])
+async def test_iter_range(file_manager, start, end):
+    chunks = [chunk async for chunk in file_manager._iter_range('uuid', None, CHUNK_SIZE, start, end)]
+    assert b''.join(chunks) == DATA[start:end + 1]
+    # only chunks range is in are read
+    assert len(chunks) == end // CHUNK_SIZE - start // CHUNK_SIZE + 1
@@ -0,0 +1,128 @@
+import datetime as dt
+
+import pytest
+
+from core import config
+from core.exceptions import RangeNotSatisfiableException
+from services.file_manager import http_ranges
+
+LAST_MODIFIED = dt.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt.timezone.utc)
+LAST_MODIFIED_HTTP = 'Wed, 01 May 2024 12:30:15 GMT'
+ETAG = '"abc123"'
+
+
+def test_format_and_parse_http_date():
+    assert http_ranges.format_http_date(LAST_MODIFIED) == LAST_MODIFIED_HTTP
+    assert http_ranges.parse_http_date(LAST_MODIFIED_HTTP) == LAST_MODIFIED.replace(microsecond=0)
+
+
+@pytest.mark.parametrize('value', [None, '', 'yesterday', '"abc123"'])
+def test_parse_invalid_http_date(value):
+    assert http_ranges.parse_http_date(value) is None
+
+
+@pytest.mark.parametrize('header, size, expected', [
+    ('bytes=0-499', 1000, [(0, 499)]),
+    ('bytes=500-', 1000, [(500, 999)]),
+    ('bytes=-200', 1000, [(800, 999)]),
+    ('bytes=-2000', 1000, [(0, 999)]),
+    ('bytes=900-2000', 1000, [(900, 999)]),
+    ('bytes=0-0,-1', 1000, [(0, 0), (999, 999)]),
+    ('BYTES = 0-9', 1000, [(0, 9)]),
+    (' bytes=  10 - 19 ', 1000, [(10, 19)]),
+    # sorted and merged, overlapping and adjacent ones
+    ('bytes=500-599,0-99', 1000, [(0, 99), (500, 599)]),
+    ('bytes=0-99,50-149', 1000, [(0, 149)]),
+    ('bytes=0-99,100-199', 1000, [(0, 199)]),
+    ('bytes=0-99,101-199', 1000, [(0, 99), (101, 199)]),
+    ('bytes=0-999,200-300', 1000, [(0, 999)]),
+    # unsatisfiable ones are dropped if others are not
+    ('bytes=0-9,2000-3000', 1000, [(0, 9)]),
+    ('bytes=-0,0-9', 1000, [(0, 9)]),
+])
+def test_parse_range(header, size, expected):
+    assert http_ranges.parse_range(header, size) == expected
+
+
+@pytest.mark.parametrize('header', [
+    None,
+    'items=0-9',
+    'bytes=',
+    'bytes=abc',
+    'bytes=-',
+    'bytes=9-0',
+    'bytes=0-9,x',
+    ','.join(['bytes=0-0'] + ['1-1'] * config.FILE_HTTP_MAX_RANGES),
+])
+def test_parse_range_ignored(header):
+    assert http_ranges.parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize('header, size', [
+    ('bytes=1000-', 1000),
+    ('bytes=1000-2000,3000-', 1000),
+    ('bytes=-0', 1000),
+    ('bytes=0-', 0),
+])
+def test_parse_range_not_satisfiable(header, size):
+    with pytest.raises(RangeNotSatisfiableException) as exc_info:
+        http_ranges.parse_range(header, size)
+    assert exc_info.value.headers['Content-Range'] == f'bytes */{size}'
+
+
+@pytest.mark.parametrize('if_none_match, if_modified_since, expected', [
+    (None, None, False),
+    ('"abc123"', None, True),
+    ('W/"abc123"', None, True),
+    ('"other", "abc123"', None, True),
+    ('*', None, True),
+    ('"other"', None, False),
+    # If-Modified-Since is not looked at with If-None-Match
+    ('"other"', LAST_MODIFIED_HTTP, False),
+    (None, LAST_MODIFIED_HTTP, True),
+    (None, 'Wed, 01 May 2024 12:30:14 GMT', False),
+    (None, 'Thu, 02 May 2024 00:00:00 GMT', True),
+    (None, 'not a date', False),
+])
+def test_is_not_modified(if_none_match, if_modified_since, expected):
+    assert http_ranges.is_not_modified(if_none_match, if_modified_since, ETAG, LAST_MODIFIED) is expected
+
+
+def test_is_not_modified_compares_weak_etag_weakly():
+    assert http_ranges.is_not_modified('"uuid-1"', None, 'W/"uuid-1"', LAST_MODIFIED) is True
+
+
+@pytest.mark.parametrize('if_range, etag, expected', [
+    (None, ETAG, True),
+    ('"abc123"', ETAG, True),
+    (' "abc123" ', ETAG, True),
+    ('"other"', ETAG, False),
+    # weak etags never match If-Range
+    ('W/"abc123"', ETAG, False),
+    ('W/"uuid-1"', 'W/"uuid-1"', False),
+    (LAST_MODIFIED_HTTP, ETAG, True),
+    ('Thu, 02 May 2024 00:00:00 GMT', ETAG, False),
+    ('not a date', ETAG, False),
+])
+def test_is_range_applicable(if_range, etag, expected):
+    assert http_ranges.is_range_applicable(if_range, etag, LAST_MODIFIED) is expected
+
+
+def test_content_range():
+    assert http_ranges.get_content_range(0, 499, 1000) == 'bytes 0-499/1000'
+
+
+@pytest.mark.parametrize('ranges', [
+    [(0, 0)],
+    [(0, 99), (500, 599)],
+    [(0, 9), (100, 109), (990, 999)],
+])
+def test_multipart_length_is_length_of_body(ranges):
+    boundary, content_type, size = 'b0undary', 'image/png', 1000
+    data = bytes(range(256)) * 4
+    body = b''.join(http_ranges.get_part_header(boundary, content_type, start, end, size)
+                    + data[start:end + 1] + b'\r\n'
+                    for start, end in ranges) + http_ranges.get_closing(boundary)
+    assert http_ranges.get_multipart_length(boundary, content_type, ranges, size) == len(body)
+    assert body.startswith(b'--b0undary\r\nContent-Type: image/png\r\nContent-Range: bytes ')
+    assert body.endswith(b'\r\n--b0undary--\r\n')
@@ -0,0 +1,97 @@
+import io
+import os
+
+import pytest
+from PIL import ExifTags, Image, features
+
+from core import config
+from services.file_manager.image_derivatives import UnreadableImageException, is_derivable, render_derivatives
+
+
+def noise_image(width: int, height: int, mode: str = 'RGB') -> Image.Image:
+    """random pixels, so that resized copies are always smaller than original"""
+    return Image.frombytes(mode, (width, height), os.urandom(width * height * len(mode)))
+
+
+def encode(image: Image.Image, image_format: str, **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **params)
+    return buffer.getvalue()
+
+
+@pytest.fixture(params=['jpeg', 'webp'])
+def variant_format(request, monkeypatch):
+    if request.param == 'webp' and not features.check('webp'):
+        pytest.skip('pillow is built without webp')
+    monkeypatch.setattr(config, 'FILE_IMAGE_VARIANT_FORMAT', request.param)
+    return request.param
+
+
+def test_derivatives_of_widths_smaller_than_image(variant_format):
+    data = encode(noise_image(800, 600), 'PNG')
+    width, height, derivatives = render_derivatives(data, [1280, 640, 160, 320, 160, 800])
+
+    assert (width, height) == (800, 600)
+    assert [(d.width, d.height) for d in derivatives] == [(160, 120), (320, 240), (640, 480)]
+    expected_format = 'JPEG' if variant_format == 'jpeg' else 'WEBP'
+    for derivative in derivatives:
+        assert len(derivative.data) < len(data)
+        with Image.open(io.BytesIO(derivative.data)) as image:
+            assert image.format == expected_format
+            assert image.size == (derivative.width, derivative.height)
+
+
+def test_no_derivatives_of_image_narrower_than_widths(variant_format):
+    data = encode(noise_image(100, 80), 'PNG')
+    assert render_derivatives(data, [160, 320]) == (100, 80, [])
+
+
+def test_height_is_kept_proportional_and_at_least_one_pixel(variant_format):
+    data = encode(noise_image(1000, 3), 'PNG')
+    width, height, derivatives = render_derivatives(data, [10, 500])
+    assert [(d.width, d.height) for d in derivatives] == [(10, 1), (500, 2)]
+
+
+def test_exif_orientation_is_applied(variant_format):
+    exif = Image.Exif()
+    # stored landscape, displayed portrait
+    exif[ExifTags.Base.Orientation] = 6
+    data = encode(noise_image(800, 400), 'JPEG', exif=exif, quality=95)
+    width, height, derivatives = render_derivatives(data, [200])
+
+    assert (width, height) == (400, 800)
+    assert [(d.width, d.height) for d in derivatives] == [(200, 400)]
+    with Image.open(io.BytesIO(derivatives[0].data)) as image:
+        assert image.size == (200, 400)
+
+
+@pytest.mark.parametrize('mode', ['RGBA', 'L'])
+def test_images_of_other_modes(variant_format, mode):
+    data = encode(noise_image(400, 200, mode), 'PNG')
+    width, height, derivatives = render_derivatives(data, [100])
+    assert [(d.width, d.height) for d in derivatives] == [(100, 50)]
+
+
+@pytest.mark.parametrize('data', [b'', b'not an image', encode(noise_image(10, 10), 'PNG')[:50]])
+def test_unreadable_image(data):
+    with pytest.raises(UnreadableImageException):
+        render_derivatives(data, [160])
+
+
+def test_decompression_bomb_is_unreadable(monkeypatch):
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    data = encode(noise_image(100, 100), 'PNG')
+    with pytest.raises(UnreadableImageException):
+        render_derivatives(data, [50])
+
+
+@pytest.mark.parametrize('content_type, expected', [
+    ('image/jpeg', True),
+    ('image/png', True),
+    ('image/gif', False),
+    ('image/svg+xml', False),
+    ('application/pdf', False),
+    (None, False),
+])
+def test_is_derivable(content_type, expected):
+    assert is_derivable(content_type) is expected
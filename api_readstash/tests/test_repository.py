@@ -0,0 +1,47 @@
+from urllib.parse import quote
+
+import pytest
+
+from core.exceptions import BadRequestException
+from services.postgres.repository import chunked, decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize('items, chunk_size, expected', [
+    ([], 3, []),
+    ([1, 2], 3, [[1, 2]]),
+    ([1, 2, 3], 3, [[1, 2, 3]]),
+    ([1, 2, 3, 4, 5, 6, 7], 3, [[1, 2, 3], [4, 5, 6], [7]]),
+])
+def test_chunked(items, chunk_size, expected):
+    assert list(chunked(items, chunk_size)) == expected
+
+
+def test_chunked_keeps_every_item_in_order():
+    items = list(range(2500))
+    chunks = list(chunked(items, 1000))
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+    assert [item for chunk in chunks for item in chunk] == items
+
+
+@pytest.mark.parametrize('values', [
+    ('apple', 42),
+    ('яблоко', 7),
+    ('2024-01-01T00:00:00', 'e4b1c3d2-0000-4000-8000-000000000000'),
+    (None, 1),
+    (3.5,),
+])
+def test_cursor_round_trip(values):
+    cursor = encode_cursor(*values)
+    assert decode_cursor(cursor) == list(values)
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor('?&/+=', 'word with spaces', 10 ** 12)
+    assert cursor == quote(cursor, safe='')
+    assert not cursor.endswith('=')
+
+
+@pytest.mark.parametrize('cursor', ['not a cursor', 'bm90IGpzb24', '!!!'])
+def test_decode_cursor_rejects_invalid(cursor):
+    with pytest.raises(BadRequestException):
+        decode_cursor(cursor)
@@ -0,0 +1,31 @@
+import pytest
+
+
+@pytest.fixture(scope='module')
+def split_to_chunks(import_migrating):
+    return import_migrating('services.text_manager.text_ingestion').split_to_chunks
+
+
+def test_split_to_chunks_packs_sentences_up_to_max_chars(split_to_chunks):
+    content = 'One two. Three four! Five six? Seven.'
+    assert split_to_chunks(content, max_chars=20) == ['One two. Three four!', 'Five six? Seven.']
+
+
+def test_split_to_chunks_keeps_short_text_in_one_chunk(split_to_chunks):
+    assert split_to_chunks('One two. Three four.', max_chars=100) == ['One two. Three four.']
+
+
+def test_split_to_chunks_does_not_cut_sentence_longer_than_max_chars(split_to_chunks):
+    long_sentence = 'word ' * 10 + 'end.'
+    assert split_to_chunks(f'Short. {long_sentence} Tail.', max_chars=20) == ['Short.', long_sentence, 'Tail.']
+
+
+def test_split_to_chunks_keeps_every_word(split_to_chunks):
+    content = ' '.join(f'Sentence number {i}.' for i in range(100))
+    chunks = split_to_chunks(content, max_chars=50)
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert ' '.join(chunks).split() == content.split()
+
+
+def test_split_to_chunks_of_blank_text(split_to_chunks):
+    assert split_to_chunks('   ') == []
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from services.cache.tiered_cache import TieredCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    """separate instance of singleton, nothing cached, computations are not locked in redis"""
+    cache = type(TieredCache())()
+
+    async def get_entry(full_key):
+        return None
+
+    async def compute_locked(full_key, compute, expires_in_seconds, stale_entry):
+        return await compute()
+
+    monkeypatch.setattr(cache, '_get_entry', get_entry)
+    monkeypatch.setattr(cache, '_compute_locked', compute_locked)
+    return cache
+
+
+async def test_concurrent_callers_share_one_computation(cache):
+    calls = 0
+    release = asyncio.Event()
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {'value': calls}
+
+    callers = [asyncio.create_task(cache.get_or_compute('word', 'uuid', compute)) for _ in range(10)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*callers)
+
+    assert calls == 1
+    assert results == [{'value': 1}] * 10
+    assert cache.stats['coalesced'] == 9
+    assert cache._in_flight == {}
+
+
+async def test_different_keys_are_computed_separately(cache):
+    async def compute_for(key):
+        async def compute():
+            await asyncio.sleep(0)
+            return key
+        return await cache.get_or_compute('word', key, compute)
+
+    assert await asyncio.gather(compute_for('a'), compute_for('b')) == ['a', 'b']
+
+
+async def test_failed_computation_is_raised_to_every_caller(cache):
+    release = asyncio.Event()
+
+    async def compute():
+        await release.wait()
+        raise ValueError('failed')
+
+    callers = [asyncio.create_task(cache.get_or_compute('word', 'uuid', compute)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*callers, return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert cache._in_flight == {}
+
+
+async def test_computation_is_not_shared_after_invalidation(cache):
+    release = asyncio.Event()
+    values = iter(['old', 'new'])
+
+    async def compute():
+        value = next(values)
+        if value == 'old':
+            await release.wait()
+        return value
+
+    before = asyncio.create_task(cache.get_or_compute('word', 'uuid', compute))
+    await asyncio.sleep(0)
+    cache._evict_local([cache._key('word', 'uuid')])
+    after = await cache.get_or_compute('word', 'uuid', compute)
+    release.set()
+
+    assert after == 'new'
+    assert await before == 'old'
+    assert cache._in_flight == {}
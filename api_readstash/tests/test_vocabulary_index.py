@@ -0,0 +1,64 @@
+from services.word_manager.vocabulary_index import LanguageVocabulary, VocabularyEntry, VocabularyIndex
+
+APPLE_UUID = '0b6f0c52-1d6a-4b8e-9f3e-2f1f5b7d9a01'
+BOOK_UUID = '1c7a1d63-2e7b-4c9f-8a4f-3a2a6c8e0b12'
+CAT_UUID = '2d8b2e74-3f8c-4daf-9b5a-4b3b7d9f1c23'
+DOG_UUID = '3e9c3f85-4a9d-4ebf-8c6b-5c4c8eaf2d34'
+
+
+def build_vocabulary() -> LanguageVocabulary:
+    return LanguageVocabulary([
+        ('cat', CAT_UUID, 'NOUN', 'A1'),
+        ('apple', APPLE_UUID, 'NOUN', None),
+        ('book', BOOK_UUID, 'NOUN', 'A2'),
+    ])
+
+
+def test_get_built_words():
+    vocabulary = build_vocabulary()
+    assert len(vocabulary) == 3
+    assert vocabulary.get('apple') == VocabularyEntry(uuid=APPLE_UUID, pos='NOUN', level_cefr_code=None)
+    assert vocabulary.get('book') == VocabularyEntry(uuid=BOOK_UUID, pos='NOUN', level_cefr_code='A2')
+    assert vocabulary.get('cat') == VocabularyEntry(uuid=CAT_UUID, pos='NOUN', level_cefr_code='A1')
+
+
+def test_get_missing_words():
+    vocabulary = build_vocabulary()
+    assert vocabulary.get('aardvark') is None
+    assert vocabulary.get('bo') is None
+    assert vocabulary.get('zebra') is None
+
+
+def test_overlay_adds_word():
+    vocabulary = build_vocabulary()
+    entry = VocabularyEntry(uuid=DOG_UUID, pos='NOUN', level_cefr_code='A1')
+    vocabulary.set('dog', entry)
+    assert vocabulary.get('dog') == entry
+    assert len(vocabulary) == 3
+
+
+def test_overlay_updates_built_word():
+    vocabulary = build_vocabulary()
+    entry = VocabularyEntry(uuid=APPLE_UUID, pos='NOUN', level_cefr_code='A1')
+    vocabulary.set('apple', entry)
+    assert vocabulary.get('apple') == entry
+
+
+def test_overlay_removes_built_word():
+    vocabulary = build_vocabulary()
+    vocabulary.set('book', None)
+    assert vocabulary.get('book') is None
+    assert vocabulary.get('cat') is not None
+
+
+def test_index_applies_changes_to_built_languages_only(monkeypatch):
+    index = VocabularyIndex()
+    monkeypatch.setattr(index, 'languages', {'en': build_vocabulary()})
+    index._apply([
+        {'iso2': 'en', 'characters': 'dog', 'uuid': DOG_UUID, 'pos': 'NOUN', 'level_cefr_code': 'A1'},
+        {'iso2': 'en', 'characters': 'cat', 'removed': True},
+        {'iso2': 'de', 'characters': 'Hund', 'uuid': DOG_UUID, 'pos': 'NOUN', 'level_cefr_code': 'A1'},
+    ])
+    assert index.contains('en', 'dog') is True
+    assert index.contains('en', 'cat') is False
+    assert index.contains('de', 'Hund') is None